@@ -0,0 +1,143 @@
+"""
+Agregados materializados por temporada
+======================================
+Tablas que se derivan del dataset fusionado y se guardan junto a él
+(merged_data/aggregates/):
+- driver_standings: puntos acumulados y posición de cada piloto tras cada ronda
+- constructor_standings: lo mismo por escudería
+- pitstop_stats: distribución de pitstops por temporada y escudería
+- coverage: cobertura de datos de pitstops por temporada
+Se actualizan de forma incremental: solo se recalculan las temporadas con
+carreras nuevas o reconstruidas y, en las clasificaciones, solo las rondas
+a partir de la primera que ha cambiado (partiendo de los totales guardados).
+"""
+
+import os
+import pandas as pd
+
+AGG_DIR = "merged_data/aggregates"
+TABLAS = ['driver_standings', 'constructor_standings', 'pitstop_stats', 'coverage']
+
+def cargar_agregados():
+    """Lee las tablas de agregados guardadas (None si alguna no existe)."""
+    tablas = {}
+    for nombre in TABLAS:
+        path = os.path.join(AGG_DIR, f"{nombre}.csv")
+        if not os.path.exists(path):
+            return None
+        tablas[nombre] = pd.read_csv(path)
+    return tablas
+
+def guardar_agregados(tablas):
+    """Guarda las tablas de agregados en AGG_DIR."""
+    os.makedirs(AGG_DIR, exist_ok=True)
+    for nombre, tabla in tablas.items():
+        tabla.to_csv(os.path.join(AGG_DIR, f"{nombre}.csv"), index=False)
+
+def clasificacion(season_df, clave, base=None):
+    """
+    Clasificación tras cada ronda de una temporada (clave = 'Driver' o 'Constructor').
+    base: puntos acumulados antes de la primera ronda de season_df (Series por clave).
+    """
+    puntos = season_df.pivot_table(index=clave, columns='RaceNumber', values='Points',
+                                   aggfunc='sum', fill_value=0, observed=True)
+    if base is not None and len(base):
+        puntos = puntos.reindex(puntos.index.union(base.index), fill_value=0)
+        puntos[puntos.columns[0]] += base.reindex(puntos.index, fill_value=0)
+
+    tabla = puntos.cumsum(axis=1).stack().rename('Points').reset_index()
+    tabla['Position'] = (tabla.groupby('RaceNumber')['Points']
+                         .rank(method='min', ascending=False).astype(int))
+    return tabla
+
+def estadisticas_pitstops(df):
+    """Distribución de pitstops por temporada y escudería (filas con datos)."""
+    con_datos = df[df['NPitstops'].notna()]
+    return (con_datos.groupby(['Season', 'Constructor'], observed=True)
+            .agg(Entries=('NPitstops', 'size'),
+                 TotalStops=('NPitstops', 'sum'),
+                 MeanStopDuration=('MedianPitStopDuration', 'mean'),
+                 MedianStopDuration=('MedianPitStopDuration', 'median'),
+                 P90StopDuration=('MedianPitStopDuration', lambda s: s.quantile(0.9)))
+            .astype({'MeanStopDuration': 'float64', 'MedianStopDuration': 'float64',
+                     'P90StopDuration': 'float64'})
+            .round(3)
+            .reset_index())
+
+def cobertura_pitstops(df):
+    """Filas y filas con pitstops por temporada, en una sola pasada groupby."""
+    cobertura = (df.assign(_con=df['NPitstops'].notna())
+                 .groupby('Season', observed=True)
+                 .agg(Rows=('_con', 'size'), RowsWithPitstops=('_con', 'sum'))
+                 .reset_index())
+    cobertura['CoveragePct'] = cobertura['RowsWithPitstops'] / cobertura['Rows'] * 100
+    return cobertura
+
+def actualizar_agregados(df, rebuilt_races):
+    """
+    Actualiza las tablas de agregados a partir del dataset final.
+    rebuilt_races: conjunto de (season, race_number) nuevas o reconstruidas.
+    Devuelve el diccionario de tablas ya guardado.
+    """
+    previas = cargar_agregados()
+    df = df.assign(Points=pd.to_numeric(df['Points'], errors='coerce').fillna(0),
+                   Driver=df['Driver'].astype(str), Constructor=df['Constructor'].astype(str))
+    rondas = df[['Season', 'RaceNumber']].drop_duplicates().astype(int)
+
+    # Primera ronda a recalcular por temporada
+    if previas is None:
+        desde = rondas.groupby('Season')['RaceNumber'].min().to_dict()
+        previas = {nombre: pd.DataFrame() for nombre in TABLAS}
+    else:
+        desde = {}
+        for season, race_number in rebuilt_races:
+            desde[season] = min(race_number, desde.get(season, race_number))
+        # Temporadas con rondas desaparecidas o sin agregados se recalculan enteras
+        guardadas = set(map(tuple, previas['driver_standings'][['Season', 'RaceNumber']]
+                            .drop_duplicates().astype(int).values))
+        actuales = set(map(tuple, rondas.values))
+        for season, race_number in actuales - guardadas:
+            desde[season] = min(race_number, desde.get(season, race_number))
+        for season, _ in guardadas - actuales:
+            desde[season] = 1
+
+    if not desde:
+        return previas
+
+    tablas = {}
+    for nombre, clave in [('driver_standings', 'Driver'), ('constructor_standings', 'Constructor')]:
+        previa = previas[nombre]
+        partes = []
+        for season, r0 in desde.items():
+            season_df = df[(df['Season'] == season) & (df['RaceNumber'] >= r0)]
+            base = None
+            if len(previa):
+                anteriores = previa[(previa['Season'] == season) & (previa['RaceNumber'] < r0)]
+                if len(anteriores):
+                    ultima = anteriores[anteriores['RaceNumber'] == anteriores['RaceNumber'].max()]
+                    base = ultima.set_index(clave)['Points']
+            if len(season_df):
+                partes.append(clasificacion(season_df, clave, base).assign(Season=season))
+
+        if len(previa):
+            conservar = pd.Series(True, index=previa.index)
+            for season, r0 in desde.items():
+                conservar &= ~((previa['Season'] == season) & (previa['RaceNumber'] >= r0))
+            partes.insert(0, previa[conservar])
+
+        tablas[nombre] = (pd.concat(partes, ignore_index=True)
+                          [['Season', 'RaceNumber', clave, 'Points', 'Position']]
+                          .sort_values(['Season', 'RaceNumber', 'Position'], ignore_index=True))
+
+    # Estadísticas por temporada: se recalculan solo las temporadas afectadas
+    afectadas = df[df['Season'].isin(list(desde))]
+    for nombre, funcion, orden in [('pitstop_stats', estadisticas_pitstops, ['Season', 'Constructor']),
+                                   ('coverage', cobertura_pitstops, ['Season'])]:
+        previa = previas[nombre]
+        partes = [funcion(afectadas)]
+        if len(previa):
+            partes.insert(0, previa[~previa['Season'].isin(list(desde))])
+        tablas[nombre] = pd.concat(partes, ignore_index=True).sort_values(orden, ignore_index=True)
+
+    guardar_agregados(tablas)
+    return tablas
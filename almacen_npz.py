@@ -0,0 +1,71 @@
+"""
+Almacén columnar en ficheros .npz
+=================================
+Utilidades comunes de los almacenes locales de datos de la API
+(almacen_pitstops, almacen_vueltas): cada temporada se guarda en un .npz
+con un array tipado por columna. DriverId se guarda como códigos int16
+más su vocabulario, de modo que no hace falta pickle para leerlo.
+"""
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+def a_segundos(serie):
+    """Convierte textos 'ss.sss', 'm:ss.sss' o 'h:mm:ss' a segundos (vectorizado)."""
+    partes = serie.astype('string').str.split(':', expand=True).apply(pd.to_numeric, errors='coerce')
+    n_partes = partes.notna().sum(axis=1)
+    segundos = sum(partes[i].fillna(0) * 60.0 ** (n_partes - 1 - i) for i in partes.columns)
+    return segundos.where(n_partes > 0)
+
+def _orden_columnas(columnas):
+    return ['Season', 'Round', 'DriverId'] + [c for c in columnas if c not in ('Season', 'Round')]
+
+def leer_temporada(path, columnas):
+    """Lee el .npz de una temporada como DataFrame con los dtypes de 'columnas'."""
+    with np.load(path) as npz:
+        datos = {col: npz[col] for col in columnas}
+        datos['DriverId'] = pd.Categorical.from_codes(npz['DriverId_codes'], npz['DriverId_categories'])
+    return pd.DataFrame(datos)[_orden_columnas(columnas)]
+
+def guardar(directorio, df, columnas, orden):
+    """
+    Añade (o reemplaza) carreras en los .npz de sus temporadas.
+    Las rondas de df ya presentes en el fichero se sustituyen; la escritura
+    es atómica (fichero temporal + os.replace).
+    """
+    os.makedirs(directorio, exist_ok=True)
+    for season, nuevas in df.groupby('Season'):
+        path = os.path.join(directorio, f"{season}.npz")
+        if os.path.exists(path):
+            previas = leer_temporada(path, columnas)
+            previas = previas[~previas['Round'].isin(nuevas['Round'].unique())]
+            nuevas = pd.concat([previas, nuevas], ignore_index=True)
+
+        nuevas = nuevas.sort_values(orden, kind='stable')
+        driver_ids = nuevas['DriverId'].astype(str).astype('category')
+
+        arrays = {col: nuevas[col].to_numpy(dtype=dtype) for col, dtype in columnas.items()}
+        arrays['DriverId_codes'] = driver_ids.cat.codes.to_numpy(dtype='int16')
+        arrays['DriverId_categories'] = driver_ids.cat.categories.to_numpy(dtype=str)
+
+        np.savez_compressed(path + ".tmp.npz", **arrays)
+        os.replace(path + ".tmp.npz", path)
+
+def cargar(directorio, columnas, seasons=None):
+    """Carga todas las temporadas de un almacén (o solo las indicadas)."""
+    if seasons is None:
+        paths = sorted(glob.glob(os.path.join(directorio, "*.npz")))
+    else:
+        paths = [os.path.join(directorio, f"{s}.npz") for s in seasons]
+        paths = [p for p in paths if os.path.exists(p)]
+
+    if not paths:
+        vacio = {col: pd.Series(dtype=dtype) for col, dtype in columnas.items()}
+        vacio['DriverId'] = pd.Series(dtype='category')
+        return pd.DataFrame(vacio)[_orden_columnas(columnas)]
+
+    df = pd.concat([leer_temporada(p, columnas) for p in paths], ignore_index=True)
+    df['DriverId'] = df['DriverId'].astype(str).astype('category')
+    return df
@@ -0,0 +1,79 @@
+"""
+Almacén de pitstops individuales
+================================
+Guarda cada parada tal como la devuelve Jolpica (vuelta, número de parada,
+hora y duración) en arrays NumPy tipados, un fichero .npz por temporada en
+data/pitstops/raw/. Las métricas por piloto y carrera (NPitstops, mediana,
+media, p90, vuelta de la primera parada...) se calculan a partir de aquí
+con un groupby vectorizado, sin volver a descargar nada de la API.
+"""
+
+import numpy as np
+import pandas as pd
+from almacen_npz import a_segundos, cargar, guardar
+
+RAW_DIR = "data/pitstops/raw"
+
+# Columna -> dtype compacto con el que se guarda en el .npz
+COLUMNAS_RAW = {
+    'Season': 'int16',
+    'Round': 'int8',
+    'Stop': 'int8',
+    'Lap': 'int16',
+    'TimeOfDay': 'int32',    # segundos desde medianoche
+    'Duration': 'float32',   # segundos
+}
+
+# Paradas más largas son de bandera roja (coche parado en el pit lane): no entran en las métricas de duración
+DURACION_MAX_PARADA = 120.0
+
+def parse_pitstops(season, round_, pitstops):
+    """Convierte la lista de pitstops de la API en un DataFrame de paradas tipado."""
+    raw = pd.DataFrame(pitstops, columns=['driverId', 'lap', 'stop', 'time', 'duration'])
+    return pd.DataFrame({
+        'Season': np.full(len(raw), season, dtype='int16'),
+        'Round': np.full(len(raw), round_, dtype='int8'),
+        'DriverId': raw['driverId'].astype('category'),
+        'Stop': pd.to_numeric(raw['stop'], errors='coerce').fillna(0).astype('int8'),
+        'Lap': pd.to_numeric(raw['lap'], errors='coerce').fillna(0).astype('int16'),
+        'TimeOfDay': a_segundos(raw['time']).fillna(-1).astype('int32'),
+        'Duration': a_segundos(raw['duration']).astype('float32'),
+    })
+
+def guardar_paradas(paradas):
+    """
+    Añade (o reemplaza) las paradas de una o varias carreras en el almacén.
+    Las carreras ya presentes para esas (Season, Round) se sustituyen.
+    """
+    guardar(RAW_DIR, paradas, COLUMNAS_RAW, ['Round', 'Stop'])
+
+def cargar_paradas(seasons=None):
+    """Carga las paradas individuales del almacén (todas o las temporadas indicadas)."""
+    return cargar(RAW_DIR, COLUMNAS_RAW, seasons)
+
+def agregar_paradas(paradas):
+    """
+    Métricas por (Season, Round, DriverId) con un único groupby vectorizado.
+    NPitstops y MedianPitStopDuration son las columnas de los CSV por carrera;
+    el resto son métricas adicionales que antes exigían volver a descargar.
+    Las métricas de duración solo usan paradas de hasta DURACION_MAX_PARADA
+    segundos: las de bandera roja ('16:44.718') se guardan en el almacén
+    pero se cuentan aparte (RedFlagStops), como antes, que quedaban fuera.
+    """
+    roja = paradas['Duration'] > DURACION_MAX_PARADA
+    return (paradas.assign(_duracion=paradas['Duration'].where(~roja), _roja=roja)
+            .groupby(['Season', 'Round', 'DriverId'], observed=True)
+            .agg(NPitstops=('_duracion', 'count'),
+                 MedianPitStopDuration=('_duracion', 'median'),
+                 MeanPitStopDuration=('_duracion', 'mean'),
+                 P90PitStopDuration=('_duracion', lambda d: d.quantile(0.9)),
+                 RedFlagStops=('_roja', 'sum'),
+                 FirstStopLap=('Lap', 'min'))
+            .reset_index())
+
+if __name__ == "__main__":
+    paradas = cargar_paradas()
+    print(f"{len(paradas):,} paradas en {RAW_DIR} "
+          f"({paradas.memory_usage(deep=True).sum()/1e6:.2f} MB en memoria)")
+    if len(paradas):
+        print(agregar_paradas(paradas).head().to_string())
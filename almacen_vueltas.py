@@ -0,0 +1,87 @@
+"""
+Almacén de tiempos por vuelta
+=============================
+Los tiempos por vuelta de Jolpica (/{season}/{round}/laps.json) son órdenes
+de magnitud más filas que los pitstops, así que no se guardan en CSV por
+carrera sino como arrays tipados en un .npz por temporada (data/laps/):
+vuelta y posición int16, tiempo en milisegundos int32.
+El resumen por piloto y carrera (mejor vuelta, ritmo medio) se calcula con
+un groupby vectorizado y se une al dataset fusionado por
+(Season, RaceNumber, DriverId).
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from almacen_npz import a_segundos, cargar, guardar
+
+LAPS_DIR = "data/laps"
+
+# Columna -> dtype compacto con el que se guarda en el .npz
+COLUMNAS_VUELTAS = {
+    'Season': 'int16',
+    'Round': 'int8',
+    'Lap': 'int16',
+    'Position': 'int16',
+    'Milliseconds': 'int32',
+}
+
+def parse_vueltas(season, round_, timings):
+    """Convierte la lista plana de tiempos de get_laps_for_race en un DataFrame tipado."""
+    raw = pd.DataFrame(timings, columns=['lap', 'driverId', 'position', 'time'])
+    return pd.DataFrame({
+        'Season': np.full(len(raw), season, dtype='int16'),
+        'Round': np.full(len(raw), round_, dtype='int8'),
+        'DriverId': raw['driverId'].astype('category'),
+        'Lap': pd.to_numeric(raw['lap'], errors='coerce').fillna(0).astype('int16'),
+        'Position': pd.to_numeric(raw['position'], errors='coerce').fillna(0).astype('int16'),
+        'Milliseconds': (a_segundos(raw['time']) * 1000).round().fillna(-1).astype('int32'),
+    })
+
+def guardar_vueltas(vueltas):
+    """Añade (o reemplaza) las vueltas de una o varias carreras en el almacén."""
+    guardar(LAPS_DIR, vueltas, COLUMNAS_VUELTAS, ['Round', 'Lap', 'Position'])
+
+def cargar_vueltas(seasons=None):
+    """Carga los tiempos por vuelta (todas las temporadas o las indicadas)."""
+    return cargar(LAPS_DIR, COLUMNAS_VUELTAS, seasons)
+
+def resumen_vueltas(vueltas):
+    """Mejor vuelta y ritmo medio/mediano por (Season, Round, DriverId)."""
+    validas = vueltas[vueltas['Milliseconds'] > 0]
+    return (validas.groupby(['Season', 'Round', 'DriverId'], observed=True)
+            .agg(LapsTimed=('Milliseconds', 'size'),
+                 BestLapMs=('Milliseconds', 'min'),
+                 AvgLapMs=('Milliseconds', 'mean'),
+                 MedianLapMs=('Milliseconds', 'median'))
+            .astype({'LapsTimed': 'int16', 'BestLapMs': 'int32',
+                     'AvgLapMs': 'float32', 'MedianLapMs': 'float32'})
+            .reset_index())
+
+def unir_resumen_vueltas(df, seasons=None):
+    """
+    Añade al dataset fusionado las columnas de resumen de vueltas
+    (LEFT JOIN por Season, RaceNumber y DriverId).
+    """
+    if seasons is None:
+        seasons = sorted(int(s) for s in df['Season'].dropna().unique())
+
+    resumen = resumen_vueltas(cargar_vueltas(seasons)).rename(columns={'Round': 'RaceNumber'})
+    resumen = resumen.astype({'Season': df['Season'].dtype, 'RaceNumber': df['RaceNumber'].dtype,
+                              'DriverId': 'string'})
+
+    claves = df[['Season', 'RaceNumber']].assign(DriverId=df['DriverId'].astype('string'))
+    columnas = claves.merge(resumen, on=['Season', 'RaceNumber', 'DriverId'], how='left')
+    return pd.concat([df, columnas.drop(columns=['Season', 'RaceNumber', 'DriverId'])
+                      .set_axis(df.index)], axis=1)
+
+if __name__ == "__main__":
+    # Uso: python almacen_vueltas.py 2023 2024  (descarga e ingesta esas temporadas)
+    from funciones_api import build_laps_for_season
+
+    for season in map(int, sys.argv[1:]):
+        build_laps_for_season(season)
+
+    vueltas = cargar_vueltas()
+    print(f"{len(vueltas):,} tiempos de vuelta en {LAPS_DIR} "
+          f"({vueltas.memory_usage(deep=True).sum()/1e6:.2f} MB en memoria)")
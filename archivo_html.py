@@ -0,0 +1,92 @@
+"""
+Archivo de páginas HTML de Wikipedia
+====================================
+El crawler guarda aquí el HTML original de cada página de temporada y de
+cada Report, para poder volver a extraer las tablas (reprocesar_html.py)
+sin volver a descargar nada cuando cambia la lógica de parse/parse_race.
+Formato parecido a WARC: un fichero data/html/{year}.warc.gz por temporada
+al que se añaden registros (cabeceras WARC + cuerpo), cada uno como un
+miembro gzip independiente, de modo que se puede leer cualquiera con un
+seek. data/html/index.csv indica para cada (url, revisión) el fichero, la
+posición y la longitud del registro. Una revisión ya archivada no se
+vuelve a guardar.
+"""
+
+import os
+import re
+import csv
+import gzip
+import hashlib
+import threading
+import pandas as pd
+
+HTML_DIR = "data/html"
+INDEX_PATH = os.path.join(HTML_DIR, "index.csv")
+
+CAMPOS_INDICE = ['url', 'revision', 'tipo', 'year', 'race', 'file', 'offset', 'length', 'fetched']
+
+PATRON_REVISION = re.compile(rb'"wgRevisionId":\s*(\d+)')
+
+_claves = None  # (url, revisión) ya archivadas, se cargan en la primera escritura
+_lock = threading.Lock()
+
+def revision(body):
+    """Id de revisión de MediaWiki de la página (o un hash del contenido si no aparece)."""
+    m = PATRON_REVISION.search(body)
+    return m.group(1).decode() if m else "sha1-" + hashlib.sha1(body).hexdigest()[:12]
+
+def cargar_indice_html():
+    """Índice del archivo como DataFrame (vacío si aún no hay nada archivado)."""
+    if not os.path.exists(INDEX_PATH):
+        return pd.DataFrame(columns=CAMPOS_INDICE)
+    return pd.read_csv(INDEX_PATH, dtype={'revision': str, 'race': str})
+
+def archivar(url, body, tipo, year, race="", fetched=""):
+    """
+    Añade una página al archivo si esa revisión no está ya.
+    url: la pedida (antes de redirecciones), que es la que enlaza la página de temporada.
+    tipo: 'season' o 'race'. Devuelve la revisión.
+    """
+    global _claves
+    rev = revision(body)
+
+    with _lock:
+        if _claves is None:
+            indice = cargar_indice_html()
+            _claves = set(zip(indice['url'], indice['revision']))
+        if (url, rev) in _claves:
+            return rev
+
+        cabeceras = (f"WARC/1.0\r\nWARC-Type: response\r\nWARC-Target-URI: {url}\r\n"
+                     f"WARC-Date: {fetched}\r\nWARC-Revision: {rev}\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n").encode()
+        registro = gzip.compress(cabeceras + body + b"\r\n\r\n")
+
+        os.makedirs(HTML_DIR, exist_ok=True)
+        path = os.path.join(HTML_DIR, f"{year}.warc.gz")
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(registro)
+
+        nuevo = not os.path.exists(INDEX_PATH)
+        with open(INDEX_PATH, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if nuevo:
+                writer.writerow(CAMPOS_INDICE)
+            writer.writerow([url, rev, tipo, year, race, os.path.basename(path), offset, len(registro), fetched])
+        _claves.add((url, rev))
+    return rev
+
+def leer_registro(file, offset, length):
+    """Devuelve el HTML (texto) de un registro del archivo."""
+    with open(os.path.join(HTML_DIR, file), "rb") as f:
+        f.seek(int(offset))
+        registro = gzip.decompress(f.read(int(length)))
+    cabeceras, _, body = registro.partition(b"\r\n\r\n")
+    return body[:-4].decode("utf-8")
+
+def ultimas_revisiones(indice=None):
+    """Última revisión archivada de cada URL (la última añadida al índice)."""
+    if indice is None:
+        indice = cargar_indice_html()
+    return indice.drop_duplicates('url', keep='last').reset_index(drop=True)
@@ -0,0 +1,81 @@
+"""
+Caché de etapas por huella de entradas
+======================================
+Cada carrera se fusiona a partir de unas entradas concretas (CSV de
+resultados, CSV de pitstops, posición en el calendario, versión del mapeo
+de pilotos). Se calcula una huella (sha1) de esas entradas y se guarda el
+resultado fusionado de la carrera en cache/{etapa}/. En la siguiente
+ejecución solo se reconstruyen las carreras cuya huella ha cambiado.
+"""
+
+import os
+import json
+import hashlib
+import pandas as pd
+
+from indice_pilotos import entradas_carrera
+
+CACHE_DIR = "cache"
+
+def huella_fichero(path):
+    """sha1 del contenido de un fichero (None si no existe)."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 16), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def huella(*partes):
+    """Huella combinada de cualquier conjunto de valores serializables en JSON."""
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+def huella_carrera(merge_version, season, race_number, race_filename, driver_index):
+    """
+    Huella de las entradas de una carrera, común a merge_limpio y merge_data
+    (cada uno con su MERGE_VERSION): CSV de resultados, CSV de pitstops,
+    posición en el calendario y entradas del índice de pilotos de esa carrera.
+    """
+    return huella(
+        merge_version,
+        huella_fichero(f"data/{season}/{race_filename}"),
+        huella_fichero(f"data/pitstops/{season}/{season}_round{race_number:02d}_pitstops.csv"),
+        season,
+        race_number,
+        entradas_carrera(driver_index, season, race_number).to_dict('list'),
+    )
+
+def cargar_indice(etapa):
+    """Devuelve el índice clave -> huella de una etapa (vacío si no existe)."""
+    path = os.path.join(CACHE_DIR, etapa, "indice.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def guardar_indice(etapa, indice):
+    """Guarda el índice de una etapa de forma atómica."""
+    os.makedirs(os.path.join(CACHE_DIR, etapa), exist_ok=True)
+    path = os.path.join(CACHE_DIR, etapa, "indice.json")
+    with open(path + ".tmp", 'w') as f:
+        json.dump(indice, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def obtener_o_construir(etapa, indice, clave, huella_actual, construir):
+    """
+    Devuelve (resultado, reconstruido). Si la huella guardada para la clave
+    coincide se lee el resultado de caché; si no, se llama a construir(),
+    se guarda el resultado y se actualiza el índice (en memoria).
+    """
+    path = os.path.join(CACHE_DIR, etapa, f"{clave}.pkl")
+
+    if indice.get(clave) == huella_actual and os.path.exists(path):
+        return pd.read_pickle(path), False
+
+    resultado = construir()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.to_pickle(resultado, path)
+    indice[clave] = huella_actual
+    return resultado, True
@@ -0,0 +1,92 @@
+"""
+Calendarios y temporadas desde la API
+=====================================
+Sustituye a los diccionarios fijos de get_season_calendar (solo 2012-2024)
+y a los rangos de temporadas escritos a mano: el calendario de cada
+temporada se descarga una vez de Jolpica (/{season}/races.json) y se guarda
+en data/calendars/{season}.json, y la lista de temporadas (/seasons.json)
+en data/calendars/seasons.json. Las fusiones leen los calendarios de ahí
+sin volver a llamar a la API.
+"""
+
+import os
+import json
+import datetime
+
+CALENDAR_DIR = "data/calendars"
+SEASONS_PATH = os.path.join(CALENDAR_DIR, "seasons.json")
+
+PRIMERA_TEMPORADA = 1950
+
+def _leer_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _guardar_json(path, datos):
+    """Escritura atómica (fichero temporal + os.replace)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def nombre_calendario(race_name):
+    """
+    Nombre de la carrera en el formato de los CSV de data/{season}/:
+    'Mexico City Grand Prix' -> 'Mexico_City', 'Indianapolis 500' -> 'Indianapolis_500'.
+    """
+    return race_name.replace(' ', '_').replace('_Grand_Prix', '')
+
+def carreras_temporada(season, actualizar=False):
+    """
+    Carreras de una temporada ({season, round, raceName}) desde la caché local;
+    se descargan de la API si no están o si actualizar=True.
+    Un calendario vacío (temporada aún sin publicar) no se guarda.
+    """
+    path = os.path.join(CALENDAR_DIR, f"{season}.json")
+    if os.path.exists(path) and not actualizar:
+        return _leer_json(path)
+
+    from funciones_api import get_races_for_season
+
+    races = get_races_for_season(season)
+    if races:
+        _guardar_json(path, races)
+    return races
+
+def calendario_temporada(season):
+    """
+    Nombres de las carreras de la temporada en orden de ronda (lo que antes
+    devolvía get_season_calendar). Si no hay caché y la API no responde,
+    devuelve una lista vacía.
+    """
+    try:
+        races = carreras_temporada(season)
+    except Exception as error:
+        print(f"  ⚠️  No se pudo obtener el calendario de {season}: {error}")
+        return []
+    return [nombre_calendario(r["raceName"]) for r in sorted(races, key=lambda r: r["round"])]
+
+def temporadas(desde=PRIMERA_TEMPORADA, hasta=None, actualizar=False):
+    """
+    Temporadas del campeonato entre desde y hasta (incluidas) según la API
+    (/seasons.json, en caché). Sin caché ni conexión se usa el rango desde
+    PRIMERA_TEMPORADA hasta el año en curso.
+    """
+    if os.path.exists(SEASONS_PATH) and not actualizar:
+        todas = _leer_json(SEASONS_PATH)
+    else:
+        try:
+            from funciones_api import get_seasons
+            todas = get_seasons()
+            _guardar_json(SEASONS_PATH, todas)
+        except Exception as error:
+            print(f"⚠️  No se pudo obtener la lista de temporadas: {error}")
+            todas = list(range(PRIMERA_TEMPORADA, datetime.date.today().year + 1))
+
+    return [s for s in todas if s >= desde and (hasta is None or s <= hasta)]
+
+def temporadas_con_datos(base="data"):
+    """Temporadas con resultados descargados (carpetas data/{season}/)."""
+    if not os.path.isdir(base):
+        return []
+    return sorted(int(d) for d in os.listdir(base) if d.isdigit() and os.path.isdir(os.path.join(base, d)))
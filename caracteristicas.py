@@ -0,0 +1,243 @@
+"""
+Características por piloto para modelado
+========================================
+Etapa posterior a merge_all_data que deriva del dataset fusionado las
+características de ventana que usan los modelos, todas con operaciones
+groupby-rolling/expanding vectorizadas sobre el dataset ordenado una sola
+vez por (DriverKey, Season, RaceNumber):
+- AvgFinishRolling: posición media de llegada en las últimas VENTANA carreras
+- GridDelta: posiciones ganadas desde la parrilla (Grid - FinishPos)
+- Races / DNFCount / DNFRate: carreras, abandonos (Retired, DSQ o DNS) y tasa
+  de abandono acumulados
+- ConstructorPitMedian / ConstructorPitRolling / ConstructorPitTrend: mediana
+  de pitstops de la escudería en la carrera, su media móvil en las últimas
+  VENTANA carreras con datos y la variación de esa media (negativa = más rápida)
+Todas las ventanas incluyen la carrera de la fila: para predecir la carrera k
+se usan las características de la carrera anterior del piloto.
+El resultado se guarda en merged_data/features/ junto a la huella del
+dataset del que sale. Si solo se han añadido carreras posteriores a las ya
+calculadas, se calculan únicamente las nuevas partiendo de las últimas
+VENTANA filas guardadas de cada piloto y escudería.
+"""
+
+import os
+import sys
+import json
+import time
+import pandas as pd
+
+from cache_etapas import huella_fichero
+from esquema import leer_dataset
+
+FEATURES_DIR = "merged_data/features"
+PILOTOS_PATH = os.path.join(FEATURES_DIR, "driver_features.csv")
+ESCUDERIAS_PATH = os.path.join(FEATURES_DIR, "constructor_pitstops.csv")
+META_PATH = os.path.join(FEATURES_DIR, "features_meta.json")
+
+VENTANA = 5
+
+# Incrementar al cambiar el cálculo de las características (invalida las guardadas)
+CARACTERISTICAS_VERSION = 2
+
+# Estados de tiempos_carrera.parse_time_retired que cuentan como abandono (no terminó la carrera)
+ESTADOS_DNF = ['Retired', 'DSQ', 'DNS']
+
+CLAVE_PILOTO = ['DriverKey', 'Season', 'RaceNumber']
+CLAVE_ESCUDERIA = ['Constructor', 'Season', 'RaceNumber']
+
+def preparar_base(df):
+    """
+    Columnas de entrada por fila. DriverKey es el DriverId; en las filas sin
+    él (carreras sin índice de pilotos) se toma el DriverId que ese mismo
+    nombre tiene en otras carreras y, si no hay ninguno, el nombre.
+    """
+    driver = df['Driver'].astype(str)
+    driver_id = df['DriverId'].astype(object) if 'DriverId' in df.columns else pd.Series(None, index=df.index)
+    ids = pd.Series(driver_id.values, index=driver.values).dropna()
+    ids = ids[~ids.index.duplicated(keep='last')]
+
+    base = pd.DataFrame({
+        'DriverKey': driver_id.fillna(driver.map(ids)).fillna(driver).astype(str),
+        'Season': df['Season'].astype(int),
+        'RaceNumber': df['RaceNumber'].astype(int),
+        'Driver': driver,
+        'Constructor': df['Constructor'].astype(str),
+        'FinishPos': pd.to_numeric(df['Position'].astype(object), errors='coerce'),
+        'GridPos': pd.to_numeric(df['Grid'].astype(object), errors='coerce'),
+        'DNF': df['Status'].astype(object).isin(ESTADOS_DNF).astype(int) if 'Status' in df.columns else 0,
+        'PitMedian': pd.to_numeric(df['MedianPitStopDuration'], errors='coerce').astype('float64')
+        if 'MedianPitStopDuration' in df.columns else float('nan'),
+    }, index=df.index)
+    return base.reset_index(drop=True)
+
+def huellas_carreras(base):
+    """Huella de las filas de entrada de cada carrera: {'2024-03': '...'}."""
+    filas = pd.util.hash_pandas_object(base, index=False)
+    por_carrera = filas.groupby([base['Season'], base['RaceNumber']]).sum()
+    return {f"{s}-{r:02d}": str(h) for (s, r), h in por_carrera.items()}
+
+def _ventana_por_grupo(tabla, grupo, col, ventana):
+    """Media móvil de col en las últimas 'ventana' filas de cada grupo (tabla ya ordenada)."""
+    return (tabla.groupby(grupo, sort=False)[col]
+            .rolling(ventana, min_periods=1).mean()
+            .reset_index(level=0, drop=True))
+
+def caracteristicas_pilotos(base, ventana=VENTANA, previas=None):
+    """
+    Características por piloto de las filas de base.
+    previas: filas ya calculadas de carreras anteriores; de cada piloto se
+    usan sus últimas 'ventana' filas como contexto y su último acumulado como punto de partida.
+    """
+    nuevas = base.drop(columns=['PitMedian', 'GridPos']).assign(GridDelta=base['GridPos'] - base['FinishPos'])
+    partes = [nuevas.assign(_nueva=True)]
+    if previas is not None and len(previas):
+        contexto = (previas[previas['DriverKey'].isin(nuevas['DriverKey'])]
+                    .sort_values(CLAVE_PILOTO).groupby('DriverKey', sort=False).tail(ventana))
+        partes.insert(0, contexto[nuevas.columns].assign(_nueva=False))
+
+    # Única ordenación: piloto y orden cronológico
+    tabla = pd.concat(partes, ignore_index=True).sort_values(CLAVE_PILOTO, kind='stable', ignore_index=True)
+    tabla['AvgFinishRolling'] = _ventana_por_grupo(tabla, 'DriverKey', 'FinishPos', ventana)
+    tabla = tabla[tabla['_nueva']].drop(columns='_nueva').reset_index(drop=True)
+
+    # Acumulados: suma dentro de las filas nuevas más el último acumulado guardado del piloto
+    grupos = tabla.groupby('DriverKey', sort=False)
+    tabla['Races'] = grupos.cumcount() + 1
+    tabla['DNFCount'] = grupos['DNF'].cumsum()
+    if len(partes) > 1:
+        ultimos = previas.sort_values(CLAVE_PILOTO).groupby('DriverKey')[['Races', 'DNFCount']].last()
+        for col in ['Races', 'DNFCount']:
+            tabla[col] += tabla['DriverKey'].map(ultimos[col]).fillna(0).astype(int)
+    tabla['DNFRate'] = tabla['DNFCount'] / tabla['Races']
+    return tabla
+
+def caracteristicas_escuderias(base, ventana=VENTANA, previas=None):
+    """
+    Mediana de pitstops por escudería y carrera (solo carreras con datos),
+    su media móvil y su tendencia. previas: tabla ya calculada de carreras anteriores.
+    """
+    nuevas = (base[base['PitMedian'].notna()]
+              .groupby(CLAVE_ESCUDERIA, sort=False)['PitMedian'].median()
+              .rename('ConstructorPitMedian').reset_index())
+    partes = [nuevas.assign(ConstructorPitRolling=float('nan'), _nueva=True)]
+    if previas is not None and len(previas):
+        contexto = (previas[previas['Constructor'].isin(nuevas['Constructor'])]
+                    .sort_values(CLAVE_ESCUDERIA).groupby('Constructor', sort=False).tail(ventana))
+        partes.insert(0, contexto[partes[0].columns.drop('_nueva')].assign(_nueva=False))
+
+    tabla = pd.concat(partes, ignore_index=True).sort_values(CLAVE_ESCUDERIA, kind='stable', ignore_index=True)
+    # El contexto conserva su media guardada (recalculada tendría la ventana recortada)
+    movil = _ventana_por_grupo(tabla, 'Constructor', 'ConstructorPitMedian', ventana)
+    tabla['ConstructorPitRolling'] = tabla['ConstructorPitRolling'].where(~tabla['_nueva'], movil)
+    tabla['ConstructorPitTrend'] = tabla.groupby('Constructor', sort=False)['ConstructorPitRolling'].diff()
+    return tabla[tabla['_nueva']].drop(columns='_nueva').reset_index(drop=True)
+
+def calcular_caracteristicas(base, ventana=VENTANA, previas_pilotos=None, previas_escuderias=None):
+    """Devuelve (pilotos, escuderías) de las filas de base, con las escuderías unidas a cada fila."""
+    escuderias = caracteristicas_escuderias(base, ventana, previas_escuderias)
+    pilotos = caracteristicas_pilotos(base, ventana, previas_pilotos)
+    # Las filas de pilotos son de las mismas carreras: basta con las escuderías recién calculadas
+    pilotos = pilotos.merge(escuderias, on=CLAVE_ESCUDERIA, how='left')
+    return pilotos, escuderias
+
+def _guardar_csv(df, path):
+    df.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+def cargar_caracteristicas():
+    """Características guardadas: (pilotos, escuderías, metadatos) o None si no hay."""
+    if not all(os.path.exists(p) for p in [PILOTOS_PATH, ESCUDERIAS_PATH, META_PATH]):
+        return None
+    with open(META_PATH) as f:
+        meta = json.load(f)
+    tipos = {'DriverKey': str, 'Driver': str, 'Constructor': str}
+    return pd.read_csv(PILOTOS_PATH, dtype=tipos), pd.read_csv(ESCUDERIAS_PATH, dtype=tipos), meta
+
+def actualizar_caracteristicas(df, dataset_path, ventana=VENTANA, forzar=False):
+    """
+    Actualiza las características a partir del dataset final (df, ya escrito en dataset_path).
+    - Misma huella de dataset, ventana y CARACTERISTICAS_VERSION: se devuelven las guardadas.
+    - Carreras guardadas sin cambios y las nuevas todas posteriores: se calculan solo las nuevas.
+    - En otro caso (carreras modificadas, borradas o intercaladas): cálculo completo.
+    Devuelve el DataFrame de características por piloto.
+    """
+    version = huella_fichero(dataset_path)
+    guardadas = None if forzar else cargar_caracteristicas()
+    if guardadas is not None and guardadas[2].get('logica') != CARACTERISTICAS_VERSION:
+        guardadas = None
+    if guardadas is not None and guardadas[2].get('ventana') == ventana and guardadas[2].get('dataset') == version:
+        print(f"  🧮 Características al día ({len(guardadas[0]):,} filas)")
+        return guardadas[0]
+
+    base = preparar_base(df)
+    huellas = huellas_carreras(base)
+
+    modo, previas_pilotos, previas_escuderias = 'completo', None, None
+    if guardadas is not None and guardadas[2].get('ventana') == ventana:
+        anteriores = guardadas[2].get('races', {})
+        nuevas = sorted(set(huellas) - set(anteriores))
+        intactas = all(huellas.get(carrera) == h for carrera, h in anteriores.items())
+        if intactas and (not nuevas or not anteriores or nuevas[0] > max(anteriores)):
+            modo, (previas_pilotos, previas_escuderias, _) = 'incremental', guardadas
+            clave = base['Season'].astype(str) + '-' + base['RaceNumber'].map('{:02d}'.format)
+            base = base[clave.isin(nuevas)].reset_index(drop=True)
+
+    if len(base):
+        pilotos, escuderias = calcular_caracteristicas(base, ventana, previas_pilotos, previas_escuderias)
+    else:  # mismas carreras (el fichero cambia en columnas que no intervienen)
+        pilotos, escuderias = previas_pilotos.iloc[:0], previas_escuderias.iloc[:0]
+    if modo == 'incremental':
+        pilotos = pd.concat([previas_pilotos, pilotos], ignore_index=True)
+        escuderias = pd.concat([previas_escuderias, escuderias], ignore_index=True)
+    pilotos = pilotos.sort_values(CLAVE_PILOTO, ignore_index=True)
+    escuderias = escuderias.sort_values(CLAVE_ESCUDERIA, ignore_index=True)
+
+    os.makedirs(FEATURES_DIR, exist_ok=True)
+    _guardar_csv(pilotos, PILOTOS_PATH)
+    _guardar_csv(escuderias, ESCUDERIAS_PATH)
+    with open(META_PATH + ".tmp", 'w') as f:
+        json.dump({'dataset': version, 'ventana': ventana, 'logica': CARACTERISTICAS_VERSION, 'races': huellas,
+                   'generated_date': pd.Timestamp.now().isoformat()}, f, indent=2, sort_keys=True)
+    os.replace(META_PATH + ".tmp", META_PATH)
+
+    print(f"  🧮 Características ({modo}): {len(base):,} filas calculadas, {len(pilotos):,} en total")
+    return pilotos
+
+def comparar_incremental(dataset_path="merged_data/f1_clean_dataset.csv", ventana=VENTANA):
+    """
+    Comprueba que el cálculo incremental da lo mismo que el completo: calcula
+    las características de todas las temporadas menos la última y añade
+    después la última como carreras nuevas.
+    """
+    from pandas.testing import assert_frame_equal
+
+    base = preparar_base(leer_dataset(dataset_path))
+    ultima = base['Season'].max()
+
+    inicio = time.perf_counter()
+    completo, _ = calcular_caracteristicas(base, ventana)
+    segundos_completo = time.perf_counter() - inicio
+
+    previas_pilotos, previas_escuderias = calcular_caracteristicas(base[base['Season'] < ultima], ventana)
+    inicio = time.perf_counter()
+    pilotos, _ = calcular_caracteristicas(base[base['Season'] == ultima], ventana,
+                                          previas_pilotos, previas_escuderias)
+    segundos_incremental = time.perf_counter() - inicio
+    incremental = pd.concat([previas_pilotos, pilotos]).sort_values(CLAVE_PILOTO, ignore_index=True)
+
+    completo = completo.sort_values(CLAVE_PILOTO, ignore_index=True)[incremental.columns]
+    try:
+        assert_frame_equal(completo, incremental, check_dtype=False)
+    except AssertionError as error:
+        print(f"❌ Incremental y completo difieren:\n{error}")
+        return False
+
+    print(f"✅ Completo {len(completo):,} filas en {segundos_completo*1000:.1f} ms | "
+          f"incremental ({ultima}: {len(pilotos):,} filas) en {segundos_incremental*1000:.1f} ms: iguales")
+    return True
+
+if __name__ == "__main__":
+    # Uso: python caracteristicas.py [csv]  -> recalcula y comprueba incremental == completo
+    path = sys.argv[1] if len(sys.argv) > 1 else "merged_data/f1_clean_dataset.csv"
+    actualizar_caracteristicas(leer_dataset(path), path)
+    sys.exit(0 if comparar_incremental(path) else 1)
@@ -0,0 +1,163 @@
+"""
+Dataset fusionado en Arrow IPC (Feather v2) con memory-map
+==========================================================
+Cada proceso de análisis que hace read_csv del dataset paga el parseo y se
+queda con su propia copia en memoria. El merge publica además el dataset
+como fichero Arrow IPC sin comprimir, y cargar_tabla() lo abre con
+memory-map: todos los procesos comparten la misma copia en la caché de
+páginas del sistema y las columnas se leen sin copiar.
+Publicación sin bloqueos:
+- cada build se escribe con nombre versionado (f1_clean_dataset.v0003.arrow)
+  y un os.replace atómico desde un fichero temporal;
+- después se actualiza, también con os.replace, el puntero
+  f1_clean_dataset.arrow.json, que es lo que leen los lectores;
+- un lector que ya tiene abierta una versión anterior sigue usándola; se
+  conservan las CONSERVAR últimas versiones.
+pyarrow es opcional: sin él el merge solo escribe el CSV.
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow es opcional: sin él no se publica el .arrow
+    pa = None
+
+from esquema import aplicar_esquema, leer_dataset
+
+CONSERVAR = 3
+
+def _base(csv_path):
+    """'merged_data/f1_clean_dataset.csv' -> 'merged_data/f1_clean_dataset'."""
+    return os.path.splitext(csv_path)[0]
+
+def ruta_puntero(csv_path):
+    return _base(csv_path) + ".arrow.json"
+
+def _versiones(csv_path):
+    """Versiones publicadas como [(número, ruta)], de la más antigua a la más reciente."""
+    patron = re.compile(re.escape(os.path.basename(_base(csv_path))) + r"\.v(\d+)\.arrow$")
+    versiones = []
+    for path in glob.glob(_base(csv_path) + ".v*.arrow"):
+        m = patron.search(os.path.basename(path))
+        if m:
+            versiones.append((int(m.group(1)), path))
+    return sorted(versiones)
+
+def ultima_version(csv_path):
+    """Número de la última versión Arrow publicada (0 si no hay ninguna)."""
+    versiones = _versiones(csv_path)
+    return versiones[-1][0] if versiones else 0
+
+def ruta_version(csv_path, version):
+    """Ruta del fichero Arrow de una versión concreta."""
+    return f"{_base(csv_path)}.v{version:04d}.arrow"
+
+def publicar_arrow(df, csv_path, version=None):
+    """
+    Publica df como nueva versión Arrow IPC junto a csv_path y actualiza el
+    puntero. version: número de build (por defecto, la siguiente a la última
+    publicada). Devuelve la ruta publicada (o None si no hay pyarrow).
+    """
+    if pa is None:
+        print("  ⚠️  pyarrow no instalado: no se publica la versión Arrow")
+        return None
+
+    versiones = _versiones(csv_path)
+    if version is None:
+        version = versiones[-1][0] + 1 if versiones else 1
+    path = ruta_version(csv_path, version)
+
+    # Sin compresión: es lo que permite leer las columnas directamente del mapa de memoria
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(tabla, path + ".tmp", compression="uncompressed")
+    os.replace(path + ".tmp", path)
+
+    puntero = ruta_puntero(csv_path)
+    with open(puntero + ".tmp", "w") as f:
+        json.dump({"version": version, "file": os.path.basename(path), "rows": tabla.num_rows,
+                   "generated_date": pd.Timestamp.now().isoformat()}, f, indent=2)
+    os.replace(puntero + ".tmp", puntero)
+
+    # Versiones antiguas: en POSIX un lector que la tenga mapeada sigue pudiendo leerla;
+    # en Windows el borrado falla mientras esté abierta y se reintenta en la siguiente publicación
+    for _, antigua in versiones[:-(CONSERVAR - 1) or None]:
+        try:
+            os.remove(antigua)
+        except OSError:
+            pass
+
+    print(f"  🏹 Arrow IPC: {path} (v{version})")
+    return path
+
+def ruta_actual(csv_path="merged_data/f1_clean_dataset.csv"):
+    """Ruta de la última versión publicada según el puntero."""
+    puntero = ruta_puntero(csv_path)
+    with open(puntero) as f:
+        return os.path.join(os.path.dirname(puntero), json.load(f)["file"])
+
+def cargar_tabla(csv_path="merged_data/f1_clean_dataset.csv", columnas=None, version=None):
+    """
+    Abre la última versión (o la indicada, si aún se conserva) con memory-map
+    y devuelve una pyarrow.Table cuyas columnas apuntan directamente al
+    fichero mapeado (sin copia).
+    """
+    if pa is None:
+        raise ImportError("cargar_tabla necesita pyarrow")
+    path = ruta_actual(csv_path) if version is None else ruta_version(csv_path, version)
+    return feather.read_table(path, columns=columnas, memory_map=True)
+
+def cargar_dataframe(csv_path="merged_data/f1_clean_dataset.csv", columnas=None, copia=False, version=None):
+    """
+    DataFrame de la última versión publicada (o de la indicada).
+    copia=False: columnas pd.ArrowDtype respaldadas por el mapa de memoria (sin copia).
+    copia=True: columnas NumPy con los tipos de ESQUEMA_DATASET (igual que leer_dataset).
+    """
+    tabla = cargar_tabla(csv_path, columnas, version)
+    if copia:
+        return aplicar_esquema(tabla.to_pandas())
+    return tabla.to_pandas(types_mapper=pd.ArrowDtype)
+
+def _trabajador(args):
+    """Carga en un proceso nuevo y devuelve (segundos, memoria privada MB tras cargar)."""
+    modo, csv_path = args
+    inicio = time.perf_counter()
+    if modo == "csv":
+        df = leer_dataset(csv_path)
+    else:
+        df = cargar_dataframe(csv_path)
+    segundos = time.perf_counter() - inicio
+    df['Season'].sum()  # recorrer una columna: con memory-map las páginas se leen al usarlas
+
+    # Memoria privada (no compartida) del proceso: lo que cada trabajador añade de verdad
+    privada = 0
+    if os.path.exists("/proc/self/smaps_rollup"):
+        with open("/proc/self/smaps_rollup") as f:
+            for linea in f:
+                if linea.startswith(("Private_Clean", "Private_Dirty")):
+                    privada += int(linea.split()[1])
+    return segundos, privada / 1024
+
+def benchmark(csv_path="merged_data/f1_clean_dataset.csv", procesos=4):
+    """Compara read_csv con la carga memory-mapped en 'procesos' trabajadores a la vez."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    print(f"📊 {procesos} trabajadores cargando {csv_path} / {ruta_actual(csv_path)}")
+    for modo in ("csv", "arrow"):
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = list(pool.map(_trabajador, [(modo, csv_path)] * procesos))
+        segundos = [r[0] for r in resultados]
+        privada = [r[1] for r in resultados]
+        print(f"   {modo:<6} carga media {sum(segundos)/procesos*1000:8.1f} ms | "
+              f"memoria privada media {sum(privada)/procesos:7.1f} MB")
+
+if __name__ == "__main__":
+    # Uso: python dataset_arrow.py [procesos]
+    benchmark(procesos=int(sys.argv[1]) if len(sys.argv) > 1 else 4)
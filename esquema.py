@@ -0,0 +1,140 @@
+"""
+Esquema de tipos del dataset fusionado
+======================================
+Declara los tipos de cada columna de los datasets de merged_data para que
+los procesos de análisis los carguen ya compactos:
+- Cadenas de baja cardinalidad como 'category'
+- Enteros pequeños como enteros nulables reducidos (Int8/Int16)
+- Duraciones y puntos como float32
+El esquema se aplica en la lectura (read_csv(dtype=...)) y no después.
+También define el registro de alias de columnas de las tablas de Wikipedia,
+que se resuelve una única vez al leer cada CSV de resultados.
+"""
+
+import re
+import pandas as pd
+
+# Registro de alias: nombre en la tabla de Wikipedia -> nombre canónico
+# (las notas al pie tipo 'Grid[43]' se eliminan antes de buscar el alias)
+ALIAS_COLUMNAS = {
+    'Pos.': 'Position',
+    'Pos': 'Position',
+    'No.': 'DriverNumber',
+    'No': 'DriverNumber',
+    'Number': 'DriverNumber',
+    'Driver Number': 'DriverNumber',
+    'Num': 'DriverNumber',
+    'Car number': 'DriverNumber',
+    'Pts.': 'Points',
+    'Points1': 'Points',
+    'Laps1': 'Laps',
+    'Lapsa': 'Laps',
+}
+
+NOTA_AL_PIE = re.compile(r'\[[^\]]*\]$')
+
+# Columnas con códigos mixtos (Ret, DSQ, NC, PL...) se guardan como categoría
+ESQUEMA_DATASET = {
+    'Season': 'Int16',
+    'RaceNumber': 'Int8',
+    'RaceName': 'category',
+    'Position': 'category',
+    'DriverNumber': 'Int16',  # mismo tipo que la clave de merge (clave_numero); hay dorsales > 127
+    'Driver': 'category',
+    'Constructor': 'category',
+    'Laps': 'Int16',
+    'RaceTimeMs': 'Int32',
+    'GapMs': 'Int32',
+    'LapsDown': 'Int8',
+    'Status': 'category',
+    'Grid': 'category',
+    'Points': 'float32',
+    'DriverId': 'category',
+    'NPitstops': 'Int8',
+    'MedianPitStopDuration': 'float32',
+    'LapsTimed': 'Int16',
+    'BestLapMs': 'Int32',
+    'AvgLapMs': 'float32',
+    'MedianLapMs': 'float32',
+}
+
+def clave_numero(serie):
+    """
+    Convierte una columna de números de piloto en clave de merge (Int16).
+    Sustituye al .astype(str): valores no numéricos quedan como <NA>.
+    """
+    return pd.to_numeric(serie, errors='coerce').astype('Int16')
+
+def nombre_canonico(col):
+    """Devuelve el nombre canónico de una columna (None si debe descartarse)."""
+    col = str(col).strip()
+    if col.startswith('Unnamed'):
+        return None
+    col = NOTA_AL_PIE.sub('', col)
+    return ALIAS_COLUMNAS.get(col, col)
+
+def leer_resultados(path):
+    """
+    Lee un CSV de resultados de data/{season} con las columnas ya canónicas.
+    Solo se lee la cabecera para resolver los alias; después se cargan con
+    usecols únicamente las columnas útiles (sin 'Unnamed' ni repetidas)
+    y se renombran en la cabecera, sin pasadas de limpieza posteriores.
+    """
+    cabecera = pd.read_csv(path, nrows=0).columns
+
+    mapeo = {}
+    for col in cabecera:
+        canonico = nombre_canonico(col)
+        if canonico is not None and canonico not in mapeo.values():
+            mapeo[col] = canonico
+
+    # Las columnas categóricas (con códigos como Ret, DSQ o PL) se leen como texto
+    texto = {col: str for col, canonico in mapeo.items() if ESQUEMA_DATASET.get(canonico) == 'category'}
+    df = pd.read_csv(path, usecols=list(mapeo), dtype=texto)
+    df.columns = [mapeo[col] for col in df.columns]
+    return df
+
+def aplicar_esquema(df, esquema=ESQUEMA_DATASET):
+    """Convierte un DataFrame en memoria a los tipos del esquema (antes de exportar)."""
+    df = df.copy()
+    for col, dtype in esquema.items():
+        if col not in df.columns:
+            continue
+        if dtype.startswith('Int') or dtype.startswith('float'):
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        elif dtype == 'category':
+            # Categorías siempre como texto, igual que al leer con read_csv(dtype='category')
+            valores = df[col].astype(object)
+            con_valor = valores.notna()
+            df[col] = valores.where(~con_valor, valores[con_valor].astype(str)).astype('category')
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def leer_dataset(path, columnas=None, esquema=ESQUEMA_DATASET):
+    """
+    Lee un CSV de merged_data aplicando el esquema en la propia lectura.
+    Las columnas del esquema que no estén en el fichero se ignoran.
+    """
+    return pd.read_csv(path, usecols=columnas, dtype=esquema)
+
+def informe_memoria(path, esquema=ESQUEMA_DATASET):
+    """Compara la memoria del dataset leído sin esquema y con esquema."""
+    antes = pd.read_csv(path).memory_usage(deep=True, index=False)
+    despues = leer_dataset(path, esquema=esquema).memory_usage(deep=True, index=False)
+
+    informe = pd.DataFrame({'antes_MB': antes / 1e6, 'despues_MB': despues / 1e6})
+    informe['ahorro_%'] = (1 - informe['despues_MB'] / informe['antes_MB']) * 100
+
+    print(f"\n💾 MEMORIA DEL DATASET: {path}")
+    print(informe.round(3).to_string())
+    print(f"   Total: {antes.sum()/1e6:.2f} MB -> {despues.sum()/1e6:.2f} MB "
+          f"({(1 - despues.sum()/antes.sum())*100:.1f}% menos)")
+    return informe
+
+if __name__ == "__main__":
+    for path in ["merged_data/f1_clean_dataset.csv", "merged_data/f1_complete_dataset.csv"]:
+        try:
+            informe_memoria(path)
+        except FileNotFoundError:
+            print(f"No existe {path}")
@@ -0,0 +1,238 @@
+"""
+Punto de entrada único del proyecto
+===================================
+    python f1.py crawl [temporadas] [--jobdir DIR]   resultados de Wikipedia (Scrapy)
+    python f1.py fetch-pitstops [temporadas]         pitstops de Jolpica
+    python f1.py merge [--engine polars] [--completo]
+    python f1.py validate [csv] [--filas] [--reglas]
+    python f1.py stats [csv] [--filas]
+    python f1.py bench-startup [--limite-ms 300]
+Al importar este módulo solo se cargan módulos de la biblioteca estándar:
+pandas, Scrapy/Twisted, requests o pyarrow se importan dentro del comando
+que los necesita. validate y stats trabajan solo con el *_metadata.json
+(filas, columnas y estadísticas por temporada de particiones.py) mientras
+describa el CSV actual, así que en los cron no pagan el arranque de pandas
+(validate --reglas sí lee las filas, por trozos, para las reglas por carrera).
+bench-startup mide el arranque de los comandos ligeros y falla si alguno
+importa una dependencia pesada o supera el límite.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+DATASET_PATH = "merged_data/f1_clean_dataset.csv"
+
+# Módulos que no deben cargarse al arrancar ni en los comandos ligeros
+PESADOS = ['pandas', 'numpy', 'scrapy', 'twisted', 'requests', 'pyarrow', 'polars']
+
+LIMITE_ARRANQUE_MS = 300
+
+def cargar_metadatos(csv_path):
+    """
+    Metadatos del dataset si describen el CSV actual (existe, tiene
+    particiones y su tamaño coincide con el final de la última); si no, None.
+    """
+    metadata_path = csv_path.replace('.csv', '_metadata.json')
+    if not os.path.exists(csv_path) or not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    particiones = metadata.get('partitions')
+    if not particiones or particiones[-1]['byte_end'] != os.path.getsize(csv_path):
+        return None
+    return metadata
+
+def _nulos(metadata):
+    """Nulos por columna sumando los de cada temporada."""
+    nulos = dict.fromkeys(metadata['columns'], 0)
+    for p in metadata['partitions']:
+        for col, n in p['null_counts'].items():
+            nulos[col] = nulos.get(col, 0) + n
+    return nulos
+
+def comprobaciones_metadatos(metadata):
+    """Las comprobaciones de validate_dataset que no necesitan leer filas."""
+    columnas = metadata['columns']
+    nulos = _nulos(metadata)
+    return [
+        ("Dataset no vacío", metadata['total_rows'] > 0),
+        ("Columnas Season y RaceNumber presentes", all(col in columnas for col in ['Season', 'RaceNumber'])),
+        ("Season y RaceNumber sin nulos", nulos.get('Season', 1) == 0 and nulos.get('RaceNumber', 1) == 0),
+        ("Sin columnas Unnamed", not any('Unnamed' in col for col in columnas)),
+        ("Sin columnas duplicadas _x/_y", not any(col.endswith('_x') or col.endswith('_y') for col in columnas)),
+        ("DriverNumber presente", 'DriverNumber' in columnas),
+        ("Columnas de pitstops presentes",
+         all(col in columnas for col in ['DriverId', 'NPitstops', 'MedianPitStopDuration'])),
+        ("Filas de las particiones = total_rows",
+         sum(p['rows'] for p in metadata['partitions']) == metadata['total_rows']),
+    ]
+
+def cmd_crawl(args):
+    from scrapy.crawler import CrawlerProcess
+    from f1spiders import F1Spider
+
+    process = CrawlerProcess({'JOBDIR': args.jobdir} if args.jobdir else None)
+    process.crawl(F1Spider, seasons=args.seasons or None)
+    process.start()
+    return 0
+
+def cmd_fetch_pitstops(args):
+    from calendarios import temporadas
+    from funciones_api import PITSTOPS_DESDE, build_pitstops_for_season, crear_dir, get_all_drivers
+
+    crear_dir()
+    driver_number_map = get_all_drivers()
+    for season in args.seasons or temporadas(desde=PITSTOPS_DESDE):
+        build_pitstops_for_season(season, driver_number_map, saltar_existentes=args.saltar_existentes)
+    return 0
+
+def cmd_merge(args):
+    if args.completo:
+        from merge_data import merge_all_data
+        dataset = merge_all_data()
+    else:
+        from merge_limpio import merge_all_data
+        dataset = merge_all_data(args.engine)
+    return 0 if dataset is not None else 1
+
+def cmd_validate(args):
+    metadata = None if args.filas else cargar_metadatos(args.csv)
+    if metadata is None:
+        if not os.path.exists(args.csv):
+            print(f"❌ No existe {args.csv}")
+            return 1
+        from esquema import leer_dataset
+        from merge_limpio import validate_dataset
+        return 0 if validate_dataset(leer_dataset(args.csv)) else 1
+
+    print(f"🔎 Validación desde metadatos: {args.csv} (versión {metadata.get('version', '?')})")
+    todo_ok = True
+    for nombre, condicion in comprobaciones_metadatos(metadata):
+        print(f"  {'✅' if condicion else '❌'} {nombre}")
+        todo_ok = todo_ok and condicion
+
+    # Las reglas por carrera necesitan las filas: se leen por trozos
+    if args.reglas and todo_ok:
+        from validacion import imprimir_informe, validar_csv
+        informe = validar_csv(args.csv, chunksize=args.chunksize)
+        imprimir_informe(informe)
+        todo_ok = informe['ok']
+    return 0 if todo_ok else 1
+
+def cmd_stats(args):
+    metadata = None if args.filas else cargar_metadatos(args.csv)
+    if metadata is None:
+        if not os.path.exists(args.csv):
+            print(f"❌ No existe {args.csv}")
+            return 1
+        from esquema import leer_dataset
+        from merge_limpio import print_stats
+        print_stats(leer_dataset(args.csv), args.csv)
+        return 0
+
+    total = metadata['total_rows']
+    print(f"📁 {args.csv} (versión {metadata.get('version', '?')}, {metadata['generated_date'][:19]})")
+    print(f"📊 {total:,} filas, {metadata['total_columns']} columnas, temporadas {metadata['season_range']}")
+
+    print(f"\n📋 COLUMNAS:")
+    for i, (col, nulos) in enumerate(_nulos(metadata).items(), 1):
+        no_nulos = total - nulos
+        print(f"   {i:2}. {col:<25} {no_nulos:>6} ({no_nulos / max(total, 1) * 100:>5.1f}%)")
+
+    print(f"\n📅 POR TEMPORADA:")
+    for p in metadata['partitions']:
+        con_pitstops = p['rows'] - p['null_counts'].get('NPitstops', p['rows'])
+        pilotos = p.get('distinct_drivers', '?')
+        carreras = p.get('RaceNumber', {}).get('max') or '?'
+        pitstops = f"{con_pitstops:>4} con pitstops ({con_pitstops / max(p['rows'], 1) * 100:>5.1f}%)" \
+            if con_pitstops else "sin pitstops"
+        print(f"   {p['Season']}: {p['rows']:>4} filas | {carreras:>2} carreras | {pilotos:>3} pilotos | {pitstops}")
+    return 0
+
+def _medir(argumentos, repeticiones):
+    """Mediana en ms de lanzar 'python <argumentos>' en un proceso nuevo."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, *argumentos], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tiempos)[len(tiempos) // 2]
+
+def importados_por(comando):
+    """Módulos de PESADOS cargados al ejecutar 'f1.py <comando>' (en un proceso aparte)."""
+    path = os.path.abspath(__file__)
+    sonda = (f"import sys, runpy\n"
+             f"sys.path.insert(0, {os.path.dirname(path)!r}); sys.argv = [{path!r}] + sys.argv[1:]\n"
+             f"try:\n    runpy.run_path({path!r}, run_name='__main__')\nexcept SystemExit:\n    pass\n"
+             f"print('PESADOS=' + ','.join(m for m in {PESADOS!r} if m in sys.modules))")
+    salida = subprocess.run([sys.executable, '-c', sonda, *comando], capture_output=True, text=True).stdout
+    linea = next((l for l in reversed(salida.splitlines()) if l.startswith('PESADOS=')), 'PESADOS=?')
+    return [m for m in linea[len('PESADOS='):].split(',') if m]
+
+def cmd_bench_startup(args):
+    comandos = [['--help'], ['stats', args.csv], ['validate', args.csv]]
+    base = _medir(['-c', 'pass'], args.repeticiones)
+    print(f"⏱️  Arranque (mediana de {args.repeticiones}; intérprete vacío {base:.0f} ms, "
+          f"límite +{args.limite_ms} ms)")
+
+    todo_ok = True
+    for comando in comandos:
+        ms = _medir([os.path.abspath(__file__), *comando], args.repeticiones)
+        pesados = importados_por(comando)
+        ok = ms - base <= args.limite_ms and not pesados
+        todo_ok = todo_ok and ok
+        print(f"  {'✅' if ok else '❌'} f1.py {' '.join(comando):<45} {ms:>6.0f} ms"
+              f"{' | importa ' + ', '.join(pesados) if pesados else ''}")
+
+    print(f"  (referencia, solo 'import pandas': {_medir(['-c', 'import pandas'], args.repeticiones):.0f} ms)")
+    return 0 if todo_ok else 1
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="f1.py", description="Dataset de F1: descarga, fusión y validación")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("crawl", help="resultados de Wikipedia (Scrapy)")
+    p.add_argument("seasons", nargs="*", type=int, help="temporadas (por defecto, todas)")
+    p.add_argument("--jobdir", help="directorio de estado de Scrapy para reanudar un crawl interrumpido")
+    p.set_defaults(funcion=cmd_crawl)
+
+    p = sub.add_parser("fetch-pitstops", help="pitstops de Jolpica")
+    p.add_argument("seasons", nargs="*", type=int, help="temporadas (por defecto, todas las que tienen pitstops)")
+    p.add_argument("--saltar-existentes", action="store_true", help="no volver a pedir carreras ya descargadas")
+    p.set_defaults(funcion=cmd_fetch_pitstops)
+
+    p = sub.add_parser("merge", help="fusión de resultados y pitstops")
+    p.add_argument("--engine", choices=["pandas", "polars"], default="pandas",
+                   help="motor de ejecución (polars requiere el paquete polars)")
+    p.add_argument("--completo", action="store_true", help="dataset completo de merge_data.py")
+    p.set_defaults(funcion=cmd_merge)
+
+    for nombre, funcion, ayuda in [("validate", cmd_validate, "valida el dataset"),
+                                   ("stats", cmd_stats, "estadísticas del dataset")]:
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("csv", nargs="?", default=DATASET_PATH, help=f"dataset (por defecto {DATASET_PATH})")
+        p.add_argument("--filas", action="store_true", help="leer el CSV aunque los metadatos estén al día")
+        p.set_defaults(funcion=funcion)
+        if nombre == "validate":
+            p.add_argument("--reglas", action="store_true",
+                           help="evaluar también las reglas por carrera de validacion.py (lee el CSV por trozos)")
+            p.add_argument("--chunksize", type=int, default=50_000, help="filas por trozo con --reglas")
+
+    p = sub.add_parser("bench-startup", help="mide el arranque de los comandos ligeros")
+    p.add_argument("csv", nargs="?", default=DATASET_PATH)
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.add_argument("--limite-ms", type=int, default=LIMITE_ARRANQUE_MS,
+                   help="máximo por encima del intérprete vacío")
+    p.set_defaults(funcion=cmd_bench_startup)
+    return parser
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.funcion(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,34 @@
 #-----PARTE 1:CRAWLER-----#
 import scrapy
 from scrapy.crawler import CrawlerProcess
+from scrapy.selector import Selector
 import pandas as pd
+import argparse
 import os
 import io
+import re
+from archivo_html import archivar
+from calendarios import temporadas
 
 class F1Spider(scrapy.Spider):
     name = 'F1_spider'
+    custom_settings = { #Límites para no saturar Wikipedia (los 429 y errores 5xx se reintentan)
+        'DOWNLOAD_DELAY': 0.5,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'AUTOTHROTTLE_ENABLED': True,
+        'RETRY_TIMES': 5,
+        'RETRY_HTTP_CODES': [429, 500, 502, 503, 504, 522, 524, 408],
+    }
+
+    def __init__(self, seasons=None, *args, **kwargs):
+        """
+        :param seasons: temporadas a rastrear (lista o texto '1950,1951' con scrapy crawl -a);
+                        por defecto, todas las temporadas del campeonato
+        """
+        super().__init__(*args, **kwargs)
+        if isinstance(seasons, str):
+            seasons = [int(s) for s in seasons.split(',')]
+        self.seasons = seasons
 
     def start_requests(self):
         """
@@ -14,12 +36,9 @@ class F1Spider(scrapy.Spider):
         
         :param self: 
         """
-        urls_years = [f'https://en.wikipedia.org/wiki/{i}_Formula_One_World_Championship' for i in range(2012,2025)] #Extraemos las urls por años guardándolas en una lista
-        year = 2012
-
-        for url in urls_years:
+        for year in self.seasons or temporadas(): #Una url por temporada (lista de temporadas de la API, en caché)
+            url = f'https://en.wikipedia.org/wiki/{year}_Formula_One_World_Championship'
             yield scrapy.Request(url = url,callback=self.parse,meta = {'year':year}) #Pasamos como metadato el año para posteriormente guardar los csv 
-            year += 1
 
     def parse(self,response):
         """
@@ -30,66 +49,184 @@ class F1Spider(scrapy.Spider):
         :param response: Obtenido de la función start_requests()
         """
         year = response.meta['year'] #Guardamos el metadato
-        table_selector = response.css('table.wikitable.sortable tr')[1:] #Extraemos la tabla de la página que buscamos
-
-        for table in table_selector:
-            text = table.css('td::text').getall() #Obtenemos lo que serían los encabezados
+        archivar_respuesta(response, 'season', year) #Guardamos el HTML para poder reprocesarlo sin red (reprocesar_html.py)
 
-            if not text: #Si no hay encabezados no nos vale
-                continue
-
-            url = None
-            for urls in table.css('a'): #Vamos a seleccionar la etiqueta a que será la que contenga los enlaces
-                texto = urls.css('::text').get() #Obtenemos el texto que se almancena en la etiqueta 
-
-                if texto and 'Report' in texto: #Si ese texto coincide con Report, contendrá los enlaces que buscamos
-                    url = urls.css('a::attr(href)').get() #Extraemos el enlace
-                    race_name = url[11:] #Para obtener el nombre de la carrera hacemos slicing
-
-                    if url: #Si existe enlace creamos el enlace final con urljoin (importado con scrapy)
-                        url_final = response.urljoin(url) 
-                        yield scrapy.Request(url = url_final,callback=self.parse_race,meta={'year':year,"race": race_name.strip()}) #Accedemos a los enlaces de Report
-                        #pasando como metadato el año y el nombre de la carrera, para facilitar el almacenamiento de los ficheros
+        for url, race_name in extraer_carreras(response.text):
+            url_final = response.urljoin(url) #Creamos el enlace final con urljoin (importado con scrapy)
+            yield scrapy.Request(url = url_final,callback=self.parse_race,meta={'year':year,"race": race_name}) #Accedemos a los enlaces de Report
+            #pasando como metadato el año y el nombre de la carrera, para facilitar el almacenamiento de los ficheros
 
     def parse_race(self,response): 
         """
         Esta función se encarga de obtener la tabla de clasificaciones,convertirla en DataFrame
-        y ese DataFrame convertirlo a csv guardándolo en una carpeta para cada año específico (apartados c) y d))
+        y ese DataFrame convertirlo a csv guardándolo en una carpeta para cada año específico (apartados c) y d)).
+        De la misma respuesta se extraen también qualifying, sprint y vuelta rápida (DATASETS)
         
         :param self:
         :param response: Urls generadas por la función parse
         """
         year = response.meta['year'] #Almacenamos los metadatos
         race = response.meta['race']
+        archivar_respuesta(response, 'race', year, race)
+
+        for path in guardar_tablas(extraer_tablas(response.text), year, race): #Carrera, qualifying, sprint y vuelta rápida de una sola visita
+            self.log(f"Guardado: {path}") #**Mensaje adicional para mostrar al usuario que ya se ha guardado ese archivo (ayuda Deepseek para facilitar visualización)
+
+#-----EXTRACCIÓN (común al crawler y a reprocesar_html.py)-----#
 
-        selectores = response.css('div.mw-heading, table.wikitable') #Seleccionamos los elementos con etiqueta div y table (Para obtener Race/Race classification y la tabla correspondiente)
-        race_encontrado = False
+def archivar_respuesta(response, tipo, year, race=""):
+    """
+    Guarda el HTML de la respuesta en el archivo (archivo_html), con la url
+    pedida originalmente (la que enlaza la página de temporada) aunque haya habido redirección
+    """
+    url = response.meta.get('redirect_urls', [response.url])[0]
+    fecha = response.headers.get('Date', b'').decode()
+    archivar(url, response.body, tipo, year, race, fecha)
 
-        for elemento in selectores:
-            titulo = elemento.css('h3::text').get() or '' #Obtenemos los textos con etiqueta h3
-            titulo = titulo.strip()
+def extraer_carreras(html):
+    """
+    Devuelve (enlace, nombre de la carrera) de cada carrera de la tabla de una página de temporada
+    
+    :param html: HTML de la página de temporada
+    """
+    table_selector = Selector(text=html).css('table.wikitable.sortable tr')[1:] #Extraemos la tabla de la página que buscamos
+    carreras = []
 
-            if 'Race classification' in titulo or titulo == 'Race': #Seleccionamos la tabla que vaya justo después de este título
-                race_encontrado = True
+    for table in table_selector:
+        text = table.css('td::text').getall() #Obtenemos lo que serían los encabezados
 
-            elif race_encontrado and elemento.css('table.wikitable'):
-                tabla_html = elemento.get() #Obtenemos la tabla pedidan
-                df = pd.read_html(io.StringIO(str(tabla_html))) #La convertimos en DataFrame
-                if 'Time/Retired' in df[0].columns: #Nos aseguramos de que sea la correcta poniendo como condición que Time/Retired esté en la tabla
-                    #(Evitamos filtrar tablas que aunque sean posteriores a nuestro título, no sean la que buscamos → Time/Retired es específica únicamente de la tabla que buscamos) 
-                    tabla_final = df[0].iloc[:-1]  #Eliminamos la última fila (Contiene Source)
-                    ultima_fila_str = tabla_final.iloc[-1].to_string() #Veremos si encontramos otra fila que sobra como Fastests Lap y la eliminamos en caso de que esté
-                    
-                    if 'fastest' in ultima_fila_str.lower():
-                        tabla_final = tabla_final.iloc[:-1]
+        if not text: #Si no hay encabezados no nos vale
+            continue
 
+        for urls in table.css('a'): #Vamos a seleccionar la etiqueta a que será la que contenga los enlaces
+            texto = urls.css('::text').get() #Obtenemos el texto que se almancena en la etiqueta 
 
-                    os.makedirs(f"data/{year}", exist_ok=True) #Creamos los directorios que se encuentran dentro de data y ponemos como nombre el año
-                    tabla_final.to_csv(f"data/{year}/{race}.csv", index=False) #Convertimos el DataFrame a csv y lo guardamos en el directorio correspondiente a su año
-                    self.log(f"Guardado: data/{year}/{race}.csv") #**Mensaje adicional para mostrar al usuario que ya se ha guardado ese archivo (ayuda Deepseek para facilitar visualización)
+            if texto and 'Report' in texto: #Si ese texto coincide con Report, contendrá los enlaces que buscamos
+                url = urls.css('a::attr(href)').get() #Extraemos el enlace
+
+                if url: #Si existe enlace lo guardamos junto al nombre de la carrera
+                    race_name = url[11:] #Para obtener el nombre de la carrera hacemos slicing
+                    carreras.append((url, race_name.strip()))
+    return carreras
+
+#Carpeta de salida de cada tabla de la página Report (la de carrera es la de siempre: data/{year}/)
+DATASETS = {
+    'race': 'data',
+    'qualifying': 'data/qualifying',
+    'sprint': 'data/sprint',
+    'fastest_lap': 'data/fastest_lap',
+}
+
+PATRON_VUELTA_RAPIDA = re.compile(
+    r'Fastest lap:\s*(?P<Driver>.+?)\s*\((?P<Constructor>[^)]*)\)\s*[–—-]\s*(?P<LapTime>[\d:.]+)\s*\(lap\s*(?P<Lap>\d+)\)')
+
+def _seccion(titulo):
+    """Sección de la página a la que pertenecen las tablas que siguen a un título h3 (o None)"""
+    titulo = titulo.lower()
+    if 'sprint' in titulo: #'Sprint', 'Sprint classification' y también 'Sprint qualifying'/'Sprint shootout' (se distinguen por las columnas)
+        return 'sprint'
+    if 'qualifying' in titulo:
+        return 'qualifying'
+    if 'race classification' in titulo or titulo == 'race':
+        return 'race'
+    return None
+
+def _aplanar_columnas(df):
+    """Las tablas de clasificación tienen dos filas de cabecera ('Qualifying times' / Q1 Q2 Q3): nos quedamos con la de abajo"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[-1] for col in df.columns]
+    return df
+
+def _quitar_pie(tabla):
+    """Elimina las filas finales que ocupan toda la tabla (Source, 107% time...): read_html repite su texto en todas las columnas"""
+    while len(tabla) and tabla.iloc[-1].astype(str).nunique() == 1:
+        tabla = tabla.iloc[:-1]
+    return tabla
+
+def _vuelta_rapida_infobox(selector):
+    """Vuelta rápida del cuadro resumen de la página (si la tabla de carrera no la trae)"""
+    filas = selector.xpath("//table[contains(@class,'infobox')]//tr[th[contains(., 'Fastest lap')]]/following-sibling::tr[position()<=2]")
+    datos = {}
+    for fila in filas:
+        etiqueta = ' '.join(fila.css('th ::text').getall()).strip()
+        if etiqueta == 'Driver':
+            nombres = [t.strip() for t in fila.css('td a::text').getall() if t.strip()]
+            datos['Driver'] = nombres[0] if nombres else None
+            datos['Constructor'] = nombres[1] if len(nombres) > 1 else None
+        elif etiqueta == 'Time':
+            m = re.search(r'([\d:.]+)\s+on lap\s+(\d+)', ' '.join(fila.css('td ::text').getall()))
+            if m:
+                datos['LapTime'], datos['Lap'] = m.groups()
+    return pd.DataFrame([datos], columns=['Driver', 'Constructor', 'LapTime', 'Lap']) if datos.get('Driver') else None
+
+def extraer_tablas(html):
+    """
+    Extrae de una página Report, en una sola pasada, las tablas de carrera, clasificación (qualifying),
+    sprint y vuelta rápida. Devuelve un diccionario {dataset: DataFrame} solo con las encontradas
+    
+    :param html: HTML de la página de la carrera
+    """
+    selector = Selector(text=html)
+    selectores = selector.css('div.mw-heading, table.wikitable') #Seleccionamos los elementos con etiqueta div y table (Para obtener los títulos de cada apartado y la tabla correspondiente)
+    seccion = None
+    tablas = {}
+
+    for elemento in selectores:
+        titulo = elemento.css('h3::text').get() or '' #Obtenemos los textos con etiqueta h3
+        titulo = titulo.strip()
+
+        if _seccion(titulo): #Las tablas que vayan justo después de este título son de ese apartado
+            seccion = _seccion(titulo)
+
+        elif seccion and seccion not in tablas and elemento.css('table.wikitable'):
+            tabla_html = elemento.get() #Obtenemos la tabla pedidan
+            df = _aplanar_columnas(pd.read_html(io.StringIO(str(tabla_html)))[0]) #La convertimos en DataFrame
+
+            if seccion == 'race' and 'Time/Retired' in df.columns: #Nos aseguramos de que sea la correcta poniendo como condición que Time/Retired esté en la tabla
+                #(Evitamos filtrar tablas que aunque sean posteriores a nuestro título, no sean la que buscamos → Time/Retired es específica únicamente de la tabla que buscamos) 
+                tabla_final = df.iloc[:-1]  #Eliminamos la última fila (Contiene Source)
+                ultima_fila_str = tabla_final.iloc[-1].to_string() #Veremos si encontramos otra fila que sobra como Fastests Lap: la guardamos como dataset aparte y la eliminamos
+                
+                if 'fastest' in ultima_fila_str.lower():
+                    m = PATRON_VUELTA_RAPIDA.search(str(tabla_final.iloc[-1].iloc[0]))
+                    if m:
+                        tablas['fastest_lap'] = pd.DataFrame([m.groupdict()])
+                    tabla_final = tabla_final.iloc[:-1]
+
+                tablas['race'] = tabla_final
+
+            elif seccion == 'sprint' and 'Time/Retired' in df.columns: #La sprint tiene el mismo formato que la carrera (la 'sprint qualifying'/'shootout' no)
+                tablas['sprint'] = _quitar_pie(df)
+
+            elif seccion == 'qualifying':
+                tablas['qualifying'] = _quitar_pie(df)
+
+    if 'race' in tablas and 'fastest_lap' not in tablas:
+        vuelta_rapida = _vuelta_rapida_infobox(selector)
+        if vuelta_rapida is not None:
+            tablas['fastest_lap'] = vuelta_rapida
+    return tablas
+
+def guardar_tabla(tabla, dataset, year, race):
+    """Guarda la tabla en {carpeta del dataset}/{year}/{race}.csv y devuelve la ruta"""
+    carpeta = f"{DATASETS[dataset]}/{year}"
+    os.makedirs(carpeta, exist_ok=True) #Creamos los directorios que se encuentran dentro de data y ponemos como nombre el año
+    path = f"{carpeta}/{race}.csv"
+    tabla.to_csv(path + ".tmp", index=False) #Convertimos el DataFrame a csv y lo guardamos en el directorio correspondiente a su año
+    os.replace(path + ".tmp", path) #(escritura atómica: un crawl interrumpido no deja CSV a medias)
+    return path
+
+def guardar_tablas(tablas, year, race):
+    """Guarda cada tabla extraída en su dataset y devuelve las rutas"""
+    return [guardar_tabla(tabla, dataset, year, race) for dataset, tabla in tablas.items()]
 
 if __name__ == "__main__":
-    process = CrawlerProcess()
-    process.crawl(F1Spider)
+    parser = argparse.ArgumentParser(description="Crawler de resultados de Wikipedia")
+    parser.add_argument("seasons", nargs="*", type=int, help="temporadas (por defecto, todas)")
+    parser.add_argument("--jobdir", help="directorio de estado de Scrapy para reanudar un crawl interrumpido")
+    args = parser.parse_args()
+
+    process = CrawlerProcess({'JOBDIR': args.jobdir} if args.jobdir else None)
+    process.crawl(F1Spider, seasons=args.seasons or None)
     process.start() 
 
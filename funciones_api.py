@@ -1,25 +1,74 @@
 import os
+import sys
+import threading
+import time
+from collections import deque
 import pandas as pd
 import requests
-import time
+from almacen_pitstops import agregar_paradas, guardar_paradas, parse_pitstops
+from almacen_vueltas import cargar_vueltas, guardar_vueltas, parse_vueltas
+from calendarios import carreras_temporada, temporadas
 
-BASE_URL = "https://api.jolpi.ca/ergast/f1"  # URL base 
+BASE_URL = os.environ.get("JOLPICA_URL", "https://api.jolpi.ca/ergast/f1")  # URL base (JOLPICA_URL para usar el servidor stub)
 OUT_DIR = "data/pitstops"                    # carpeta en la que guardar CSV
 
+PITSTOPS_DESDE = 2011  # primera temporada con pitstops en Jolpica/Ergast
+VUELTAS_DESDE = 1996   # primera temporada con tiempos por vuelta
+
+# Límites de Jolpica, compartidos por todos los hilos que llaman a get_json
+INTERVALO_MIN = 0.3    # segundos entre llamadas
+MAX_POR_HORA = 500     # llamadas por hora
+_turnos_lock = threading.Lock()
+_turnos = deque()      # instantes reservados para las llamadas de la última hora
+_pausa_hasta = 0.0     # tras un 429 nadie llama antes de este instante
+
 def crear_dir():
     if not os.path.exists("OUT_DIR"):
         os.makedirs(OUT_DIR, exist_ok=True)
 
+def esperar_turno():
+    """
+    Reserva el siguiente hueco libre respetando INTERVALO_MIN, MAX_POR_HORA
+    y la pausa global tras un 429, y espera hasta él. Es seguro llamarla
+    desde varios hilos: los huecos se reparten bajo un lock.
+    """
+    with _turnos_lock:
+        ahora = time.monotonic()
+        while _turnos and ahora - _turnos[0] > 3600:
+            _turnos.popleft()
+        turno = max(ahora, _pausa_hasta)
+        if _turnos:
+            turno = max(turno, _turnos[-1] + INTERVALO_MIN)
+        if len(_turnos) >= MAX_POR_HORA:
+            turno = max(turno, _turnos[-MAX_POR_HORA] + 3600)
+        _turnos.append(turno)
+    time.sleep(max(0.0, turno - ahora))
+
+def reiniciar_limitador():
+    """Olvida las llamadas y pausas registradas (entre ejecuciones del benchmark)."""
+    global _pausa_hasta
+    with _turnos_lock:
+        _turnos.clear()
+        _pausa_hasta = 0.0
+
+def pausar_llamadas(segundos):
+    """Retrasa todas las llamadas pendientes (de todos los hilos) 'segundos'."""
+    global _pausa_hasta
+    with _turnos_lock:
+        _pausa_hasta = max(_pausa_hasta, time.monotonic() + segundos)
+
 def get_json(url,params={}):
     
     for attempt in range(5):
-        time.sleep(0.3)  # Para respetar el limite de llamadas
+        esperar_turno()  # Para respetar el limite de llamadas
         resp = requests.get(url, params=params)
         if resp.status_code == 429:
-            # espera exponencial antes de reintentar
-            wait = 2 ** attempt
+            # espera exponencial (o la indicada por Retry-After) antes de reintentar;
+            # la pausa se aplica a todos los hilos para no alimentar la tormenta de 429
+            retry_after = resp.headers.get("Retry-After", "")
+            wait = int(retry_after) if retry_after.isdigit() else 2 ** attempt
             print(f"429 recibido, esperando {wait} s...")
-            time.sleep(wait)
+            pausar_llamadas(wait)
             continue
         resp.raise_for_status()
         return resp.json()
@@ -40,25 +89,39 @@ def get_races_for_season(season):
     return [{"season": int(season),"round": int(r["round"]),"raceName": r["raceName"],} for r in races]
 
 
-def get_all_drivers():
+def get_seasons():
+    """Lista de temporadas del campeonato (/seasons.json, paginado)."""
+    seasons = get_paginated(f"{BASE_URL}/seasons.json", lambda mr: mr["SeasonTable"]["Seasons"])
+    return sorted(int(s["season"]) for s in seasons)
+
+
+def get_paginated(url, extract):
     """
-    Descarga todos los pilotos con su driverId y permanentNumber. [web:4]
-    Jolpica/Ergast pagina resultados, así que iteramos con ?limit=&offset=.
+    Recorre todas las páginas de un endpoint de Jolpica con ?limit=&offset=.
+    extract(mr) devuelve la lista de elementos de cada página (mr = data["MRData"]).
     """
-    drivers = []
+    items = []
     limit = 100  # Es el máximo 
     offset = 0  # Es el default
     while True:
-        url = f"{BASE_URL}/drivers.json"
         params = {"limit": limit, "offset": offset}
         data = get_json(url, params)
         mr = data["MRData"]
-        batch = mr["DriverTable"]["Drivers"]
-        drivers.extend(batch)
-        total = int(mr.get("total", len(drivers)))
+        batch = extract(mr)
+        items.extend(batch)
+        total = int(mr.get("total", len(items)))
         offset += limit
         if offset >= total or not batch:
             break
+    return items
+
+
+def get_all_drivers():
+    """
+    Descarga todos los pilotos con su driverId y permanentNumber. [web:4]
+    Jolpica/Ergast pagina resultados, así que iteramos con ?limit=&offset=.
+    """
+    drivers = get_paginated(f"{BASE_URL}/drivers.json", lambda mr: mr["DriverTable"]["Drivers"])
 
     # mapping driverId -> permanentNumber (puede faltar)
     mapping = {}
@@ -69,42 +132,110 @@ def get_all_drivers():
     return mapping
 
 
+def get_results_for_season(season):
+    """
+    Descarga los resultados de una temporada usando /{season}/results.json
+    (paginado). Devuelve {season, round, number, driverId} por cada resultado:
+    el número de coche que llevó cada piloto en cada carrera.
+    """
+    def results(mr):
+        return [{"season": int(season), "round": int(race["round"]), "number": r.get("number"),
+                 "driverId": r["Driver"]["driverId"]}
+                for race in mr["RaceTable"]["Races"] for r in race.get("Results", [])]
+
+    return get_paginated(f"{BASE_URL}/{season}/results.json", results)
+
+
+def get_last_race():
+    """
+    Última carrera con resultados en Jolpica (/current/last/results.json):
+    {'season', 'round', 'raceName'} o None si la temporada aún no ha empezado.
+    """
+    races = get_json(f"{BASE_URL}/current/last/results.json", {"limit": 1})["MRData"]["RaceTable"]["Races"]
+    if not races:
+        return None
+    return {"season": int(races[0]["season"]), "round": int(races[0]["round"]), "raceName": races[0]["raceName"]}
+
+
 def get_pitstops_for_race(season, round_):
     """
     Descarga todos los pitstops de una carrera usando
     /{season}/{round}/pitstops.json. [web:4][web:25]
+    Paginado: sin ?limit= la API devuelve solo las 30 primeras paradas.
     """
-    url = f"{BASE_URL}/{season}/{round_}/pitstops.json"
-    data = get_json(url)
-    mr = data["MRData"]
-    races = mr["RaceTable"]["Races"]
-    if not races:
-        return []
+    def pitstops(mr):
+        races = mr["RaceTable"]["Races"]
+        if not races:
+            return []
+        # En Ergast los pitstops están en Races[0]["PitStops"]
+        return races[0].get("PitStops", [])
+
+    return get_paginated(f"{BASE_URL}/{season}/{round_}/pitstops.json", pitstops)
+
+
+def get_laps_for_race(season, round_):
+    """
+    Descarga los tiempos por vuelta de una carrera usando
+    /{season}/{round}/laps.json (paginado: el total cuenta tiempos, no vueltas).
+    Devuelve una lista plana de {lap, driverId, position, time}.
+    """
+    def timings(mr):
+        races = mr["RaceTable"]["Races"]
+        if not races:
+            return []
+        return [{"lap": lap["number"], **t} for lap in races[0].get("Laps", []) for t in lap["Timings"]]
+
+    return get_paginated(f"{BASE_URL}/{season}/{round_}/laps.json", timings)
+
+
+def build_laps_for_season(season, saltar_existentes=False):
+    """
+    Descarga las vueltas de todas las carreras de la temporada (calendario de
+    data/calendars/) y las guarda en el almacén de vueltas (un .npz columnar
+    por temporada, una escritura). Con saltar_existentes=True se omiten las
+    rondas que ya están en el almacén y cada carrera se guarda al
+    descargarla, de modo que una ejecución interrumpida continúa donde se
+    quedó. Devuelve el número de carreras descargadas con vueltas.
+    """
+    hechas = set(cargar_vueltas([season])["Round"].unique()) if saltar_existentes else set()
+
+    vueltas = []
+    descargadas = 0
+    for race in carreras_temporada(season):
+        if race["round"] in hechas:
+            continue
+        timings = get_laps_for_race(season, race["round"])
+        print(f"{season} round {race['round']:02d}: {len(timings)} tiempos de vuelta")
+        if timings:
+            descargadas += 1
+            vueltas.append(parse_vueltas(season, race["round"], timings))
+            if saltar_existentes:
+                guardar_vueltas(vueltas.pop())
 
-    # En Ergast los pitstops están en Races[0]["PitStops"]
-    pitstops = races[0].get("PitStops", [])
-    return pitstops
+    if vueltas:
+        guardar_vueltas(pd.concat(vueltas, ignore_index=True))
+    return descargadas
 
 
 def build_pitstop_df_for_race(season, round_, driver_number_map):
     """
     Construye el DataFrame requerido para una carrera:
     columnas: DriverId, DriverNumber, NPitstops, MedianPitStopDuration.
+    Las paradas individuales se guardan antes en el almacén local
+    (almacen_pitstops) para poder calcular otras métricas sin la API.
     """
     pitstops = get_pitstops_for_race(season, round_)
     if not pitstops:
         return pd.DataFrame(columns=["DriverId","DriverNumber","NPitstops","MedianPitStopDuration"])
 
-    # Creamos DataFrame bruto de pitstops
-    raw = pd.DataFrame(pitstops)
+    # Paradas individuales tipadas (vuelta, parada, hora, duración)
+    raw = parse_pitstops(season, round_, pitstops)
+    guardar_paradas(raw)
 
-    # En Ergast/Jolpica, driverId suele venir como 'driverId' o dentro de 'driverId'
-    # pero para pitstops es 'driverId' (string). [web:25]
-    raw["duration"] = pd.to_numeric(raw["duration"], errors="coerce")
-
-    grouped = (raw.groupby("driverId")["duration"].agg(["count", "median"]).reset_index().rename(columns={"driverId": "DriverId","count": "NPitstops","median": "MedianPitStopDuration"}))
+    grouped = agregar_paradas(raw)
 
     # Añadir DriverNumber usando el mapping driverId -> permanentNumber
+    grouped["DriverId"] = grouped["DriverId"].astype(str)
     grouped["DriverNumber"] = grouped["DriverId"].map(driver_number_map)
 
     # Reordenar columnas
@@ -112,29 +243,56 @@ def build_pitstop_df_for_race(season, round_, driver_number_map):
     return grouped
 
 
-if __name__=="__main__":
-    crear_dir()
-    driver_number_map = get_all_drivers()
+def pitstops_path(season, round_):
+    """Ruta del CSV de pitstops de una carrera: p.ej. OUT_DIR/2019/2019_round01_pitstops.csv."""
+    return os.path.join(OUT_DIR, str(season), f"{season}_round{round_:02d}_pitstops.csv")
 
-    for season in range(2019, 2025):  # 2019–2024 inclusive
-        races = get_races_for_season(season)
-        print(f"Season {season}: {len(races)} races")
 
-        # Carpeta por temporada si quieres replicar la estructura del apartado 1
-        season_dir = os.path.join(OUT_DIR, str(season))
-        os.makedirs(season_dir, exist_ok=True)
+def save_pitstops_for_race(season, round_, driver_number_map):
+    """Descarga y guarda (atómico) el CSV de pitstops de una carrera. Devuelve (ruta, filas)."""
+    path = pitstops_path(season, round_)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        for race in races:
-            rnd = race["round"]
-            race_name = race["raceName"].replace("/", "-")
+    df_race = build_pitstop_df_for_race(season, round_, driver_number_map)
+    df_race.to_csv(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    print(f"Saved {path} ({len(df_race)} rows)")
+    return path, len(df_race)
+
+
+def build_pitstops_for_season(season, driver_number_map, saltar_existentes=False, al_guardar=None):
+    """
+    Descarga los pitstops de todas las carreras de una temporada (calendario
+    de data/calendars/) y guarda un CSV por carrera en OUT_DIR/{season}/.
+    Con saltar_existentes=True no se vuelven a pedir las carreras cuyo CSV
+    ya existe (reanudación).
+    al_guardar(season, round, path): aviso tras guardar cada carrera (orquestador).
+    """
+    races = carreras_temporada(season)
+    print(f"Season {season}: {len(races)} races")
 
-            df_race = build_pitstop_df_for_race(season, rnd, driver_number_map)
+    # Carpeta por temporada si quieres replicar la estructura del apartado 1
+    season_dir = os.path.join(OUT_DIR, str(season))
+    os.makedirs(season_dir, exist_ok=True)
 
-            # Nombre de archivo: p.ej. 2019_round01_pitstops.csv
-            filename = f"{season}_round{rnd:02d}_pitstops.csv"
-            path = os.path.join(season_dir, filename)
+    for race in races:
+        rnd = race["round"]
+        if saltar_existentes and os.path.exists(pitstops_path(season, rnd)):
+            continue
+
+        path, _ = save_pitstops_for_race(season, rnd, driver_number_map)
+        if al_guardar is not None:
+            al_guardar(season, rnd, path)
+    return len(races)
+
+
+if __name__=="__main__":
+    # Uso: python funciones_api.py [temporada ...]  (por defecto, todas las que tienen pitstops)
+    crear_dir()
+    driver_number_map = get_all_drivers()
 
-            df_race.to_csv(path, index=False)
-            print(f"Saved {path} ({len(df_race)} rows)")
+    seasons = [int(s) for s in sys.argv[1:]] or temporadas(desde=PITSTOPS_DESDE)
+    for season in seasons:
+        build_pitstops_for_season(season, driver_number_map)
 
     print("Ha guardado todos correctamente")
@@ -0,0 +1,96 @@
+"""
+Índice de identidad de pilotos por temporada
+============================================
+Sustituye al diccionario fijo create_driver_mapping (driverId -> número),
+que no sirve para temporadas históricas: Verstappen corrió con el 33 antes
+de llevar el 1 y los números se reutilizan entre pilotos.
+El índice (Season, RaceNumber, DriverNumber) <-> DriverId se construye una
+sola vez a partir de los resultados de Jolpica (/{season}/results.json),
+se guarda en data/driver_index.csv y el merge lo usa con un único join
+por las tres claves.
+"""
+
+import os
+import sys
+import threading
+import pandas as pd
+
+INDEX_PATH = "data/driver_index.csv"
+
+TIPOS_INDICE = {'Season': 'Int16', 'RaceNumber': 'Int8', 'DriverNumber': 'Int16', 'DriverId': 'string'}
+
+_indice_lock = threading.Lock()
+
+def cargar_indice_pilotos():
+    """Lee el índice guardado (vacío, con las mismas columnas, si no existe)."""
+    if not os.path.exists(INDEX_PATH):
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in TIPOS_INDICE.items()})
+    return pd.read_csv(INDEX_PATH, dtype=TIPOS_INDICE)
+
+def entradas_temporada(season):
+    """Descarga /{season}/results.json y devuelve las entradas del índice de esa temporada."""
+    from funciones_api import get_results_for_season
+
+    filas = pd.DataFrame(get_results_for_season(season),
+                         columns=['season', 'round', 'number', 'driverId'])
+    filas.columns = ['Season', 'RaceNumber', 'DriverNumber', 'DriverId']
+    for col, dtype in TIPOS_INDICE.items():
+        if dtype.startswith('Int'):
+            filas[col] = pd.to_numeric(filas[col], errors='coerce')
+    print(f"Índice de pilotos {season}: {len(filas)} entradas")
+    return filas.astype(TIPOS_INDICE)
+
+def guardar_entradas(nuevas, seasons):
+    """
+    Sustituye en el índice guardado las temporadas 'seasons' por las filas
+    de 'nuevas' (lista de DataFrames). Lectura y escritura van bajo un lock
+    para que varios hilos (backfill) puedan añadir temporadas a la vez.
+    """
+    with _indice_lock:
+        indice = cargar_indice_pilotos()
+        indice = pd.concat([indice[~indice['Season'].isin(seasons)], *nuevas], ignore_index=True)
+        indice = (indice.drop_duplicates(['Season', 'RaceNumber', 'DriverNumber'])
+                  .sort_values(['Season', 'RaceNumber', 'DriverNumber'], ignore_index=True))
+
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        indice.to_csv(INDEX_PATH + ".tmp", index=False)
+        os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    return indice
+
+def actualizar_indice_pilotos(seasons, forzar=False):
+    """
+    Añade al índice las temporadas que aún no tiene (o todas si forzar=True),
+    descargando /{season}/results.json solo para esas temporadas.
+    """
+    indice = cargar_indice_pilotos()
+    presentes = set(indice['Season'].dropna().astype(int))
+    pendientes = [s for s in seasons if forzar or s not in presentes]
+
+    if not pendientes:
+        return indice
+
+    return guardar_entradas([entradas_temporada(season) for season in pendientes], pendientes)
+
+def entradas_carrera(indice, season, race_number):
+    """Filas del índice para una carrera (se usan también en la huella de la caché)."""
+    return indice[(indice['Season'] == season) & (indice['RaceNumber'] == race_number)]
+
+def resolver_driver_id(df, indice, number_col='DriverNumber'):
+    """
+    Añade DriverId a df con un único join por (Season, RaceNumber, número).
+    number_col es la columna de df con el número de coche.
+    """
+    claves = pd.DataFrame({
+        'Season': df['Season'].astype('Int16'),
+        'RaceNumber': df['RaceNumber'].astype('Int8'),
+        'DriverNumber': pd.to_numeric(df[number_col], errors='coerce').astype('Int16'),
+    }, index=df.index)
+    ids = claves.merge(indice, on=['Season', 'RaceNumber', 'DriverNumber'], how='left')['DriverId']
+    return df.assign(DriverId=ids.array)
+
+if __name__ == "__main__":
+    # Uso: python indice_pilotos.py [temporada_inicial temporada_final]  (por defecto, todas)
+    from calendarios import temporadas
+
+    indice = actualizar_indice_pilotos(temporadas(*(int(a) for a in sys.argv[1:3])))
+    print(f"{len(indice):,} entradas en {INDEX_PATH}")
@@ -13,95 +13,23 @@ import pandas as pd
 import glob
 from pathlib import Path
 import json
+from calendarios import calendario_temporada, temporadas_con_datos
+from cache_etapas import cargar_indice, guardar_indice, huella_carrera, obtener_o_construir
+from esquema import aplicar_esquema, clave_numero
+from indice_pilotos import cargar_indice_pilotos, resolver_driver_id
+from particiones import escribir_csv_particionado
+from validacion import imprimir_informe, validar
+from versiones import registrar_version
+
+# Incrementar al cambiar la lógica de fusión por carrera (invalida la caché)
+MERGE_VERSION = 3
 
 def get_season_calendar(season):
     """
-    Devuelve el calendario de carreras para una temporada específica.
-    Esto es necesario para asignar RaceNumber correctamente.
-    Basado en calendarios reales de F1.
+    Devuelve el calendario de carreras para una temporada específica,
+    a partir del calendario de la API guardado en data/calendars/.
     """
-    calendars = {
-        2012: [
-            'Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish',
-            'Monaco', 'Canadian', 'European', 'British', 'German',
-            'Hungarian', 'Belgian', 'Italian', 'Singapore', 'Japanese',
-            'Korean', 'Indian', 'Abu_Dhabi', 'United_States', 'Brazilian'
-        ],
-        2013: [
-            'Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish',
-            'Monaco', 'Canadian', 'British', 'German', 'Hungarian',
-            'Belgian', 'Italian', 'Singapore', 'Korean', 'Japanese',
-            'Indian', 'Abu_Dhabi', 'United_States', 'Brazilian'
-        ],
-        2014: [
-            'Australian', 'Malaysian', 'Bahrain', 'Chinese', 'Spanish',
-            'Monaco', 'Canadian', 'Austrian', 'British', 'German',
-            'Hungarian', 'Belgian', 'Italian', 'Singapore', 'Japanese',
-            'Russian', 'United_States', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2015: [
-            'Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish',
-            'Monaco', 'Canadian', 'Austrian', 'British', 'Hungarian',
-            'Belgian', 'Italian', 'Singapore', 'Japanese', 'Russian',
-            'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2016: [
-            'Australian', 'Bahrain', 'Chinese', 'Russian', 'Spanish',
-            'Monaco', 'Canadian', 'European', 'Austrian', 'British',
-            'Hungarian', 'German', 'Belgian', 'Italian', 'Singapore',
-            'Malaysian', 'Japanese', 'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2017: [
-            'Australian', 'Chinese', 'Bahrain', 'Russian', 'Spanish',
-            'Monaco', 'Canadian', 'Azerbaijan', 'Austrian', 'British',
-            'Hungarian', 'Belgian', 'Italian', 'Singapore', 'Malaysian',
-            'Japanese', 'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2018: [
-            'Australian', 'Bahrain', 'Chinese', 'Azerbaijan', 'Spanish',
-            'Monaco', 'Canadian', 'French', 'Austrian', 'British',
-            'German', 'Hungarian', 'Belgian', 'Italian', 'Singapore',
-            'Russian', 'Japanese', 'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2019: [
-            'Australian', 'Bahrain', 'Chinese', 'Azerbaijan', 'Spanish',
-            'Monaco', 'Canadian', 'French', 'Austrian', 'British',
-            'German', 'Hungarian', 'Belgian', 'Italian', 'Singapore',
-            'Russian', 'Japanese', 'Mexican', 'United_States', 'Brazilian', 'Abu_Dhabi'
-        ],
-        2020: [
-            'Austrian', 'Styrian', 'Hungarian', 'British', '70th_Anniversary',
-            'Spanish', 'Belgian', 'Italian', 'Tuscan', 'Russian',
-            'Eifel', 'Portuguese', 'Emilia-Romagna', 'Turkish', 'Bahrain', 'Sakhir', 'Abu_Dhabi'
-        ],
-        2021: [
-            'Bahrain', 'Emilia-Romagna', 'Portuguese', 'Spanish', 'Monaco',
-            'Azerbaijan', 'French', 'Styrian', 'Austrian', 'British',
-            'Hungarian', 'Belgian', 'Dutch', 'Italian', 'Russian',
-            'Turkish', 'United_States', 'Mexico_City', 'São_Paulo', 'Qatar', 'Saudi_Arabian', 'Abu_Dhabi'
-        ],
-        2022: [
-            'Bahrain', 'Saudi_Arabian', 'Australian', 'Emilia-Romagna', 'Miami',
-            'Spanish', 'Monaco', 'Azerbaijan', 'Canadian', 'British',
-            'Austrian', 'French', 'Hungarian', 'Belgian', 'Dutch',
-            'Italian', 'Singapore', 'Japanese', 'United_States', 'Mexico_City', 'São_Paulo', 'Abu_Dhabi'
-        ],
-        2023: [
-            'Bahrain', 'Saudi_Arabian', 'Australian', 'Azerbaijan', 'Miami',
-            'Monaco', 'Spanish', 'Canadian', 'Austrian', 'British',
-            'Hungarian', 'Belgian', 'Dutch', 'Italian', 'Singapore',
-            'Japanese', 'Qatar', 'United_States', 'Mexico_City', 'São_Paulo', 'Las_Vegas', 'Abu_Dhabi'
-        ],
-        2024: [
-            'Bahrain', 'Saudi_Arabian', 'Australian', 'Japanese', 'Chinese',
-            'Miami', 'Emilia-Romagna', 'Monaco', 'Canadian', 'Spanish',
-            'Austrian', 'British', 'Hungarian', 'Belgian', 'Dutch',
-            'Italian', 'Azerbaijan', 'Singapore', 'United_States', 'Mexico_City',
-            'São_Paulo', 'Las_Vegas', 'Qatar', 'Abu_Dhabi'
-        ]
-    }
-    
-    return calendars.get(season, [])
+    return calendario_temporada(season)
 
 def find_race_number(season, race_filename, calendar):
     """
@@ -135,6 +63,11 @@ def find_race_number(season, race_filename, calendar):
         race_key = race_name.replace('_Grand_Prix', '')
     
     # Buscar en el calendario
+    # (primero coincidencia exacta: 'United_States' no debe casar con 'United_States_West')
+    for i, calendar_race in enumerate(calendar, 1):
+        if calendar_race.lower() == race_key.lower():
+            return i
+    
     for i, calendar_race in enumerate(calendar, 1):
         if calendar_race.lower() in race_key.lower() or race_key.lower() in calendar_race.lower():
             return i
@@ -154,43 +87,10 @@ def get_driver_number_column(df):
     
     return None
 
-def create_driver_mapping():
-    """
-    Crea un mapeo para resolver inconsistencias en números de piloto.
-    """
-    return {
-        # Mapeo por driverId
-        'max_verstappen': '33',
-        'lewis_hamilton': '44',
-        'valtteri_bottas': '77',
-        'carlos_sainz': '55',
-        'charles_leclerc': '16',
-        'lando_norris': '4',
-        'george_russell': '63',
-        'fernando_alonso': '14',
-        'esteban_ocon': '31',
-        'pierre_gasly': '10',
-        'yuki_tsunoda': '22',
-        'daniel_ricciardo': '3',
-        'kevin_magnussen': '20',
-        'mick_schumacher': '47',
-        'sebastian_vettel': '5',
-        'lance_stroll': '18',
-        'nicholas_latifi': '6',
-        'alexander_albon': '23',
-        'sergio_perez': '11',
-        'kimi_raikkonen': '7',
-        'antonio_giovinazzi': '99',
-        'nyck_de_vries': '21',
-        'logan_sargeant': '2',
-        'nico_hulkenberg': '27',
-        'guanyu_zhou': '24',
-        'oscar_piastri': '81',
-    }
-
-def merge_race_data(season, race_number, race_filename, calendar):
+def merge_race_data(season, race_number, race_filename, driver_index):
     """
     Fusiona datos de una carrera específica.
+    El DriverId se obtiene del índice de pilotos por (Season, RaceNumber, número).
     """
     # Cargar resultados
     results_path = f"data/{season}/{race_filename}"
@@ -212,46 +112,50 @@ def merge_race_data(season, race_number, race_filename, calendar):
     # Buscar columna de número de piloto
     driver_num_col = get_driver_number_column(results_df)
     
+    # Resolver DriverId con el índice de pilotos
+    if driver_num_col:
+        results_df = resolver_driver_id(results_df, driver_index, driver_num_col)
+    else:
+        results_df['DriverId'] = pd.NA
+    results_df['DriverNumber'] = clave_numero(results_df[driver_num_col]) if driver_num_col else pd.NA
+    
     # Inicializar columnas de pitstops
-    pitstop_cols = ['DriverId', 'DriverNumber', 'NPitstops', 'MedianPitStopDuration']
-    for col in pitstop_cols:
+    for col in ['NPitstops', 'MedianPitStopDuration']:
         results_df[col] = pd.NA
     
-    # Cargar datos de pitstops si existen (solo para 2019-2024)
-    if season >= 2019:
-        pitstop_path = f"data/pitstops/{season}/{season}_round{race_number:02d}_pitstops.csv"
+    # Cargar datos de pitstops si existen (la API los tiene desde 2011)
+    pitstop_path = f"data/pitstops/{season}/{season}_round{race_number:02d}_pitstops.csv"
+    
+    if os.path.exists(pitstop_path):
+        pitstops_df = pd.read_csv(pitstop_path)
         
-        if os.path.exists(pitstop_path):
-            pitstops_df = pd.read_csv(pitstop_path)
+        pitstop_cols = ['DriverId', 'NPitstops', 'MedianPitStopDuration']
+        
+        if not pitstops_df.empty and results_df['DriverId'].notna().any():
+            pitstops_df['DriverId'] = pitstops_df['DriverId'].astype('string')
             
-            if not pitstops_df.empty and driver_num_col:
-                # Aplicar mapeo de corrección si es necesario
-                driver_mapping = create_driver_mapping()
-                
-                # Crear columna con número corregido
-                pitstops_df['CorrectedNumber'] = pitstops_df['DriverId'].map(
-                    lambda x: driver_mapping.get(x, str(pitstops_df.loc[pitstops_df['DriverId'] == x, 'DriverNumber'].iloc[0]))
-                    if x in pitstops_df['DriverId'].values else pd.NA
-                )
-                
-                # Convertir a string para comparación
-                results_df[driver_num_col] = results_df[driver_num_col].astype(str)
-                pitstops_df['CorrectedNumber'] = pitstops_df['CorrectedNumber'].astype(str)
-                
-                # Realizar merge
-                merged_df = pd.merge(
-                    results_df,
-                    pitstops_df[['CorrectedNumber', 'DriverId', 'NPitstops', 'MedianPitStopDuration']],
-                    left_on=driver_num_col,
-                    right_on='CorrectedNumber',
-                    how='left'
-                )
-                
-                # Eliminar columna temporal
-                merged_df = merged_df.drop(columns=['CorrectedNumber'], errors='ignore')
-                
-                return merged_df
-    
+            # Realizar merge por DriverId
+            merged_df = pd.merge(
+                results_df.drop(columns=['NPitstops', 'MedianPitStopDuration']),
+                pitstops_df[pitstop_cols],
+                on='DriverId',
+                how='left'
+            )
+            
+            return merged_df
+        
+        if not pitstops_df.empty and driver_num_col:
+            # Carrera sin entradas en el índice: número permanente de la API
+            pitstops_df['MergeNumber'] = clave_numero(pitstops_df['DriverNumber'])
+            merged_df = pd.merge(
+                results_df.drop(columns=pitstop_cols).assign(MergeNumber=results_df['DriverNumber']),
+                pitstops_df[['MergeNumber'] + pitstop_cols],
+                on='MergeNumber',
+                how='left'
+            ).drop(columns=['MergeNumber'])
+            
+            return merged_df
+
     return results_df
 
 def merge_all_data():
@@ -263,9 +167,14 @@ def merge_all_data():
     print("="*70)
     
     all_merged = []
-    
-    # Procesar cada temporada
-    for season in range(2012, 2025):
+    cache_index = cargar_indice('merge_data')
+    driver_index = cargar_indice_pilotos()
+    if driver_index.empty:
+        print("    Sin índice de pilotos: pitstops cruzados por número permanente (ejecutar indice_pilotos.py)")
+    n_rebuilt = 0
+    
+    # Procesar cada temporada con resultados descargados
+    for season in temporadas_con_datos():
         print(f"\n Procesando temporada {season}...")
         
         # Obtener calendario
@@ -294,12 +203,21 @@ def merge_all_data():
                 print(f"    No se pudo determinar RaceNumber para: {race_filename}")
                 continue
             
-            # Fusionar datos
-            merged_df = merge_race_data(season, race_number, race_filename, calendar)
+            # Fusionar datos (solo si han cambiado las entradas de la carrera)
+            merged_df, rebuilt = obtener_o_construir(
+                'merge_data', cache_index, f"{season}/{Path(race_filename).stem}",
+                huella_carrera(MERGE_VERSION, season, race_number, race_filename, driver_index),
+                lambda: merge_race_data(season, race_number, race_filename, driver_index),
+            )
+            n_rebuilt += rebuilt
             
             if merged_df is not None:
                 all_merged.append(merged_df)
-                print(f"     {race_filename}: {len(merged_df)} filas")
+                origin = "" if rebuilt else " (caché)"
+                print(f"     {race_filename}: {len(merged_df)} filas{origin}")
+    
+    guardar_indice('merge_data', cache_index)
+    print(f"\n Carreras reconstruidas: {n_rebuilt} (resto desde caché)")
     
     # Combinar todos los DataFrames
     if not all_merged:
@@ -316,23 +234,34 @@ def merge_all_data():
     remaining_cols = [col for col in final_df.columns if col not in col_order]
     final_df = final_df[col_order + remaining_cols]
     
+    # Aplicar tipos compactos del esquema
+    final_df = aplicar_esquema(final_df)
+    
     # Exportar a CSV
     os.makedirs("merged_data", exist_ok=True)
     output_file = "merged_data/f1_complete_dataset.csv"
-    final_df.to_csv(output_file, index=False)
+    
+    # Versión del build y diferencias con el anterior (antes de sobrescribir el CSV)
+    version, _ = registrar_version(final_df, output_file)
+    
+    # Escritura temporada a temporada, con rangos de bytes y estadísticas por partición
+    partitions = escribir_csv_particionado(final_df, output_file)
     
     # Crear metadatos
-    create_metadata(final_df, output_file)
+    create_metadata(final_df, output_file, partitions, version)
     
     # Mostrar estadísticas
     print_stats(final_df, output_file)
     
     return final_df
 
-def create_metadata(df, output_path):
-    """Crea archivo de metadatos."""
+def create_metadata(df, output_path, partitions=None, version=None):
+    """
+    Crea archivo de metadatos (partitions: estadísticas por temporada de
+    escribir_csv_particionado; version: número de build de registrar_version).
+    """
     metadata = {
-        "dataset": "Formula 1 Complete Dataset 2012-2024",
+        "dataset": f"Formula 1 Complete Dataset {int(df['Season'].min())}-{int(df['Season'].max())}",
         "description": "Dataset fusionado de resultados de carreras y pitstops",
         "total_rows": len(df),
         "total_columns": len(df.columns),
@@ -340,9 +269,13 @@ def create_metadata(df, output_path):
         "unique_seasons": sorted([int(s) for s in df['Season'].unique()]),
         "unique_races": int(df['RaceName'].nunique()),
         "columns": list(df.columns),
-        "pitstops_available_from": 2019,
+        "pitstops_available_from": int(df.loc[df['NPitstops'].notna(), 'Season'].min()) if df['NPitstops'].notna().any() else None,
         "generated_date": pd.Timestamp.now().isoformat()
     }
+    if version is not None:
+        metadata["version"] = version
+    if partitions is not None:
+        metadata["partitions"] = partitions
     
     metadata_file = output_path.replace('.csv', '_metadata.json')
     with open(metadata_file, 'w') as f:
@@ -360,8 +293,8 @@ def print_stats(df, output_path):
     print(f"\n DISTRIBUCIÓN POR TEMPORADA:")
     season_counts = df['Season'].value_counts().sort_index()
     for season, count in season_counts.items():
-        if season >= 2019:
-            pitstops_count = df[df['Season'] == season]['NPitstops'].notna().sum()
+        pitstops_count = df[df['Season'] == season]['NPitstops'].notna().sum()
+        if pitstops_count:
             print(f"   {int(season)}: {count:>4} filas | Pitstops: {pitstops_count:>4} ({pitstops_count/count*100:>5.1f}%)")
         else:
             print(f"   {int(season)}: {count:>4} filas | Sin datos de pitstops")
@@ -390,6 +323,10 @@ def validate_requirements(df):
         ("7. Exportado a CSV", os.path.exists("merged_data/f1_complete_dataset.csv")),
     ]
     
+    # 8. Invariantes por carrera (motor de reglas de validacion.py)
+    informe = validar(df) if df is not None else None
+    requirements.append(("8. Reglas por carrera sin errores", informe is not None and informe['ok']))
+    
     all_passed = True
     for req_name, condition in requirements:
         status = "OK" if condition else "ERROR"
@@ -397,6 +334,9 @@ def validate_requirements(df):
         if not condition:
             all_passed = False
     
+    if informe is not None:
+        imprimir_informe(informe)
+    
     return all_passed
 
 if __name__ == "__main__":
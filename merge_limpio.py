@@ -4,133 +4,33 @@ Parte 3: Cruzado de los datos de ambas fuentes - VERSIÓN CORREGIDA
 """
 
 import os
+import argparse
 import pandas as pd
 import glob
 from pathlib import Path
 import json
+from agregados import actualizar_agregados, cobertura_pitstops
+from almacen_vueltas import LAPS_DIR, unir_resumen_vueltas
+from cache_etapas import cargar_indice, guardar_indice, huella_carrera, obtener_o_construir
+from calendarios import calendario_temporada, temporadas_con_datos
+from caracteristicas import actualizar_caracteristicas
+from dataset_arrow import publicar_arrow, ruta_version
+from esquema import aplicar_esquema, clave_numero, leer_resultados
+from particiones import escribir_csv_particionado
+from tiempos_carrera import parse_time_retired
+from validacion import imprimir_informe, validar
+from versiones import carreras_afectadas, registrar_version
+from indice_pilotos import cargar_indice_pilotos, resolver_driver_id
 
-def clean_column_names(df):
-    """Limpia los nombres de las columnas del DataFrame."""
-    # Eliminar columnas sin nombre
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    
-    # Eliminar columnas que son completamente nulas
-    df = df.dropna(axis=1, how='all')
-    
-    # Renombrar columnas problemáticas
-    column_renames = {
-        'Pos.': 'Position',
-        'No.': 'DriverNumber',
-        'Grid[43]': 'Grid',
-        'Pts.': 'Points',
-        'Laps1': 'Laps',
-        'Points1': 'Points',
-        'Lapsa': 'Laps'
-    }
-    
-    df = df.rename(columns={k: v for k, v in column_renames.items() if k in df.columns})
-    
-    return df
-
-def remove_duplicate_columns(df):
-    """Elimina columnas duplicadas."""
-    # Identificar columnas duplicadas por contenido
-    cols_to_drop = []
-    cols_checked = set()
-    
-    for i, col1 in enumerate(df.columns):
-        if col1 in cols_checked:
-            continue
-            
-        for j, col2 in enumerate(df.columns[i+1:], i+1):
-            if col2 in cols_checked:
-                continue
-                
-            # Verificar si las columnas son iguales
-            try:
-                if df[col1].equals(df[col2]):
-                    cols_to_drop.append(col2)
-                    cols_checked.add(col2)
-            except:
-                pass
-    
-    # Eliminar columnas duplicadas
-    if cols_to_drop:
-        df = df.drop(columns=cols_to_drop)
-    
-    # Eliminar columnas con sufijos _x o _y (mantener solo una versión)
-    cols_with_suffix = [col for col in df.columns if col.endswith('_x') or col.endswith('_y')]
-    
-    for col in cols_with_suffix:
-        base_name = col[:-2]  # Eliminar _x o _y
-        if base_name in df.columns:
-            # Si ya existe la base, eliminar la versión con sufijo
-            df = df.drop(columns=[col])
-        else:
-            # Renombrar eliminando el sufijo
-            df = df.rename(columns={col: base_name})
-    
-    return df
+# Incrementar al cambiar la lógica de fusión por carrera (invalida la caché)
+MERGE_VERSION = 2
 
 def get_season_calendar(season):
-    """Devuelve el calendario de carreras para una temporada específica."""
-    calendars = {
-        2012: ['Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish', 'Monaco', 
-               'Canadian', 'European', 'British', 'German', 'Hungarian', 'Belgian', 
-               'Italian', 'Singapore', 'Japanese', 'Korean', 'Indian', 'Abu_Dhabi', 
-               'United_States', 'Brazilian'],
-        2013: ['Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish', 'Monaco', 
-               'Canadian', 'British', 'German', 'Hungarian', 'Belgian', 'Italian', 
-               'Singapore', 'Korean', 'Japanese', 'Indian', 'Abu_Dhabi', 'United_States', 
-               'Brazilian'],
-        2014: ['Australian', 'Malaysian', 'Bahrain', 'Chinese', 'Spanish', 'Monaco', 
-               'Canadian', 'Austrian', 'British', 'German', 'Hungarian', 'Belgian', 
-               'Italian', 'Singapore', 'Japanese', 'Russian', 'United_States', 
-               'Brazilian', 'Abu_Dhabi'],
-        2015: ['Australian', 'Malaysian', 'Chinese', 'Bahrain', 'Spanish', 'Monaco', 
-               'Canadian', 'Austrian', 'British', 'Hungarian', 'Belgian', 'Italian', 
-               'Singapore', 'Japanese', 'Russian', 'United_States', 'Mexican', 
-               'Brazilian', 'Abu_Dhabi'],
-        2016: ['Australian', 'Bahrain', 'Chinese', 'Russian', 'Spanish', 'Monaco', 
-               'Canadian', 'European', 'Austrian', 'British', 'Hungarian', 'German', 
-               'Belgian', 'Italian', 'Singapore', 'Malaysian', 'Japanese', 
-               'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'],
-        2017: ['Australian', 'Chinese', 'Bahrain', 'Russian', 'Spanish', 'Monaco', 
-               'Canadian', 'Azerbaijan', 'Austrian', 'British', 'Hungarian', 'Belgian', 
-               'Italian', 'Singapore', 'Malaysian', 'Japanese', 'United_States', 
-               'Mexican', 'Brazilian', 'Abu_Dhabi'],
-        2018: ['Australian', 'Bahrain', 'Chinese', 'Azerbaijan', 'Spanish', 'Monaco', 
-               'Canadian', 'French', 'Austrian', 'British', 'German', 'Hungarian', 
-               'Belgian', 'Italian', 'Singapore', 'Russian', 'Japanese', 
-               'United_States', 'Mexican', 'Brazilian', 'Abu_Dhabi'],
-        2019: ['Australian', 'Bahrain', 'Chinese', 'Azerbaijan', 'Spanish', 'Monaco', 
-               'Canadian', 'French', 'Austrian', 'British', 'German', 'Hungarian', 
-               'Belgian', 'Italian', 'Singapore', 'Russian', 'Japanese', 'Mexican', 
-               'United_States', 'Brazilian', 'Abu_Dhabi'],
-        2020: ['Austrian', 'Styrian', 'Hungarian', 'British', '70th_Anniversary', 
-               'Spanish', 'Belgian', 'Italian', 'Tuscan', 'Russian', 'Eifel', 
-               'Portuguese', 'Emilia_Romagna', 'Turkish', 'Bahrain', 'Sakhir', 
-               'Abu_Dhabi'],
-        2021: ['Bahrain', 'Emilia_Romagna', 'Portuguese', 'Spanish', 'Monaco', 
-               'Azerbaijan', 'French', 'Styrian', 'Austrian', 'British', 'Hungarian', 
-               'Belgian', 'Dutch', 'Italian', 'Russian', 'Turkish', 'United_States', 
-               'Mexico_City', 'São_Paulo', 'Qatar', 'Saudi_Arabian', 'Abu_Dhabi'],
-        2022: ['Bahrain', 'Saudi_Arabian', 'Australian', 'Emilia_Romagna', 'Miami', 
-               'Spanish', 'Monaco', 'Azerbaijan', 'Canadian', 'British', 'Austrian', 
-               'French', 'Hungarian', 'Belgian', 'Dutch', 'Italian', 'Singapore', 
-               'Japanese', 'United_States', 'Mexico_City', 'São_Paulo', 'Abu_Dhabi'],
-        2023: ['Bahrain', 'Saudi_Arabian', 'Australian', 'Azerbaijan', 'Miami', 
-               'Monaco', 'Spanish', 'Canadian', 'Austrian', 'British', 'Hungarian', 
-               'Belgian', 'Dutch', 'Italian', 'Singapore', 'Japanese', 'Qatar', 
-               'United_States', 'Mexico_City', 'São_Paulo', 'Las_Vegas', 'Abu_Dhabi'],
-        2024: ['Bahrain', 'Saudi_Arabian', 'Australian', 'Japanese', 'Chinese', 
-               'Miami', 'Emilia_Romagna', 'Monaco', 'Canadian', 'Spanish', 'Austrian', 
-               'British', 'Hungarian', 'Belgian', 'Dutch', 'Italian', 'Azerbaijan', 
-               'Singapore', 'United_States', 'Mexico_City', 'São_Paulo', 'Las_Vegas', 
-               'Qatar', 'Abu_Dhabi']
-    }
-    
-    return calendars.get(season, [])
+    """
+    Devuelve el calendario de carreras para una temporada específica,
+    a partir del calendario de la API guardado en data/calendars/.
+    """
+    return calendario_temporada(season)
 
 def find_race_number(season, race_filename, calendar):
     """Encuentra el número de carrera basado en el calendario."""
@@ -161,56 +61,22 @@ def find_race_number(season, race_filename, calendar):
         race_key = race_name.replace('_Grand_Prix', '')
     
     # Buscar en calendario
+    # (primero coincidencia exacta: 'United_States' no debe casar con 'United_States_West')
     for i, calendar_race in enumerate(calendar, 1):
-        if calendar_race.lower() in race_key.lower() or race_key.lower() in calendar_race.lower():
+        if calendar_race.lower() == race_key.lower():
             return i
     
-    return None
-
-def get_driver_number_column(df):
-    """Encuentra la columna con el número de piloto."""
-    possible_cols = ['No', 'No.', 'Number', 'Driver Number', 'Num', 'Car number']
-    
-    for col in possible_cols:
-        if col in df.columns:
-            return col
+    for i, calendar_race in enumerate(calendar, 1):
+        if calendar_race.lower() in race_key.lower() or race_key.lower() in calendar_race.lower():
+            return i
     
     return None
 
-def create_driver_mapping():
-    """Crea mapeo para números de piloto."""
-    return {
-        'max_verstappen': '33',
-        'lewis_hamilton': '44',
-        'valtteri_bottas': '77',
-        'carlos_sainz': '55',
-        'charles_leclerc': '16',
-        'lando_norris': '4',
-        'george_russell': '63',
-        'fernando_alonso': '14',
-        'esteban_ocon': '31',
-        'pierre_gasly': '10',
-        'yuki_tsunoda': '22',
-        'daniel_ricciardo': '3',
-        'kevin_magnussen': '20',
-        'mick_schumacher': '47',
-        'sebastian_vettel': '5',
-        'lance_stroll': '18',
-        'nicholas_latifi': '6',
-        'alexander_albon': '23',
-        'sergio_perez': '11',
-        'kimi_raikkonen': '7',
-        'antonio_giovinazzi': '99',
-        'nyck_de_vries': '21',
-        'logan_sargeant': '2',
-        'nico_hulkenberg': '27',
-        'guanyu_zhou': '24',
-        'oscar_piastri': '81',
-    }
-
-def merge_race_data_simple(season, race_number, race_filename):
+def merge_race_data_simple(season, race_number, race_filename, driver_index):
     """
     Versión simplificada del merge que evita columnas duplicadas.
+    Las columnas llegan ya canónicas desde leer_resultados() y el DriverId
+    se resuelve con el índice de pilotos por (Season, RaceNumber, DriverNumber).
     """
     # Cargar resultados
     results_path = f"data/{season}/{race_filename}"
@@ -218,113 +84,63 @@ def merge_race_data_simple(season, race_number, race_filename):
     if not os.path.exists(results_path):
         return None
     
-    results_df = pd.read_csv(results_path)
+    results_df = leer_resultados(results_path)
     
     if results_df.empty:
         return None
     
-    # Limpiar columnas de resultados
-    results_df = clean_column_names(results_df)
-    
     # Añadir columnas requeridas
-    results_df = results_df.copy()
     results_df['Season'] = season
     results_df['RaceNumber'] = race_number
     results_df['RaceName'] = race_filename.replace('.csv', '')
     
-    # Buscar columna de número de piloto en resultados
-    driver_num_col = get_driver_number_column(results_df)
+    # Identidad del piloto a partir del número que llevó en esa carrera
+    if 'DriverNumber' in results_df.columns:
+        results_df = resolver_driver_id(results_df, driver_index)
+    else:
+        results_df['DriverId'] = pd.Series(pd.NA, index=results_df.index, dtype='string')
     
-    # Inicializar columnas de pitstops
-    pitstop_cols = ['DriverId', 'NPitstops', 'MedianPitStopDuration']
-    for col in pitstop_cols:
-        results_df[col] = pd.NA
+    merged_df = results_df
     
-    # Solo añadir DriverNumber si no existe
-    if 'DriverNumber' not in results_df.columns and driver_num_col:
-        results_df['DriverNumber'] = results_df[driver_num_col]
+    # Cargar pitstops si existen (la API los tiene desde 2011)
+    pitstop_path = f"data/pitstops/{season}/{season}_round{race_number:02d}_pitstops.csv"
     
-    # Cargar pitstops si existen (2019-2024)
-    if season >= 2019:
-        pitstop_path = f"data/pitstops/{season}/{season}_round{race_number:02d}_pitstops.csv"
+    if os.path.exists(pitstop_path):
+        pitstops_df = pd.read_csv(pitstop_path)
         
-        if os.path.exists(pitstop_path):
-            pitstops_df = pd.read_csv(pitstop_path)
+        if not pitstops_df.empty:
+            pitstop_cols = ['DriverId', 'NPitstops', 'MedianPitStopDuration']
             
-            if not pitstops_df.empty:
-                # Limpiar pitstops
-                pitstops_df = clean_column_names(pitstops_df)
-                
-                # Asegurar columnas necesarias
-                required_pitstop_cols = ['DriverId', 'DriverNumber', 'NPitstops', 'MedianPitStopDuration']
-                for col in required_pitstop_cols:
-                    if col not in pitstops_df.columns:
-                        pitstops_df[col] = pd.NA
-                
-                # Aplicar mapeo de corrección
-                driver_mapping = create_driver_mapping()
-                pitstops_df['MappedNumber'] = pitstops_df['DriverId'].map(
-                    lambda x: driver_mapping.get(x, pd.NA)
-                )
-                
-                # Usar número mapeado si existe, sino el original
-                pitstops_df['MergeNumber'] = pitstops_df.apply(
-                    lambda row: row['MappedNumber'] if pd.notna(row['MappedNumber']) else row['DriverNumber'],
-                    axis=1
-                )
-                
-                # Preparar DataFrame para merge
-                pitstops_for_merge = pitstops_df[['MergeNumber', 'DriverId', 'NPitstops', 'MedianPitStopDuration']].copy()
-                
-                # Crear clave de merge en resultados
-                if driver_num_col:
-                    results_df['MergeNumber'] = results_df[driver_num_col].astype(str)
-                else:
-                    results_df['MergeNumber'] = pd.NA
-                
-                # Convertir a string
-                results_df['MergeNumber'] = results_df['MergeNumber'].astype(str)
-                pitstops_for_merge['MergeNumber'] = pitstops_for_merge['MergeNumber'].astype(str)
-                
-                # Realizar merge (LEFT JOIN)
+            if results_df['DriverId'].notna().any():
+                # Realizar merge (LEFT JOIN) por DriverId
+                pitstops_df['DriverId'] = pitstops_df['DriverId'].astype('string')
+                merged_df = pd.merge(results_df, pitstops_df[pitstop_cols], on='DriverId', how='left')
+            elif 'DriverNumber' in results_df.columns:
+                # Carrera sin entradas en el índice: número permanente de la API
+                pitstops_df['MergeNumber'] = clave_numero(pitstops_df['DriverNumber'])
                 merged_df = pd.merge(
-                    results_df,
-                    pitstops_for_merge,
-                    left_on='MergeNumber',
-                    right_on='MergeNumber',
-                    how='left',
-                    suffixes=('', '_pitstop')
-                )
-                
-                # Eliminar columnas temporales
-                merged_df = merged_df.drop(columns=['MergeNumber'], errors='ignore')
-                
-                # Si hay columnas con sufijo _pitstop, renombrarlas
-                for col in merged_df.columns:
-                    if col.endswith('_pitstop'):
-                        base_col = col.replace('_pitstop', '')
-                        if base_col in merged_df.columns:
-                            # Eliminar la original si existe
-                            merged_df = merged_df.drop(columns=[base_col])
-                        merged_df = merged_df.rename(columns={col: base_col})
-                
-                # Asegurar que DriverNumber existe
-                if 'DriverNumber' not in merged_df.columns and driver_num_col:
-                    merged_df['DriverNumber'] = merged_df[driver_num_col]
-                
-                return merged_df
-    
-    return results_df
+                    results_df.drop(columns=['DriverId']).assign(MergeNumber=clave_numero(results_df['DriverNumber'])),
+                    pitstops_df[['MergeNumber'] + pitstop_cols],
+                    on='MergeNumber',
+                    how='left'
+                ).drop(columns=['MergeNumber'])
 
-def merge_all_data():
-    """Función principal de fusión."""
-    print("="*70)
-    print("PARTE 3: CRUZADO DE DATOS - VERSIÓN LIMPIA")
-    print("="*70)
+    # Asegurar columnas de pitstops
+    for col in ['NPitstops', 'MedianPitStopDuration']:
+        if col not in merged_df.columns:
+            merged_df[col] = pd.NA
     
-    all_merged = []
+    return merged_df
+
+def find_race_files(seasons=None):
+    """
+    Devuelve la lista de carreras a fusionar como (season, race_number, race_filename),
+    en orden de temporada y de fichero. Común a los motores pandas y polars.
+    Por defecto, todas las temporadas con resultados en data/.
+    """
+    races = []
     
-    for season in range(2012, 2025):
+    for season in (temporadas_con_datos() if seasons is None else seasons):
         print(f"\n📅 Temporada {season}")
         
         # Obtener calendario
@@ -352,34 +168,56 @@ def merge_all_data():
                 print(f"  ⚠️  No se pudo determinar RaceNumber para: {race_filename}")
                 continue
             
-            # Fusionar datos
-            merged_df = merge_race_data_simple(season, race_number, race_filename)
-            
-            if merged_df is not None:
-                # Limpiar columnas duplicadas
-                merged_df = remove_duplicate_columns(merged_df)
-                merged_df = clean_column_names(merged_df)
-                
-                all_merged.append(merged_df)
-                print(f"    ✅ {race_filename}: {len(merged_df)} filas limpias")
+            races.append((season, race_number, race_filename))
     
-    if not all_merged:
-        print("\n❌ No hay datos para fusionar")
-        return None
+    return races
+
+def merge_races_pandas(races):
+    """
+    Motor pandas: fusiona carrera a carrera usando la caché de etapas.
+    Devuelve (DataFrame combinado o None, conjunto de carreras reconstruidas).
+    """
+    all_merged = []
+    cache_index = cargar_indice('merge_limpio')
+    driver_index = cargar_indice_pilotos()
+    if driver_index.empty:
+        print("⚠️  Sin índice de pilotos (python indice_pilotos.py): se usará el número permanente")
+    rebuilt_races = set()
+    
+    for season, race_number, race_filename in races:
+        # Fusionar datos (solo si han cambiado las entradas de la carrera)
+        merged_df, rebuilt = obtener_o_construir(
+            'merge_limpio', cache_index, f"{season}/{Path(race_filename).stem}",
+            huella_carrera(MERGE_VERSION, season, race_number, race_filename, driver_index),
+            lambda: merge_race_data_simple(season, race_number, race_filename, driver_index),
+        )
+        if rebuilt:
+            rebuilt_races.add((season, race_number))
+        
+        if merged_df is not None:
+            all_merged.append(merged_df)
+            origin = "" if rebuilt else " (caché)"
+            print(f"    ✅ {season} {race_filename}: {len(merged_df)} filas limpias{origin}")
     
-    print(f"\n{'='*70}")
-    print("COMBINANDO TODOS LOS DATOS...")
+    guardar_indice('merge_limpio', cache_index)
+    print(f"\n♻️  Carreras reconstruidas: {len(rebuilt_races)} (resto desde caché)")
     
-    final_df = pd.concat(all_merged, ignore_index=True)
+    if not all_merged:
+        return None, rebuilt_races
     
-    # Limpieza final
-    final_df = clean_column_names(final_df)
-    final_df = remove_duplicate_columns(final_df)
+    return pd.concat(all_merged, ignore_index=True), rebuilt_races
+
+def prepare_dataset(final_df):
+    """Pasos comunes tras combinar las carreras: tiempos, orden de columnas, vueltas y tipos."""
+    # Columnas numéricas de tiempo a partir de Time/Retired (una sola pasada)
+    if 'Time/Retired' in final_df.columns:
+        final_df = parse_time_retired(final_df)
     
     # Reordenar columnas
     preferred_order = ['Season', 'RaceNumber', 'RaceName', 'Position', 'Pos', 
                       'DriverNumber', 'Driver', 'Constructor', 'Laps', 
-                      'Time/Retired', 'Grid', 'Points',
+                      'Time/Retired', 'RaceTimeMs', 'GapMs', 'LapsDown', 'Status',
+                      'Grid', 'Points',
                       'DriverId', 'NPitstops', 'MedianPitStopDuration']
     
     # Mantener solo columnas existentes en el orden preferido
@@ -388,23 +226,74 @@ def merge_all_data():
     
     final_df = final_df[existing_cols + other_cols]
     
+    # Añadir resumen de tiempos por vuelta si se han ingerido
+    if glob.glob(os.path.join(LAPS_DIR, "*.npz")):
+        final_df = unir_resumen_vueltas(final_df)
+    
+    # Aplicar tipos compactos del esquema
+    return aplicar_esquema(final_df)
+
+def merge_all_data(engine='pandas'):
+    """
+    Función principal de fusión.
+    engine: 'pandas' (por carrera, con caché) o 'polars' (consulta lazy multihilo).
+    """
+    print("="*70)
+    print(f"PARTE 3: CRUZADO DE DATOS - VERSIÓN LIMPIA (motor {engine})")
+    print("="*70)
+    
+    races = find_race_files()
+    
+    if engine == 'polars':
+        from merge_polars import merge_races_polars
+        final_df, rebuilt_races = merge_races_polars(races)
+    else:
+        final_df, rebuilt_races = merge_races_pandas(races)
+    
+    if final_df is None:
+        print("\n❌ No hay datos para fusionar")
+        return None
+    
+    print(f"\n{'='*70}")
+    print("COMBINANDO TODOS LOS DATOS...")
+    
+    final_df = prepare_dataset(final_df)
+    
     # Exportar
     os.makedirs("merged_data", exist_ok=True)
     output_file = "merged_data/f1_clean_dataset.csv"
-    final_df.to_csv(output_file, index=False)
+    # Versión del build y diferencias con el anterior (antes de sobrescribir el CSV)
+    version, changes = registrar_version(final_df, output_file)
+    
+    # Escritura temporada a temporada, con rangos de bytes y estadísticas por partición
+    partitions = escribir_csv_particionado(final_df, output_file)
+    
+    # Publicar también en Arrow IPC (versionado, para carga memory-mapped); sin cambios
+    # se mantiene el fichero de la versión actual y no se rota la ventana de CONSERVAR
+    if changes is None or len(changes) or not os.path.exists(ruta_version(output_file, version)):
+        publicar_arrow(final_df, output_file, version)
     
     # Crear metadatos
-    create_metadata(final_df, output_file)
+    create_metadata(final_df, output_file, partitions, version)
+    
+    # Actualizar agregados materializados (solo las carreras con filas distintas)
+    aggregates = actualizar_agregados(final_df, rebuilt_races if changes is None else carreras_afectadas(changes))
+    
+    # Características por piloto para modelado (incrementales sobre la versión anterior)
+    actualizar_caracteristicas(final_df, output_file)
     
     # Mostrar estadísticas
-    print_stats(final_df, output_file)
+    print_stats(final_df, output_file, aggregates['coverage'])
     
     return final_df
 
-def create_metadata(df, output_path):
-    """Crea archivo de metadatos."""
+def create_metadata(df, output_path, partitions=None, version=None):
+    """
+    Crea archivo de metadatos (partitions: estadísticas por temporada de
+    escribir_csv_particionado; version: número de build de registrar_version).
+    """
     metadata = {
-        "dataset": "Formula 1 Clean Dataset 2012-2024",
+        "dataset": f"Formula 1 Clean Dataset {int(df['Season'].min())}-{int(df['Season'].max())}",
         "description": "Dataset fusionado limpio sin columnas duplicadas",
         "total_rows": len(df),
         "total_columns": len(df.columns),
@@ -412,6 +301,10 @@ def create_metadata(df, output_path):
         "season_range": f"{int(df['Season'].min())}-{int(df['Season'].max())}",
         "generated_date": pd.Timestamp.now().isoformat()
     }
+    if version is not None:
+        metadata["version"] = version
+    if partitions is not None:
+        metadata["partitions"] = partitions
     
     metadata_file = output_path.replace('.csv', '_metadata.json')
     with open(metadata_file, 'w') as f:
@@ -419,8 +312,8 @@ def create_metadata(df, output_path):
     
     print(f"  📄 Metadatos: {metadata_file}")
 
-def print_stats(df, output_path):
-    """Muestra estadísticas."""
+def print_stats(df, output_path, coverage=None):
+    """Muestra estadísticas (coverage: tabla de agregados ya calculada, si existe)."""
     print(f"\n✅ DATASET LIMPIO CREADO:")
     print(f"   📁 {output_path}")
     print(f"   📊 {len(df):,} filas, {len(df.columns)} columnas")
@@ -436,14 +329,14 @@ def print_stats(df, output_path):
         with_pitstops = df['NPitstops'].notna().sum()
         print(f"   Carreras con pitstops: {with_pitstops:,} ({with_pitstops/len(df)*100:.1f}%)")
         
-        for season in range(2019, 2025):
-            season_data = df[df['Season'] == season]
-            if len(season_data) > 0:
-                pitstops_count = season_data['NPitstops'].notna().sum()
-                print(f"   {season}: {pitstops_count:>4}/{len(season_data):<4} ({pitstops_count/len(season_data)*100:>5.1f}%)")
+        if coverage is None:
+            coverage = cobertura_pitstops(df)
+        
+        for row in coverage[coverage['RowsWithPitstops'] > 0].itertuples():
+            print(f"   {int(row.Season)}: {int(row.RowsWithPitstops):>4}/{int(row.Rows):<4} ({row.CoveragePct:>5.1f}%)")
 
 def validate_dataset(df):
-    """Valida el dataset final."""
+    """Valida el dataset final: estructura y reglas por carrera de validacion.py."""
     print(f"\n{'='*70}")
     print("VALIDACIÓN DEL DATASET")
     print(f"{'='*70}")
@@ -467,13 +360,23 @@ def validate_dataset(df):
         if not condition:
             all_ok = False
     
+    if all_ok:
+        informe = validar(df)
+        imprimir_informe(informe)
+        all_ok = informe['ok']
+    
     return all_ok
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fusión limpia de resultados y pitstops")
+    parser.add_argument("--engine", choices=["pandas", "polars"], default="pandas",
+                        help="motor de ejecución (polars requiere el paquete polars)")
+    args = parser.parse_args()
+    
     print("🏎️  PARTE 3: FUSIÓN LIMPIA DE DATOS F1")
     print("Objetivo: Dataset sin columnas duplicadas o sin nombre")
     
-    dataset = merge_all_data()
+    dataset = merge_all_data(args.engine)
     
     if dataset is not None:
         valid = validate_dataset(dataset)
@@ -0,0 +1,124 @@
+"""
+Motor Polars para merge_limpio
+==============================
+Alternativa a merge_races_pandas (python merge_limpio.py --engine polars):
+carga -> columnas canónicas -> DriverId con el índice de pilotos -> join de
+pitstops se expresa como una única consulta lazy de Polars, que se ejecuta
+en varios hilos y solo lee de los CSV de pitstops las columnas necesarias
+(projection pushdown). El resultado se entrega a prepare_dataset(), de modo
+que f1_clean_dataset.csv tiene el mismo esquema con ambos motores.
+"""
+
+import os
+import sys
+import glob
+import polars as pl
+
+from esquema import nombre_canonico
+from indice_pilotos import INDEX_PATH
+from merge_limpio import find_race_files, merge_races_pandas, prepare_dataset
+
+PITSTOPS_GLOB = "data/pitstops/*/*_pitstops.csv"
+
+def scan_resultados(season, race_number, race_filename):
+    """Consulta lazy de un CSV de resultados con las columnas ya canónicas."""
+    lf = pl.scan_csv(f"data/{season}/{race_filename}", infer_schema=False)
+
+    mapeo = {}
+    for col in lf.collect_schema().names():
+        canonico = nombre_canonico(col)
+        if canonico is not None and canonico not in mapeo.values():
+            mapeo[col] = canonico
+
+    return lf.select([pl.col(col).alias(canonico) for col, canonico in mapeo.items()]).with_columns(
+        pl.lit(season, dtype=pl.Int16).alias('Season'),
+        pl.lit(race_number, dtype=pl.Int8).alias('RaceNumber'),
+        pl.lit(race_filename.replace('.csv', '')).alias('RaceName'),
+    )
+
+def scan_pitstops():
+    """Consulta lazy de todos los CSV de pitstops; Season y RaceNumber salen de la ruta."""
+    if not glob.glob(PITSTOPS_GLOB):
+        return None
+
+    ruta = pl.col('_path')
+    return (pl.scan_csv(PITSTOPS_GLOB, include_file_paths='_path', infer_schema=False)
+            .select(
+                ruta.str.extract(r'(\d{4})_round\d+_pitstops\.csv$').cast(pl.Int16).alias('Season'),
+                ruta.str.extract(r'_round(\d+)_pitstops\.csv$').cast(pl.Int8).alias('RaceNumber'),
+                pl.col('DriverId'),
+                pl.col('DriverNumber').cast(pl.Int16, strict=False).alias('PitNumber'),
+                pl.col('NPitstops').cast(pl.Float64, strict=False),
+                pl.col('MedianPitStopDuration').cast(pl.Float64, strict=False),
+            ))
+
+def build_query(races):
+    """Consulta lazy completa; se ejecuta con un único collect()."""
+    claves = ['Season', 'RaceNumber']
+    resultados = pl.concat([scan_resultados(*race) for race in races], how='diagonal_relaxed')
+    if 'DriverNumber' not in resultados.collect_schema().names():
+        resultados = resultados.with_columns(pl.lit(None, dtype=pl.String).alias('DriverNumber'))
+
+    lf = resultados.with_row_index('_orden').with_columns(
+        pl.col('DriverNumber').cast(pl.Int16, strict=False).alias('_number'))
+
+    # Identidad del piloto con el índice (Season, RaceNumber, DriverNumber)
+    if os.path.exists(INDEX_PATH):
+        indice = pl.scan_csv(INDEX_PATH, schema_overrides={
+            'Season': pl.Int16, 'RaceNumber': pl.Int8, 'DriverNumber': pl.Int16, 'DriverId': pl.String})
+        lf = lf.join(indice.rename({'DriverNumber': '_number'}), on=claves + ['_number'], how='left')
+    else:
+        lf = lf.with_columns(pl.lit(None, dtype=pl.String).alias('DriverId'))
+
+    pitstops = scan_pitstops()
+    if pitstops is None:
+        return lf.with_columns(pl.lit(None, dtype=pl.Float64).alias('NPitstops'),
+                               pl.lit(None, dtype=pl.Float64).alias('MedianPitStopDuration'))
+
+    # Carreras con entradas en el índice: join por DriverId; si no, por número permanente
+    con_indice = pl.col('DriverId').is_not_null().any().over(claves)
+    por_id = (lf.filter(con_indice)
+              .join(pitstops.drop('PitNumber'), on=claves + ['DriverId'], how='left'))
+    por_numero = (lf.filter(~con_indice).drop('DriverId')
+                  .join(pitstops.rename({'PitNumber': '_number'}), on=claves + ['_number'], how='left'))
+    return pl.concat([por_id, por_numero], how='diagonal_relaxed')
+
+def merge_races_polars(races):
+    """
+    Motor polars: misma interfaz que merge_races_pandas.
+    No usa la caché de etapas, así que todas las carreras cuentan como reconstruidas.
+    """
+    if not races:
+        return None, set()
+
+    df = (build_query(races)
+          .sort('_orden')
+          .drop('_orden', '_number')
+          .collect())
+    print(f"\n⚡ Polars: {len(races)} carreras, {df.height:,} filas")
+
+    return df.to_pandas(), {(season, race_number) for season, race_number, _ in races}
+
+def comparar_motores():
+    """
+    Prueba de paridad: fusiona con ambos motores y compara los DataFrames
+    finales (tras prepare_dataset). Devuelve True si son iguales.
+    """
+    from pandas.testing import assert_frame_equal
+
+    races = find_race_files()
+    df_pandas = prepare_dataset(merge_races_pandas(races)[0])
+    df_polars = prepare_dataset(merge_races_polars(races)[0])
+
+    try:
+        assert_frame_equal(df_pandas, df_polars, check_dtype=True)
+    except AssertionError as error:
+        print(f"❌ Los motores difieren:\n{error}")
+        return False
+
+    print(f"✅ Paridad pandas/polars: {len(df_pandas):,} filas, {len(df_pandas.columns)} columnas")
+    return True
+
+if __name__ == "__main__":
+    # python merge_polars.py  -> prueba de paridad con el motor pandas
+    sys.exit(0 if comparar_motores() else 1)
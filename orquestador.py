@@ -0,0 +1,260 @@
+"""
+Orquestador del refresco completo: crawl, API y merge solapados
+===============================================================
+Sustituye a lanzar uno tras otro f1spiders.py, funciones_api.py y
+merge_limpio.py. Cada carrera (temporada, ronda) es un nodo con dos
+entradas:
+- resultados de Wikipedia: data/{season}/{carrera}.csv, escritos por el
+  crawler (un proceso de Scrapy aparte) a medida que procesa cada Report;
+- datos de Jolpica: calendario e índice de pilotos de la temporada y el
+  CSV de pitstops de la carrera (o la temporada sin pitstops terminada).
+El crawl y la API corren a la vez, y el merge de cada carrera se lanza en
+cuanto tiene sus dos entradas, en un pool acotado de hilos, guardando el
+resultado en la caché de etapas de merge_limpio. Al final merge_all_data()
+solo tiene que leer la caché, combinar y publicar.
+Cada etapa tiene su propio pool (--hilos-api, --hilos-merge) y al terminar
+se muestra un resumen de tiempos por etapa: el tiempo total se acerca al de
+la etapa más lenta en vez de a la suma de todas.
+"""
+
+import os
+import sys
+import glob
+import time
+import queue
+import argparse
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import funciones_api
+from cache_etapas import cargar_indice, guardar_indice, huella_carrera, obtener_o_construir
+from calendarios import calendario_temporada, carreras_temporada, temporadas
+from funciones_api import PITSTOPS_DESDE, build_pitstops_for_season, get_all_drivers
+from indice_pilotos import cargar_indice_pilotos, entradas_temporada, guardar_entradas
+from merge_limpio import MERGE_VERSION, find_race_number, merge_all_data, merge_race_data_simple
+from relleno_historico import SPIDER_PATH
+
+INTERVALO = 1.0  # segundos entre revisiones de los CSV que va escribiendo el crawler
+
+def _tarea_api(season, driver_number_map, eventos):
+    """Calendario, índice de pilotos y pitstops de una temporada, avisando de cada paso."""
+    inicio = time.perf_counter()
+    try:
+        if not carreras_temporada(season, actualizar=True):
+            raise RuntimeError("calendario vacío")
+        eventos.put(('calendario', season))
+
+        guardar_entradas([entradas_temporada(season)], [season])
+        eventos.put(('indice', season))
+
+        if season >= PITSTOPS_DESDE:
+            build_pitstops_for_season(season, driver_number_map,
+                                      al_guardar=lambda s, rnd, path: eventos.put(('pitstops', s, rnd)))
+        error = None
+    except Exception as e:
+        error = str(e)
+    eventos.put(('api_fin', season, time.perf_counter() - inicio, error))
+
+def _tarea_merge(season, race_number, race_filename, driver_index, cache_index):
+    """Fusiona una carrera en la caché de merge_limpio. Devuelve (filas, reconstruida, segundos)."""
+    inicio = time.perf_counter()
+    merged_df, rebuilt = obtener_o_construir(
+        'merge_limpio', cache_index, f"{season}/{Path(race_filename).stem}",
+        huella_carrera(MERGE_VERSION, season, race_number, race_filename, driver_index),
+        lambda: merge_race_data_simple(season, race_number, race_filename, driver_index),
+    )
+    return (0 if merged_df is None else len(merged_df)), rebuilt, time.perf_counter() - inicio
+
+def _resultados_nuevos(seasons, desde, vistos):
+    """CSV de resultados escritos (o reescritos) desde el instante 'desde' y aún no vistos."""
+    nuevos = []
+    for season in seasons:
+        for path in glob.glob(f"data/{season}/*.csv"):
+            clave = (season, os.path.basename(path))
+            if clave not in vistos and os.path.getmtime(path) >= desde:
+                vistos.add(clave)
+                nuevos.append(clave)
+    return nuevos
+
+def refrescar(seasons, hilos_api=4, hilos_merge=4, crawl=True, api=True):
+    """
+    Refresco completo de las temporadas indicadas con las tres etapas solapadas.
+    Devuelve el DataFrame final de merge_all_data() (o None).
+    """
+    if not seasons:
+        print("⚠️  Sin temporadas que refrescar")
+        return None
+    inicio = time.perf_counter()
+    marca = time.time()
+    eventos = queue.Queue()
+    tiempos = {etapa: {'inicio': None, 'fin': None, 'ocupado': 0.0, 'tareas': 0}
+               for etapa in ('crawl', 'api', 'merge', 'final')}
+
+    def registrar(etapa, segundos=0.0, fin=True):
+        t = tiempos[etapa]
+        ahora = time.perf_counter() - inicio
+        t['inicio'] = ahora - segundos if t['inicio'] is None else min(t['inicio'], ahora - segundos)
+        if fin:
+            t['fin'], t['ocupado'], t['tareas'] = ahora, t['ocupado'] + segundos, t['tareas'] + 1
+
+    print(f"🏁 Refresco de {len(seasons)} temporadas ({seasons[0]}-{seasons[-1]}): "
+          f"crawl={'sí' if crawl else 'no'}, API={'sí' if api else 'no'}, "
+          f"{hilos_api} hilos API, {hilos_merge} hilos merge")
+
+    # Estado por temporada y carrera
+    calendarios = {s: calendario_temporada(s) for s in seasons} if not api else {}
+    indices = set() if api else set(seasons)
+    pitstops_fin = set() if api else set(seasons)
+    pitstops = set()                      # (season, round) con CSV de pitstops nuevo
+    sin_ronda, en_espera = [], []         # resultados (season, fichero) aún sin calendario
+    pendientes = {}                       # (season, round) -> fichero de resultados, esperando a la API
+    lanzados = set()
+
+    # Etapa crawl: proceso aparte (el reactor de Scrapy solo arranca una vez por proceso)
+    proceso = None
+    vistos = set()
+    if crawl:
+        proceso = subprocess.Popen([sys.executable, SPIDER_PATH, *map(str, seasons)])
+        registrar('crawl', fin=False)
+    else:
+        # Sin crawl: valen los resultados que ya hay en disco
+        en_espera += _resultados_nuevos(seasons, 0, vistos)
+
+    # Etapa API: un hilo por temporada, todas bajo el limitador de funciones_api
+    pool_api = ThreadPoolExecutor(max_workers=hilos_api)
+    api_vivas = 0
+    if api:
+        necesita_mapa = any(s >= PITSTOPS_DESDE for s in seasons)
+        driver_number_map = get_all_drivers() if necesita_mapa else {}
+        for season in seasons:
+            pool_api.submit(_tarea_api, season, driver_number_map, eventos)
+            api_vivas += 1
+        registrar('api', fin=False)
+
+    # Etapa merge: carrera a carrera sobre la caché de merge_limpio
+    pool_merge = ThreadPoolExecutor(max_workers=hilos_merge)
+    cache_index = cargar_indice('merge_limpio')
+    driver_index = cargar_indice_pilotos()
+    merges_vivos = 0
+
+    def lanzar_merges():
+        nonlocal merges_vivos
+        for (season, rnd), race_filename in list(pendientes.items()):
+            lista_pitstops = (season, rnd) in pitstops or season in pitstops_fin
+            if season in indices and lista_pitstops:
+                del pendientes[(season, rnd)]
+                lanzados.add((season, rnd))
+                futuro = pool_merge.submit(_tarea_merge, season, rnd, race_filename, driver_index, cache_index)
+                futuro.add_done_callback(lambda f, c=(season, rnd): eventos.put(('merge_fin', c, f)))
+                merges_vivos += 1
+
+    crawl_vivo = proceso is not None
+    while crawl_vivo or api_vivas or merges_vivos or pendientes or en_espera:
+        try:
+            evento = eventos.get(timeout=INTERVALO)
+        except queue.Empty:
+            evento = None
+
+        if evento is not None:
+            tipo = evento[0]
+            if tipo == 'calendario':
+                calendarios[evento[1]] = calendario_temporada(evento[1])
+            elif tipo == 'indice':
+                indices.add(evento[1])
+                driver_index = cargar_indice_pilotos()
+            elif tipo == 'pitstops':
+                pitstops.add((evento[1], evento[2]))
+            elif tipo == 'api_fin':
+                _, season, segundos, error = evento
+                api_vivas -= 1
+                registrar('api', segundos)
+                # Aunque falle, la temporada no bloquea el merge: se fusiona con lo que haya
+                indices.add(season)
+                pitstops_fin.add(season)
+                calendarios.setdefault(season, calendario_temporada(season))
+                driver_index = cargar_indice_pilotos()
+                print(f"  🌐 {season}: API {'✅' if error is None else f'❌ {error}'} ({segundos:.1f} s)")
+            elif tipo == 'merge_fin':
+                _, (season, rnd), futuro = evento
+                merges_vivos -= 1
+                try:
+                    filas, rebuilt, segundos = futuro.result()
+                    registrar('merge', segundos)
+                    print(f"  🔀 {season} R{rnd:02d}: {filas} filas{'' if rebuilt else ' (caché)'}")
+                except Exception as error:
+                    print(f"  ❌ Merge {season} R{rnd:02d}: {error}")
+
+        # Resultados nuevos del crawler
+        if crawl_vivo:
+            en_espera += _resultados_nuevos(seasons, marca, vistos)
+            if proceso.poll() is not None:
+                en_espera += _resultados_nuevos(seasons, marca, vistos)
+                crawl_vivo = False
+                registrar('crawl', time.perf_counter() - inicio - tiempos['crawl']['inicio'])
+                print(f"  🕷️  Crawl terminado (código {proceso.returncode})")
+
+        # Resultados con calendario disponible -> nodo (season, round)
+        for season, race_filename in list(en_espera):
+            calendar = calendarios.get(season)
+            if calendar is None:
+                continue
+            en_espera.remove((season, race_filename))
+            rnd = find_race_number(season, race_filename, calendar)
+            if rnd is None:
+                sin_ronda.append((season, race_filename))
+            elif (season, rnd) not in lanzados:
+                pendientes[(season, rnd)] = race_filename
+
+        lanzar_merges()
+
+        # Sin API viva ni crawl, una temporada que nunca recibió calendario no va a recibirlo
+        if not api_vivas and not crawl_vivo and not merges_vivos:
+            if en_espera:
+                sin_ronda += en_espera
+                en_espera = []
+
+    pool_api.shutdown()
+    pool_merge.shutdown()
+    guardar_indice('merge_limpio', cache_index)
+    if sin_ronda:
+        print(f"⚠️  {len(sin_ronda)} resultados sin ronda en el calendario, p. ej. {sin_ronda[0]}")
+
+    # Etapa final: combinar desde la caché, publicar, agregados y características
+    t0 = time.perf_counter()
+    final_df = merge_all_data()
+    registrar('final', time.perf_counter() - t0)
+
+    resumen_tiempos(tiempos, time.perf_counter() - inicio)
+    return final_df
+
+def resumen_tiempos(tiempos, total):
+    """Tabla de tiempos por etapa y comparación con la ejecución en serie."""
+    print(f"\n⏱️  TIEMPOS POR ETAPA")
+    print(f"   {'etapa':<7} {'tareas':>6} {'inicio':>8} {'fin':>8} {'duración':>9} {'ocupado':>9}")
+    en_serie = 0.0
+    for etapa, t in tiempos.items():
+        if t['inicio'] is None:
+            continue
+        duracion = t['fin'] - t['inicio']
+        en_serie += duracion
+        print(f"   {etapa:<7} {t['tareas']:>6} {t['inicio']:>7.1f}s {t['fin']:>7.1f}s "
+              f"{duracion:>8.1f}s {t['ocupado']:>8.1f}s")
+    print(f"   Total {total:.1f} s | etapas una tras otra: {en_serie:.1f} s "
+          f"({en_serie / max(total, 1e-9):.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresco completo con crawl, API y merge solapados")
+    parser.add_argument("seasons", nargs="*", type=int, help="temporadas (por defecto, todas)")
+    parser.add_argument("--hilos-api", type=int, default=4, help="temporadas de la API en paralelo")
+    parser.add_argument("--hilos-merge", type=int, default=4, help="carreras fusionándose en paralelo")
+    parser.add_argument("--por-hora", type=int, default=funciones_api.MAX_POR_HORA,
+                        help="máximo de llamadas por hora a Jolpica (compartido por todos los hilos)")
+    parser.add_argument("--sin-crawl", action="store_true", help="usar los resultados que ya hay en data/")
+    parser.add_argument("--sin-api", action="store_true", help="usar calendarios, índice y pitstops ya descargados")
+    args = parser.parse_args()
+
+    funciones_api.MAX_POR_HORA = args.por_hora
+    seasons = sorted(args.seasons) or temporadas()
+    dataset = refrescar(seasons, args.hilos_api, args.hilos_merge, crawl=not args.sin_crawl, api=not args.sin_api)
+    sys.exit(0 if dataset is not None else 1)
@@ -0,0 +1,146 @@
+"""
+Particiones por temporada y lectura con salto de particiones
+============================================================
+Los CSV de merged_data se escriben temporada a temporada
+(escribir_csv_particionado) y para cada temporada se guardan en el
+*_metadata.json sus filas y su rango de bytes en el fichero, junto con
+estadísticas de columnas: mín/máx de RaceNumber, Points y
+MedianPitStopDuration, nulos por columna y pilotos/constructores distintos.
+leer_filtrado() usa esas estadísticas para descartar las temporadas que no
+pueden cumplir el filtro y lee del CSV solo los rangos de bytes del resto:
+"pitstops de 2022-2024" lee una fracción del fichero.
+"""
+
+import io
+import json
+import math
+import pandas as pd
+from esquema import leer_dataset
+
+# Columnas con mín/máx en las estadísticas de cada partición
+COLUMNAS_RANGO = ['RaceNumber', 'Points', 'MedianPitStopDuration']
+
+def _valor_json(valor):
+    """Escalares de NumPy/pandas a tipos JSON (NaN/NA -> None)."""
+    if valor is None or pd.isna(valor):
+        return None
+    valor = valor.item() if hasattr(valor, 'item') else valor
+    return None if isinstance(valor, float) and math.isnan(valor) else valor
+
+def estadisticas_particion(df):
+    """Estadísticas de columna de un trozo del dataset."""
+    estadisticas = {'rows': len(df), 'null_counts': {col: int(n) for col, n in df.isna().sum().items()}}
+    for col in COLUMNAS_RANGO:
+        if col in df.columns:
+            valores = pd.to_numeric(df[col], errors='coerce')
+            estadisticas[col] = {'min': _valor_json(valores.min()), 'max': _valor_json(valores.max())}
+    for nombre, cols in [('distinct_drivers', ['DriverId', 'Driver']), ('distinct_constructors', ['Constructor'])]:
+        col = next((c for c in cols if c in df.columns), None)
+        if col is not None:
+            estadisticas[nombre] = int(df[col].nunique(dropna=True))
+    return estadisticas
+
+def escribir_csv_particionado(df, path, clave='Season'):
+    """
+    Escribe df en CSV (mismo contenido que df.to_csv(path, index=False)) una
+    temporada tras otra y devuelve la lista de particiones con su rango de
+    filas, su rango de bytes y sus estadísticas.
+    Si las filas de una temporada no son contiguas se escribe tal cual y se
+    devuelve None (sin rangos no se puede saltar nada).
+    """
+    claves = df[clave].to_numpy()
+    cortes = [0] + [i for i in range(1, len(df)) if claves[i] != claves[i - 1]] + [len(df)]
+    if len(cortes) - 1 != df[clave].nunique(dropna=False):
+        df.to_csv(path, index=False)
+        return None
+
+    particiones = []
+    with open(path, 'wb') as f:
+        f.write(df.iloc[:0].to_csv(index=False).encode('utf-8'))
+        for inicio, fin in zip(cortes[:-1], cortes[1:]):
+            trozo = df.iloc[inicio:fin]
+            byte_inicio = f.tell()
+            f.write(trozo.to_csv(index=False, header=False).encode('utf-8'))
+            particiones.append({
+                clave: _valor_json(claves[inicio]),
+                'row_start': inicio, 'row_end': fin,
+                'byte_start': byte_inicio, 'byte_end': f.tell(),
+                **estadisticas_particion(trozo),
+            })
+    return particiones
+
+def _puede_cumplir(particion, clave, valores, rangos, con_datos):
+    """False si las estadísticas garantizan que ninguna fila de la partición cumple el filtro."""
+    if valores is not None and particion[clave] not in valores:
+        return False
+    for col, (minimo, maximo) in rangos.items():
+        rango = particion.get(col)
+        if rango is None or rango['min'] is None:
+            return False
+        if (maximo is not None and rango['min'] > maximo) or (minimo is not None and rango['max'] < minimo):
+            return False
+    return all(particion['null_counts'].get(col, particion['rows']) < particion['rows'] for col in con_datos)
+
+def leer_filtrado(path, seasons=None, rangos=None, con_datos=(), columnas=None, clave='Season'):
+    """
+    Lee de un CSV de merged_data solo las filas que pueden cumplir el filtro:
+    seasons: temporadas; rangos: {columna: (mín, máx)} (None = sin límite);
+    con_datos: columnas que no pueden ser nulas. Las particiones descartadas
+    por sus estadísticas no se leen; en las demás se aplica el filtro exacto.
+    """
+    rangos = rangos or {}
+    with open(path.replace('.csv', '_metadata.json')) as f:
+        particiones = json.load(f).get('partitions')
+
+    valores = None if seasons is None else {int(s) for s in seasons}
+    if particiones is None:  # metadatos sin particiones: lectura completa
+        elegidas, df = None, leer_dataset(path, columnas)
+    else:
+        elegidas = [p for p in particiones if _puede_cumplir(p, clave, valores, rangos, con_datos)]
+        with open(path, 'rb') as f:
+            cabecera = f.readline()
+            bloques = []
+            for p in elegidas:
+                f.seek(p['byte_start'])
+                bloques.append(f.read(p['byte_end'] - p['byte_start']))
+        df = leer_dataset(io.BytesIO(cabecera + b''.join(bloques)), columnas)
+
+    # Filtro exacto sobre las filas leídas
+    mascara = pd.Series(True, index=df.index)
+    if valores is not None and clave in df.columns:
+        mascara &= df[clave].isin(valores)
+    for col, (minimo, maximo) in rangos.items():
+        if col in df.columns:
+            valores_col = pd.to_numeric(df[col], errors='coerce')
+            mascara &= valores_col.between(-math.inf if minimo is None else minimo,
+                                           math.inf if maximo is None else maximo)
+    for col in con_datos:
+        if col in df.columns:
+            mascara &= df[col].notna()
+
+    if elegidas is not None:
+        leidos = sum(p['byte_end'] - p['byte_start'] for p in elegidas)
+        total = sum(p['byte_end'] - p['byte_start'] for p in particiones)
+        print(f"🔎 {len(elegidas)}/{len(particiones)} temporadas leídas ({leidos/max(total, 1)*100:.1f}% de los bytes)")
+    return df[mascara].reset_index(drop=True)
+
+if __name__ == "__main__":
+    # Uso: python particiones.py [csv] [desde] [hasta]  -> pitstops de esas temporadas
+    import sys
+    import time
+    path = sys.argv[1] if len(sys.argv) > 1 else "merged_data/f1_clean_dataset.csv"
+    desde, hasta = (int(a) for a in sys.argv[2:4]) if len(sys.argv) > 3 else (2022, 2024)
+
+    inicio = time.perf_counter()
+    df = leer_filtrado(path, seasons=range(desde, hasta + 1), con_datos=['MedianPitStopDuration'])
+    segundos = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    completo = leer_dataset(path)
+    completo = completo[completo['Season'].between(desde, hasta) & completo['MedianPitStopDuration'].notna()]
+    segundos_completo = time.perf_counter() - inicio
+
+    # Las categorías solo incluyen los valores leídos: se comparan los valores, no los dtypes
+    iguales = df.astype(object).equals(completo.reset_index(drop=True).astype(object))
+    print(f"📊 Pitstops {desde}-{hasta}: {len(df)} filas en {segundos*1000:.1f} ms "
+          f"(lectura completa {segundos_completo*1000:.1f} ms) | {'✅ iguales' if iguales else '❌ distintos'}")
@@ -0,0 +1,170 @@
+"""
+Backfill del histórico completo (1950-hoy)
+==========================================
+Descarga todas las temporadas del campeonato, no solo 2012-2024, dividiendo
+el trabajo en shards de una temporada:
+- resultados de Wikipedia: un único proceso de Scrapy (f1spiders.py) con
+  todas las temporadas pendientes; Scrapy limita la concurrencia por dominio
+  y reintenta los 429, y su JOBDIR permite reanudar un crawl interrumpido.
+- datos de Jolpica (calendario, índice de pilotos, pitstops, vueltas): un
+  hilo por temporada en paralelo, todos bajo el mismo límite de llamadas de
+  funciones_api (esperar_turno / pausa global tras un 429).
+Ambas partes se ejecutan a la vez. El progreso de cada (temporada, tarea)
+se guarda en data/backfill/estado.json tras cada paso, así que volver a
+lanzar el script tras un fallo o una tormenta de 429 continúa donde se
+quedó: las tareas hechas se saltan y, dentro de una temporada, también las
+carreras ya descargadas.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import funciones_api
+from calendarios import PRIMERA_TEMPORADA, carreras_temporada, temporadas
+from funciones_api import (PITSTOPS_DESDE, VUELTAS_DESDE, build_laps_for_season,
+                           build_pitstops_for_season, get_all_drivers)
+from indice_pilotos import entradas_temporada, guardar_entradas
+
+BACKFILL_DIR = "data/backfill"
+ESTADO_PATH = os.path.join(BACKFILL_DIR, "estado.json")
+CRAWL_JOBDIR = os.path.join(BACKFILL_DIR, "crawl")
+SPIDER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "f1spiders.py")
+
+HECHO = "hecho"
+
+_estado_lock = threading.Lock()
+
+def cargar_estado():
+    """Estado del backfill: {temporada: {tarea: 'hecho' | 'error: ...'}}."""
+    if not os.path.exists(ESTADO_PATH):
+        return {}
+    with open(ESTADO_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def marcar(estado, season, tarea, resultado):
+    """Registra el resultado de una tarea y guarda el estado (atómico, seguro entre hilos)."""
+    with _estado_lock:
+        estado.setdefault(str(season), {})[tarea] = resultado
+        os.makedirs(BACKFILL_DIR, exist_ok=True)
+        with open(ESTADO_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(estado, f, indent=2, sort_keys=True)
+        os.replace(ESTADO_PATH + ".tmp", ESTADO_PATH)
+
+def tareas_api(season):
+    """Tareas de la API que tienen sentido para la temporada, en orden de ejecución."""
+    tareas = ["calendario", "indice"]
+    if season >= PITSTOPS_DESDE:
+        tareas.append("pitstops")
+    if season >= VUELTAS_DESDE:
+        tareas.append("vueltas")
+    return tareas
+
+def pendientes(estado, season, tareas):
+    hechas = estado.get(str(season), {})
+    return [t for t in tareas if hechas.get(t) != HECHO]
+
+def ejecutar_tarea(tarea, season, driver_number_map):
+    if tarea == "calendario":
+        if not carreras_temporada(season, actualizar=True):
+            raise RuntimeError("calendario vacío")
+    elif tarea == "indice":
+        guardar_entradas([entradas_temporada(season)], [season])
+    elif tarea == "pitstops":
+        build_pitstops_for_season(season, driver_number_map, saltar_existentes=True)
+    elif tarea == "vueltas":
+        build_laps_for_season(season, saltar_existentes=True)
+
+def procesar_shard(season, tareas, estado, driver_number_map):
+    """
+    Ejecuta en orden las tareas pendientes de una temporada. Se detiene en la
+    primera que falla: queda marcada con el error y se reintenta al relanzar.
+    """
+    for tarea in tareas:
+        try:
+            ejecutar_tarea(tarea, season, driver_number_map)
+        except Exception as error:
+            marcar(estado, season, tarea, f"error: {error}")
+            return False
+        marcar(estado, season, tarea, HECHO)
+    return True
+
+def lanzar_crawl(seasons):
+    """
+    Lanza el crawler en un proceso aparte (el reactor de Scrapy solo puede
+    arrancar una vez por proceso) para que corra a la vez que la API.
+    """
+    print(f"🕷️  Crawl de Wikipedia: {len(seasons)} temporadas")
+    return subprocess.Popen([sys.executable, SPIDER_PATH, "--jobdir", CRAWL_JOBDIR, *map(str, seasons)])
+
+def cerrar_crawl(proceso, seasons, estado):
+    """
+    Espera al crawler y marca como hechas las temporadas con resultados. Si
+    el crawl no termina bien se conserva su JOBDIR para reanudarlo.
+    """
+    if proceso.wait() != 0:
+        print(f"❌ El crawler terminó con código {proceso.returncode}; se reanudará en la próxima ejecución")
+        return
+
+    for season in seasons:
+        results_dir = f"data/{season}"
+        con_csv = os.path.isdir(results_dir) and any(f.endswith(".csv") for f in os.listdir(results_dir))
+        marcar(estado, season, "resultados", HECHO if con_csv else "error: sin tablas de resultados")
+    shutil.rmtree(CRAWL_JOBDIR, ignore_errors=True)
+
+def backfill(desde, hasta=None, hilos=4, crawl=True, api=True):
+    """Ejecuta (o reanuda) el backfill de las temporadas entre desde y hasta."""
+    seasons = temporadas(desde, hasta, actualizar=True)
+    if not seasons:
+        print(f"⚠️  Sin temporadas entre {desde} y {hasta or 'la última'}: nada que descargar")
+        return False
+    estado = cargar_estado()
+    print(f"📅 Backfill de {len(seasons)} temporadas ({seasons[0]}-{seasons[-1]})")
+
+    proceso = None
+    por_crawlear = [s for s in seasons if crawl and pendientes(estado, s, ["resultados"])]
+    if por_crawlear:
+        proceso = lanzar_crawl(por_crawlear)
+
+    shards = {s: pendientes(estado, s, tareas_api(s)) for s in seasons} if api else {}
+    shards = {s: tareas for s, tareas in shards.items() if tareas}
+    print(f"🌐 API: {len(shards)} temporadas pendientes con {hilos} hilos")
+
+    try:
+        if shards:
+            necesita_mapa = any("pitstops" in tareas for tareas in shards.values())
+            driver_number_map = get_all_drivers() if necesita_mapa else {}
+
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                futuros = {pool.submit(procesar_shard, s, tareas, estado, driver_number_map): s
+                           for s, tareas in shards.items()}
+                for futuro in as_completed(futuros):
+                    season = futuros[futuro]
+                    print(f"  {'✅' if futuro.result() else '❌'} {season}: {estado.get(str(season))}")
+    finally:
+        if proceso is not None:
+            cerrar_crawl(proceso, por_crawlear, estado)
+
+    errores = {s: t for s, t in estado.items() for r in t.values() if r != HECHO}
+    print(f"\n{'🎉 Backfill completo' if not errores else f'⚠️  {len(errores)} temporadas con errores (relanzar para reanudar)'}")
+    return not errores
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill del histórico completo con reanudación")
+    parser.add_argument("--desde", type=int, default=PRIMERA_TEMPORADA, help="primera temporada (1950 por defecto)")
+    parser.add_argument("--hasta", type=int, help="última temporada (por defecto, la más reciente)")
+    parser.add_argument("--hilos", type=int, default=4, help="temporadas de la API en paralelo")
+    parser.add_argument("--por-hora", type=int, default=funciones_api.MAX_POR_HORA,
+                        help="máximo de llamadas por hora a Jolpica (compartido por todos los hilos)")
+    parser.add_argument("--sin-crawl", action="store_true", help="no rastrear Wikipedia")
+    parser.add_argument("--sin-api", action="store_true", help="no descargar datos de Jolpica")
+    args = parser.parse_args()
+
+    funciones_api.MAX_POR_HORA = args.por_hora
+    ok = backfill(args.desde, args.hasta, args.hilos, crawl=not args.sin_crawl, api=not args.sin_api)
+    sys.exit(0 if ok else 1)
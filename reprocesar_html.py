@@ -0,0 +1,72 @@
+"""
+Reprocesado offline del archivo HTML
+====================================
+Regenera data/{year}/*.csv a partir de las páginas guardadas en el archivo
+(archivo_html) con la misma lógica de extracción del crawler
+(extraer_carreras / extraer_tablas de f1spiders), sin red y en
+paralelo: pd.read_html es CPU y en el crawler corre en un único hilo
+dentro del reactor de Scrapy; aquí cada página se procesa en un pool de
+procesos con todos los núcleos.
+1. Páginas de temporada -> lista de carreras (año, nombre, url del Report).
+2. Páginas de carrera (última revisión archivada) -> CSV de carrera,
+   qualifying, sprint y vuelta rápida (extraer_tablas).
+"""
+
+import sys
+import time
+import argparse
+from urllib.parse import urljoin
+from concurrent.futures import ProcessPoolExecutor
+
+from archivo_html import cargar_indice_html, leer_registro, ultimas_revisiones
+from f1spiders import extraer_carreras, extraer_tablas, guardar_tablas
+
+def _carreras_temporada(registro):
+    """Trabajo del pool: (year, [(url absoluta, race_name), ...]) de una página de temporada."""
+    html = leer_registro(registro['file'], registro['offset'], registro['length'])
+    return int(registro['year']), [(urljoin(registro['url'], url), race)
+                                   for url, race in extraer_carreras(html)]
+
+def _tablas_carrera(tarea):
+    """Trabajo del pool: extrae y guarda las tablas de una carrera (carrera, qualifying, sprint, vuelta rápida)."""
+    year, race, registro = tarea
+    tablas = extraer_tablas(leer_registro(registro['file'], registro['offset'], registro['length']))
+    return guardar_tablas(tablas, year, race)
+
+def reprocesar(seasons=None, procesos=None):
+    """
+    Regenera los CSV de las temporadas indicadas (todas las archivadas por
+    defecto). Devuelve el número de CSV escritos.
+    """
+    inicio = time.perf_counter()
+    paginas = ultimas_revisiones(cargar_indice_html())
+    if seasons is not None:
+        paginas = paginas[paginas['year'].isin(seasons)]
+
+    temporadas = paginas[paginas['tipo'] == 'season'].to_dict('records')
+    carreras = paginas[paginas['tipo'] == 'race'].set_index('url')
+    print(f"🗄️  Archivo: {len(temporadas)} temporadas, {len(carreras)} páginas de carrera")
+
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        tareas, faltan = [], []
+        for year, enlaces in pool.map(_carreras_temporada, temporadas):
+            for url, race in enlaces:
+                if url in carreras.index:
+                    tareas.append((year, race, carreras.loc[url].to_dict()))
+                else:
+                    faltan.append(url)
+
+        escritos = [path for paths in pool.map(_tablas_carrera, tareas, chunksize=4) for path in paths]
+
+    print(f"✅ {len(escritos)} CSV regenerados de {len(tareas)} carreras en {time.perf_counter() - inicio:.1f} s")
+    if faltan:
+        print(f"⚠️  {len(faltan)} carreras sin página archivada (hay que volver a rastrearlas), p. ej. {faltan[0]}")
+    return len(escritos)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenera data/{year}/*.csv desde el archivo HTML")
+    parser.add_argument("seasons", nargs="*", type=int, help="temporadas (por defecto, todas las archivadas)")
+    parser.add_argument("--procesos", type=int, help="procesos del pool (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+
+    sys.exit(0 if reprocesar(args.seasons or None, args.procesos) else 1)
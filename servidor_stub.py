@@ -0,0 +1,387 @@
+"""
+Servidor stub de Jolpica y benchmark de descarga
+================================================
+Servidor HTTP local que reproduce respuestas grabadas de Jolpica para poder
+medir y ajustar la capa de descarga (get_json, get_all_drivers, bucle de
+pitstops) sin llamar a la API real:
+- fixtures: una respuesta completa (sin paginar) por endpoint en
+  data/fixtures/jolpica/{ruta}.json.gz; se graban la primera vez que se
+  piden con --grabar, o se generan sintéticas con --sinteticos.
+- el servidor pagina él mismo (?limit=&offset=, 30 por defecto y 100 como
+  máximo, contando el elemento más interno como Ergast: resultados,
+  paradas, tiempos por vuelta...).
+- latencia y jitter configurables y límite de llamadas por segundo con
+  ráfaga: al superarlo responde 429 con Retry-After.
+- /wiki/{título} sirve data/fixtures/wikipedia/{título}.html, para probar
+  el modo vigilancia (vigilancia.py) sin Wikipedia.
+
+El benchmark lanza el servidor en un hilo, apunta funciones_api a él y
+ejecuta el backfill de pitstops (get_all_drivers + build_pitstops_for_season
+por temporada en un pool de hilos) con cada combinación de concurrencia y
+límites del cliente. Mide rendimiento, latencia p50/p95/p99 de las
+peticiones HTTP y el tiempo total perdido en esperas y pausas por 429.
+
+Uso:
+    python servidor_stub.py servir [--puerto 8000] [--grabar] [--latencia 0.05] ...
+    python servidor_stub.py benchmark --hilos 1 4 8 --intervalo 0.3 0.1 0 [--sinteticos]
+"""
+
+import os
+import io
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs, unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = "data/fixtures/jolpica"
+WIKI_FIXTURES_DIR = "data/fixtures/wikipedia"  # páginas /wiki/{título} como {título}.html (vigilancia.py)
+JOLPICA_URL = "https://api.jolpi.ca/ergast/f1"
+PREFIJO = "/ergast/f1"
+
+# Listas anidadas de Ergast; la paginación cuenta los elementos de la más interna
+ANIDADAS = ['Results', 'QualifyingResults', 'SprintResults', 'PitStops', 'Laps', 'Timings']
+
+LIMITE_DEFECTO = 30
+LIMITE_MAX = 100
+
+# ---------------------------------------------------------------------------
+# Fixtures: aplanado y reconstrucción de las tablas de MRData
+# ---------------------------------------------------------------------------
+
+def _tabla(mr):
+    """Devuelve (clave de tabla, clave de lista) de un MRData, p. ej. ('RaceTable', 'Races')."""
+    clave = next(k for k in mr if k.endswith('Table'))
+    lista = next(k for k, v in mr[clave].items() if isinstance(v, list))
+    return clave, lista
+
+def _hojas(elementos):
+    """
+    Aplana una lista de Ergast en (ruta, hoja): ruta es la secuencia de
+    (clave anidada, padre sin esa clave) hasta llegar al elemento más interno.
+    """
+    for elemento in elementos:
+        clave = next((k for k in ANIDADAS if k in elemento), None)
+        if clave is None:
+            yield (), elemento
+            continue
+        padre = {k: v for k, v in elemento.items() if k != clave}
+        for ruta, hoja in _hojas(elemento[clave]):
+            yield ((clave, padre),) + ruta, hoja
+
+def _reconstruir(hojas):
+    """Inversa de _hojas: agrupa hojas consecutivas con los mismos padres."""
+    arbol = []
+    for ruta, hoja in hojas:
+        nivel = arbol
+        for clave, padre in ruta:
+            if not nivel or not isinstance(nivel[-1], tuple) or nivel[-1][0] != padre:
+                nivel.append((padre, clave, []))
+            nivel = nivel[-1][2]
+        nivel.append(hoja)
+
+    def a_dict(nodo):
+        if not isinstance(nodo, tuple):
+            return nodo
+        padre, clave, hijos = nodo
+        return {**padre, clave: [a_dict(h) for h in hijos]}
+
+    return [a_dict(nodo) for nodo in arbol]
+
+def _ruta_fixture(ruta, base):
+    return os.path.join(base, ruta.strip('/') + ".gz")
+
+def cargar_fixture(ruta, base=FIXTURES_DIR):
+    """MRData completo grabado para una ruta ('/2019/1/pitstops.json'), o None."""
+    path = _ruta_fixture(ruta, base)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def guardar_fixture(ruta, mr, base=FIXTURES_DIR):
+    path = _ruta_fixture(ruta, base)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path + ".tmp", 'wt', encoding='utf-8') as f:
+        json.dump(mr, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def grabar_fixture(ruta, base=FIXTURES_DIR):
+    """Descarga todas las páginas de una ruta de la API real y las guarda como un único MRData."""
+    from funciones_api import get_json
+
+    hojas, offset, mr = [], 0, None
+    while True:
+        pagina = get_json(JOLPICA_URL + ruta, {"limit": LIMITE_MAX, "offset": offset})["MRData"]
+        mr = mr or pagina
+        clave, lista = _tabla(pagina)
+        nuevas = list(_hojas(pagina[clave][lista]))
+        hojas.extend(nuevas)
+        offset += LIMITE_MAX
+        if offset >= int(pagina.get("total", 0)) or not nuevas:
+            break
+
+    clave, lista = _tabla(mr)
+    completo = {**mr, clave: {**mr[clave], lista: _reconstruir(hojas)}, "total": str(len(hojas))}
+    guardar_fixture(ruta, completo, base)
+    return completo
+
+def paginar(mr, limit, offset):
+    """Página [offset, offset+limit) de un MRData completo, con total/limit/offset como Ergast."""
+    clave, lista = _tabla(mr)
+    hojas = list(_hojas(mr[clave][lista]))
+    return {**mr, "limit": str(limit), "offset": str(offset), "total": str(len(hojas)),
+            clave: {**mr[clave], lista: _reconstruir(hojas[offset:offset + limit])}}
+
+def generar_fixtures(seasons=range(2019, 2025), carreras=22, pilotos=20, semilla=0):
+    """Fixtures sintéticas (temporadas, pilotos, calendarios y pitstops) para el benchmark."""
+    rng = random.Random(semilla)
+    ids = [f"piloto_{i:02d}" for i in range(pilotos)]
+
+    def mrdata(clave, lista, elementos):
+        return {"series": "f1", "total": str(len(elementos)), clave: {lista: elementos}}
+
+    guardar_fixture("/seasons.json", mrdata("SeasonTable", "Seasons", [{"season": str(s)} for s in seasons]))
+    guardar_fixture("/drivers.json", mrdata("DriverTable", "Drivers",
+                                            [{"driverId": d, "permanentNumber": str(i + 2)} for i, d in enumerate(ids)]))
+    for season in seasons:
+        races = [{"season": str(season), "round": str(r), "raceName": f"Carrera {r} Grand Prix"}
+                 for r in range(1, carreras + 1)]
+        guardar_fixture(f"/{season}/races.json", mrdata("RaceTable", "Races", races))
+        for race in races:
+            paradas = [{"driverId": d, "lap": str(10 * stop + rng.randint(0, 9)), "stop": str(stop),
+                        "time": f"14:{rng.randint(10, 59)}:{rng.randint(10, 59)}",
+                        "duration": f"{rng.uniform(20, 30):.3f}"}
+                       for d in ids for stop in range(1, rng.randint(1, 3) + 1)]
+            guardar_fixture(f"/{season}/{race['round']}/pitstops.json",
+                            mrdata("RaceTable", "Races", [{**race, "PitStops": paradas}]))
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+
+class _Cubo:
+    """Cubo de fichas compartido por todas las conexiones: 'por_segundo' llamadas con ráfaga."""
+
+    def __init__(self, por_segundo, rafaga):
+        self.por_segundo, self.rafaga = por_segundo, rafaga
+        self.fichas, self.instante = float(rafaga), time.monotonic()
+        self.lock = threading.Lock()
+
+    def tomar(self):
+        if not self.por_segundo:
+            return True
+        with self.lock:
+            ahora = time.monotonic()
+            self.fichas = min(self.rafaga, self.fichas + (ahora - self.instante) * self.por_segundo)
+            self.instante = ahora
+            if self.fichas < 1:
+                return False
+            self.fichas -= 1
+            return True
+
+class _Manejador(BaseHTTPRequestHandler):
+    config = None  # SimpleNamespace con latencia, jitter, cubo, grabar, fixtures, wiki
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        ruta = url.path[len(PREFIJO):] if url.path.startswith(PREFIJO) else url.path
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        config = self.config
+
+        time.sleep(max(0.0, config.latencia + random.uniform(-config.jitter, config.jitter)))
+
+        if not config.cubo.tomar():
+            return self._responder(429, {"detail": "Too Many Requests"}, {"Retry-After": "1"})
+
+        if url.path.startswith("/wiki/"):
+            return self._responder_html(os.path.join(config.wiki, unquote(url.path[len("/wiki/"):]) + ".html"))
+
+        mr = cargar_fixture(ruta, config.fixtures)
+        if mr is None and config.grabar:
+            mr = grabar_fixture(ruta, config.fixtures)
+        if mr is None:
+            return self._responder(404, {"detail": f"Sin fixture para {ruta}"})
+
+        limit = min(int(params.get("limit", LIMITE_DEFECTO)), LIMITE_MAX)
+        offset = int(params.get("offset", 0))
+        self._responder(200, {"MRData": paginar(mr, limit, offset)})
+
+    def _responder(self, codigo, datos, cabeceras={}):
+        cuerpo = json.dumps(datos).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in cabeceras.items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_html(self, path):
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            cuerpo = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+def crear_servidor(puerto=0, latencia=0.05, jitter=0.02, limite=4.0, rafaga=4, grabar=False):
+    """
+    Crea el servidor (sin arrancarlo). limite=0 desactiva el 429.
+    Devuelve (servidor, url base para funciones_api.BASE_URL).
+    """
+    # Ruta absoluta: el benchmark ejecuta el cliente en un directorio temporal
+    config = SimpleNamespace(latencia=latencia, jitter=jitter, cubo=_Cubo(limite, rafaga), grabar=grabar,
+                             fixtures=os.path.abspath(FIXTURES_DIR), wiki=os.path.abspath(WIKI_FIXTURES_DIR))
+    manejador = type("Manejador", (_Manejador,), {"config": config})
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}{PREFIJO}"
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def backfill_pitstops(seasons, hilos):
+    """Backfill de pitstops como el de relleno_historico: una temporada por hilo."""
+    import funciones_api
+
+    driver_number_map = funciones_api.get_all_drivers()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(lambda s: funciones_api.build_pitstops_for_season(s, driver_number_map), seasons))
+
+def ejecutar(url, seasons, hilos, intervalo, por_hora):
+    """Una ejecución del backfill contra el stub; devuelve sus métricas."""
+    import funciones_api
+
+    latencias, codigos, esperas, pausas = [], [], [], []
+    get_original, esperar_original, pausar_original = (
+        funciones_api.requests.get, funciones_api.esperar_turno, funciones_api.pausar_llamadas)
+
+    def get_medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        resp = get_original(*args, **kwargs)
+        latencias.append(time.perf_counter() - inicio)
+        codigos.append(resp.status_code)
+        return resp
+
+    def esperar_medido():
+        inicio = time.perf_counter()
+        esperar_original()
+        esperas.append(time.perf_counter() - inicio)
+
+    def pausar_medido(segundos):
+        pausas.append(segundos)
+        pausar_original(segundos)
+
+    funciones_api.BASE_URL, funciones_api.INTERVALO_MIN, funciones_api.MAX_POR_HORA = url, intervalo, por_hora
+    funciones_api.requests = SimpleNamespace(get=get_medido)
+    funciones_api.esperar_turno, funciones_api.pausar_llamadas = esperar_medido, pausar_medido
+    funciones_api.reiniciar_limitador()
+
+    directorio = os.getcwd()
+    inicio = time.perf_counter()
+    try:
+        # Cada ejecución en un directorio temporal: calendarios y CSV se descargan de cero
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(tmp)
+            backfill_pitstops(seasons, hilos)
+            error = ""
+    except Exception as e:
+        error = str(e)
+    finally:
+        total = time.perf_counter() - inicio
+        os.chdir(directorio)
+        funciones_api.requests = sys.modules["requests"]
+        funciones_api.esperar_turno, funciones_api.pausar_llamadas = esperar_original, pausar_original
+
+    ms = np.array(latencias) * 1000
+    ok = sum(c == 200 for c in codigos)
+    return {
+        "hilos": hilos, "intervalo_s": intervalo,
+        "llamadas": len(codigos), "429": sum(c == 429 for c in codigos),
+        "total_s": round(total, 2), "llamadas_ok_s": round(ok / total, 1),
+        "p50_ms": round(np.percentile(ms, 50), 1) if len(ms) else np.nan,
+        "p95_ms": round(np.percentile(ms, 95), 1) if len(ms) else np.nan,
+        "p99_ms": round(np.percentile(ms, 99), 1) if len(ms) else np.nan,
+        "espera_limitador_s": round(sum(esperas), 2), "pausas_429_s": round(sum(pausas), 2),
+        "error": error,
+    }
+
+def benchmark(hilos=(1, 4), intervalos=(0.3, 0.1, 0.0), por_hora=100_000, seasons=None, **servidor):
+    """
+    Ejecuta el backfill de pitstops contra el stub para cada combinación de
+    concurrencia (hilos) e intervalo mínimo del cliente, e imprime la tabla.
+    'servidor' son los parámetros de crear_servidor (latencia, jitter, limite, rafaga).
+    """
+    if seasons is None:
+        seasons = [s["season"] for s in cargar_fixture("/seasons.json")["SeasonTable"]["Seasons"]]
+    seasons = [int(s) for s in seasons]
+
+    srv, url = crear_servidor(**servidor)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f"🧪 Stub en {url} ({servidor}); {len(seasons)} temporadas")
+
+    try:
+        filas = []
+        for n_hilos in hilos:
+            for intervalo in intervalos:
+                filas.append(ejecutar(url, seasons, n_hilos, intervalo, por_hora))
+                print(f"   hilos={n_hilos} intervalo={intervalo}s: {filas[-1]['total_s']} s")
+    finally:
+        srv.shutdown()
+
+    tabla = pd.DataFrame(filas)
+    print(tabla.to_string(index=False))
+    return tabla
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor stub de Jolpica y benchmark de descarga")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    for nombre in ("servir", "benchmark"):
+        p = sub.add_parser(nombre)
+        p.add_argument("--latencia", type=float, default=0.05, help="latencia media por petición (s)")
+        p.add_argument("--jitter", type=float, default=0.02, help="variación máxima de la latencia (s)")
+        p.add_argument("--limite", type=float, default=4.0, help="peticiones por segundo antes de 429 (0 = sin límite)")
+        p.add_argument("--rafaga", type=int, default=4, help="peticiones seguidas permitidas")
+    sub.choices["servir"].add_argument("--puerto", type=int, default=8000)
+    sub.choices["servir"].add_argument("--grabar", action="store_true",
+                                       help="graba desde la API real las rutas sin fixture")
+    sub.choices["benchmark"].add_argument("--hilos", type=int, nargs="+", default=[1, 4])
+    sub.choices["benchmark"].add_argument("--intervalo", type=float, nargs="+", default=[0.3, 0.1, 0.0],
+                                          help="intervalos mínimos del cliente entre llamadas (s)")
+    sub.choices["benchmark"].add_argument("--por-hora", type=int, default=100_000,
+                                          help="límite por hora del cliente durante el benchmark")
+    sub.choices["benchmark"].add_argument("--seasons", type=int, nargs="+", help="por defecto, las de las fixtures")
+    sub.choices["benchmark"].add_argument("--sinteticos", action="store_true",
+                                          help="genera fixtures sintéticas (2019-2024) antes de empezar")
+    args = parser.parse_args()
+
+    servidor = dict(latencia=args.latencia, jitter=args.jitter, limite=args.limite, rafaga=args.rafaga)
+    if args.orden == "servir":
+        srv, url = crear_servidor(args.puerto, grabar=args.grabar, **servidor)
+        print(f"🧪 Stub de Jolpica en {url} (JOLPICA_URL={url} python funciones_api.py ...)")
+        print(f"   Páginas de {WIKI_FIXTURES_DIR} en {url[:-len(PREFIJO)]}/wiki/ (WIKIPEDIA_URL para vigilancia.py)")
+        srv.serve_forever()
+    else:
+        if args.sinteticos:
+            generar_fixtures()
+        benchmark(args.hilos, args.intervalo, args.por_hora, args.seasons, **servidor)
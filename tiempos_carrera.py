@@ -0,0 +1,144 @@
+"""
+Parser vectorizado de Time/Retired
+==================================
+La columna 'Time/Retired' de las tablas de Wikipedia mezcla tiempos totales
+("1:32:04.123"), diferencias con el ganador ("+5.432", "+1:05.123"), vueltas
+perdidas ("+1 Lap") y motivos de abandono ("Engine", "Retired"...).
+Aquí se interpreta toda la columna de una vez con str.extract y se generan
+columnas numéricas tipadas:
+- RaceTimeMs: tiempo total de carrera en ms (ganador + diferencia)
+- GapMs: diferencia con el ganador en ms
+- LapsDown: vueltas perdidas respecto al ganador
+- Status: Finished / Lapped / Retired / DSQ / DNS
+"""
+
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow es opcional: sin él se usa str.extract de pandas
+    pa = None
+
+PATRON_TIEMPO = (
+    r'^(?:(?P<h>\d+):(?P<m>\d{1,2}):(?P<s>\d{1,2}(?:\.\d+)?)'    # 1:32:04.123
+    r'|\+\s*(?:(?P<gm>\d+):)?(?P<gs>\d+(?:\.\d+)?)\s*s?'          # +5.432 / +1:05.123
+    r'|\+\s*(?P<laps>\d+)\s+[Ll]aps?)$'                           # +1 Lap / +2 Laps
+)
+
+NOTA_AL_PIE = r'\[[^\]]*\]'
+
+COLUMNAS_TIEMPO = ['RaceTimeMs', 'GapMs', 'LapsDown', 'Status']
+
+def _extraer_partes(unicos):
+    """
+    Aplica PATRON_TIEMPO a los valores distintos de la columna y devuelve un
+    DataFrame float con los grupos (h, m, s, gm, gs, laps) y los indicadores dsq/dns.
+    Con pyarrow la expresión regular se evalúa en C++ (pc.extract_regex);
+    sin él se usa str.extract, que recorre los valores en Python.
+    """
+    if pa is not None:
+        texto = pa.array(unicos, type=pa.string())
+        texto = pc.utf8_trim_whitespace(pc.replace_substring_regex(texto, NOTA_AL_PIE, ''))
+        grupos = pc.extract_regex(texto, PATRON_TIEMPO)
+        partes = {}
+        for campo in ['h', 'm', 's', 'gm', 'gs', 'laps']:
+            # RE2 devuelve '' en los grupos de alternativas que no han casado
+            grupo = grupos.field(campo)
+            grupo = pc.if_else(pc.equal(grupo, ''), pa.scalar(None, pa.string()), grupo)
+            partes[campo] = pc.cast(grupo, pa.float64()).to_numpy(zero_copy_only=False)
+        partes['dsq'] = pc.match_substring_regex(texto, 'disqualif', ignore_case=True).to_numpy(zero_copy_only=False)
+        partes['dns'] = pc.match_substring_regex(texto, 'did not start|withdrew', ignore_case=True).to_numpy(zero_copy_only=False)
+        return pd.DataFrame(partes).astype(float)
+
+    texto = pd.Series(unicos, dtype=object).str.replace(NOTA_AL_PIE, '', regex=True).str.strip()
+    partes = texto.str.extract(PATRON_TIEMPO).astype(float)
+    minus = texto.str.lower()
+    partes['dsq'] = minus.str.contains('disqualif').astype(float)
+    partes['dns'] = minus.str.contains('did not start|withdrew').astype(float)
+    return partes
+
+def parse_time_retired(df, col='Time/Retired'):
+    """
+    Añade RaceTimeMs, GapMs, LapsDown y Status a df a partir de 'col'.
+    La expresión regular se aplica una sola vez por valor distinto
+    (factorize) y el resto son operaciones sobre arrays NumPy.
+    El tiempo total de los que terminan detrás del ganador se obtiene sumando
+    su diferencia al tiempo del ganador de la misma (Season, RaceNumber).
+    """
+    codigos, unicos = pd.factorize(df[col].astype(object))
+    partes = _extraer_partes(np.asarray(unicos, dtype=object))
+
+    # Fila extra de NaN para los valores nulos (código -1)
+    valores = np.vstack([partes.to_numpy(), np.full((1, partes.shape[1]), np.nan)])[codigos]
+    v = dict(zip(partes.columns, valores.T))
+
+    total_ms = (v['h'] * 3600 + v['m'] * 60 + v['s']) * 1000
+    gap_ms = np.where(np.isnan(v['gs']), np.where(np.isnan(total_ms), np.nan, 0),
+                      (np.nan_to_num(v['gm']) * 60 + v['gs']) * 1000)
+
+    ganador_ms = pd.Series(total_ms, index=df.index).groupby([df['Season'], df['RaceNumber']]).transform('max')
+    race_ms = np.where(np.isnan(total_ms), ganador_ms.to_numpy() + gap_ms, total_ms)
+    laps_down = np.where(np.isnan(v['laps']), np.where(np.isnan(gap_ms), np.nan, 0), v['laps'])
+
+    status = np.select(
+        [~np.isnan(gap_ms), ~np.isnan(v['laps']), v['dsq'] == 1, v['dns'] == 1],
+        ['Finished', 'Lapped', 'DSQ', 'DNS'],
+        default='Retired',
+    )
+
+    return df.assign(
+        RaceTimeMs=pd.array(np.round(race_ms), dtype='Float64').astype('Int32'),
+        GapMs=pd.array(np.round(gap_ms), dtype='Float64').astype('Int32'),
+        LapsDown=pd.array(laps_down, dtype='Float64').astype('Int8'),
+        Status=pd.Categorical(status, categories=['Finished', 'Lapped', 'Retired', 'DSQ', 'DNS']),
+    )
+
+def parse_time_retired_fila(valor):
+    """
+    Versión fila a fila (la forma en la que se parseaba hasta ahora).
+    Solo se usa como referencia en el benchmark; devuelve (total_ms, gap_ms, laps_down).
+    """
+    if pd.isna(valor):
+        return None, None, None
+    valor = re.sub(NOTA_AL_PIE, '', str(valor)).strip()
+    m = re.match(PATRON_TIEMPO, valor)
+    if not m:
+        return None, None, None
+    if m['h']:
+        return (int(m['h']) * 3600 + int(m['m']) * 60 + float(m['s'])) * 1000, 0, None
+    if m['gs']:
+        return None, (int(m['gm'] or 0) * 60 + float(m['gs'])) * 1000, 0
+    return None, None, int(m['laps'])
+
+def benchmark(path="merged_data/f1_clean_dataset.csv", repeticiones=5):
+    """Compara el parser vectorizado con el parseo fila a fila sobre el dataset completo."""
+    df = pd.read_csv(path)
+    print(f"📊 {path}: {len(df):,} filas")
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        vectorizado = parse_time_retired(df)
+    t_vector = (time.perf_counter() - inicio) / repeticiones
+
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        filas = df['Time/Retired'].apply(parse_time_retired_fila)
+    t_filas = (time.perf_counter() - inicio) / repeticiones
+
+    # Comprobar que ambos coinciden en las diferencias
+    gap_filas = pd.to_numeric(filas.str[1], errors='coerce').round().astype('Int32')
+    coinciden = vectorizado['GapMs'].equals(gap_filas)
+
+    print(f"   Vectorizado:  {t_vector*1000:8.2f} ms")
+    print(f"   Fila a fila:  {t_filas*1000:8.2f} ms  (x{t_filas/t_vector:.1f})")
+    print(f"   GapMs coincide con la referencia: {'✅' if coinciden else '❌'}")
+    print(vectorizado['Status'].value_counts().to_string())
+    return t_vector, t_filas
+
+if __name__ == "__main__":
+    benchmark(*sys.argv[1:2])
@@ -0,0 +1,309 @@
+"""
+Motor de reglas de validación del dataset fusionado
+===================================================
+Las reglas se declaran en REGLAS (nombre, tipo, parámetros y severidad) y
+se evalúan vectorizadas:
+- reglas por fila ('rango', 'no_nulo'): una máscara booleana por regla;
+- 'unica': filas repetidas por clave con duplicated();
+- reglas por carrera ('contigua', 'cobertura'): cada una declara las
+  agregaciones que necesita y todas se calculan en UNA sola pasada
+  groupby(Season, RaceNumber); después cada regla solo compara columnas
+  del resultado agregado.
+validar(df) trabaja con el DataFrame en memoria; validar_csv(path) lee el
+CSV por trozos (solo las columnas de las reglas) sin partir ninguna
+carrera entre dos trozos. Ambos devuelven el mismo informe: por regla,
+las filas que la incumplen (con su número de fila), las carreras afectadas
+y los segundos que ha costado.
+"""
+
+import sys
+import time
+import pandas as pd
+
+from esquema import ESQUEMA_DATASET, nombre_canonico
+
+CLAVE_CARRERA = ['Season', 'RaceNumber']
+
+# severidad 'error': el dataset no es válido; 'aviso': se informa pero no invalida
+REGLAS = [
+    {'nombre': 'piloto_unico', 'tipo': 'unica', 'severidad': 'error',
+     'columnas': ['Season', 'RaceNumber', 'DriverNumber'],
+     'descripcion': "Un piloto aparece una sola vez por carrera (Season, RaceNumber, DriverNumber)"},
+    {'nombre': 'posiciones_contiguas', 'tipo': 'contigua', 'severidad': 'error', 'columna': 'Position',
+     'descripcion': "Las posiciones numéricas de cada carrera son 1..n, sin huecos ni repetidas"},
+    {'nombre': 'cobertura_pitstops', 'tipo': 'cobertura', 'severidad': 'aviso', 'columna': 'NPitstops',
+     'desde': 2019, 'minimo': 0.5,  # umbral del dataset; Jolpica tiene pitstops desde 2011 (PITSTOPS_DESDE)
+     'descripcion': "Desde 2019, al menos la mitad de los pilotos de cada carrera tienen pitstops"},
+    {'nombre': 'duracion_pitstops', 'tipo': 'rango', 'severidad': 'aviso', 'columna': 'MedianPitStopDuration',
+     'min': 10.0, 'max': 120.0,  # más de 2 minutos suele ser una bandera roja
+     'descripcion': "MedianPitStopDuration entre 10 y 120 segundos"},
+]
+
+def _columnas(regla):
+    """Columnas del dataset que necesita una regla."""
+    if regla['tipo'] == 'unica':
+        return list(regla['columnas'])
+    columnas = [regla['columna']]
+    return CLAVE_CARRERA + columnas if regla['tipo'] in ('contigua', 'cobertura') else columnas
+
+def columnas_necesarias(reglas=REGLAS):
+    """Columnas a leer para evaluar las reglas (más Driver, para identificar las filas)."""
+    columnas = CLAVE_CARRERA + ['Driver']
+    for regla in reglas:
+        columnas += [c for c in _columnas(regla) if c not in columnas]
+    return columnas
+
+def _alias(columnas, necesarias):
+    """{columna canónica: [columnas del fichero con ese nombre o un alias]} de las necesarias."""
+    candidatas = {}
+    for col in columnas:
+        canonico = nombre_canonico(col)
+        if canonico in necesarias:
+            candidatas.setdefault(canonico, []).append(col)
+    return candidatas
+
+def resolver_columnas(df, reglas=REGLAS):
+    """
+    Completa las columnas canónicas de las reglas con las que en df están
+    con un alias de esquema.ALIAS_COLUMNAS (p. ej. 'Pos.' en merge_data,
+    cada temporada con el suyo): se toma el primer valor no nulo.
+    """
+    resueltas = {}
+    for canonico, cols in _alias(df.columns, columnas_necesarias(reglas)).items():
+        if cols == [canonico]:
+            continue
+        cols = sorted(cols, key=lambda col: col != canonico)  # la canónica, si está, primero
+        serie = df[cols[0]].astype(object)
+        for col in cols[1:]:
+            serie = serie.fillna(df[col].astype(object))
+        resueltas[canonico] = serie
+    return df.assign(**resueltas) if resueltas else df
+
+def _numerico(serie):
+    """Valores numéricos de una columna (códigos como Ret o DSQ -> NaN)."""
+    return pd.to_numeric(serie.astype(object), errors='coerce')
+
+# --- Reglas por carrera: columnas auxiliares, agregaciones y condición sobre el agregado ---
+
+def _aux_contigua(regla, df):
+    return {f"_{regla['nombre']}": _numerico(df[regla['columna']])}
+
+def _agg_contigua(regla):
+    aux = f"_{regla['nombre']}"
+    return {f"{aux}_n": (aux, 'count'), f"{aux}_min": (aux, 'min'),
+            f"{aux}_max": (aux, 'max'), f"{aux}_distintas": (aux, 'nunique')}
+
+def _malas_contigua(regla, agregado):
+    aux = f"_{regla['nombre']}"
+    n = agregado[f"{aux}_n"]
+    return (n > 0) & ((agregado[f"{aux}_min"] != 1) | (agregado[f"{aux}_max"] != n)
+                      | (agregado[f"{aux}_distintas"] != n))
+
+def _aux_cobertura(regla, df):
+    return {f"_{regla['nombre']}": df[regla['columna']].notna()}
+
+def _agg_cobertura(regla):
+    aux = f"_{regla['nombre']}"
+    return {f"{aux}_pct": (aux, 'mean')}
+
+def _malas_cobertura(regla, agregado):
+    season = agregado.index.get_level_values('Season')
+    return pd.Series((season >= regla['desde']) & (agregado[f"_{regla['nombre']}_pct"] < regla['minimo']),
+                     index=agregado.index)
+
+POR_CARRERA = {
+    'contigua': (_aux_contigua, _agg_contigua, _malas_contigua),
+    'cobertura': (_aux_cobertura, _agg_cobertura, _malas_cobertura),
+}
+
+# --- Reglas por fila: máscara de filas que incumplen ---
+
+def _filas_unica(regla, df):
+    claves = df[regla['columnas']]
+    return claves.notna().all(axis=1) & claves.duplicated(keep=False)
+
+def _filas_rango(regla, df):
+    valores = _numerico(df[regla['columna']])
+    return valores.notna() & ~valores.between(regla.get('min', -float('inf')), regla.get('max', float('inf')))
+
+def _filas_no_nulo(regla, df):
+    return df[regla['columna']].isna()
+
+POR_FILA = {
+    'unica': _filas_unica,
+    'rango': _filas_rango,
+    'no_nulo': _filas_no_nulo,
+}
+
+def _resultado(regla, segundos, filas=None, carreras=None, omitida=None):
+    return {'descripcion': regla['descripcion'], 'severidad': regla['severidad'],
+            'columnas': _columnas(regla) if 'tipo' in regla else [],
+            'violaciones': 0 if filas is None else len(filas),
+            'filas': filas, 'carreras': carreras, 'segundos': segundos, 'omitida': omitida}
+
+def _ok(resultados):
+    """Sin violaciones en las reglas de error; una regla de error omitida tampoco cuenta como superada."""
+    return all(r['violaciones'] == 0 and not r['omitida'] for r in resultados.values() if r['severidad'] == 'error')
+
+def validar(df, reglas=REGLAS):
+    """
+    Evalúa todas las reglas sobre df (columnas con alias ya resueltas). Las
+    reglas por carrera comparten una sola pasada groupby. Una regla cuyas
+    columnas no están se marca como omitida. Devuelve el informe:
+    {'ok', 'filas', 'segundos', 'segundos_groupby', 'reglas': {nombre: resultado}}.
+    """
+    inicio = time.perf_counter()
+    df = resolver_columnas(df, reglas)
+    resultados = {}
+    activas = []
+    for regla in reglas:
+        faltan = [c for c in _columnas(regla) if c not in df.columns]
+        if faltan:
+            resultados[regla['nombre']] = _resultado(regla, 0.0, omitida=f"faltan columnas {faltan}")
+        else:
+            activas.append(regla)
+
+    # Reglas por fila
+    for regla in (r for r in activas if r['tipo'] in POR_FILA):
+        t0 = time.perf_counter()
+        mascara = POR_FILA[regla['tipo']](regla, df)
+        resultados[regla['nombre']] = _resultado(regla, time.perf_counter() - t0, filas=df[mascara])
+
+    # Reglas por carrera: columnas auxiliares de todas y una única pasada groupby
+    por_carrera = [r for r in activas if r['tipo'] in POR_CARRERA]
+    segundos_groupby = 0.0
+    if por_carrera:
+        t0 = time.perf_counter()
+        auxiliares, agregaciones, tiempos = {}, {}, {}
+        for regla in por_carrera:
+            t_regla = time.perf_counter()
+            aux, agg, _ = POR_CARRERA[regla['tipo']]
+            auxiliares.update(aux(regla, df))
+            agregaciones.update(agg(regla))
+            tiempos[regla['nombre']] = time.perf_counter() - t_regla
+        base = pd.DataFrame({**{c: df[c].values for c in CLAVE_CARRERA}, **auxiliares}, index=df.index)
+        agregado = base.groupby(CLAVE_CARRERA, sort=False).agg(**agregaciones)
+        claves = pd.MultiIndex.from_frame(base[CLAVE_CARRERA])
+        segundos_groupby = time.perf_counter() - t0 - sum(tiempos.values())
+
+        for regla in por_carrera:
+            t_regla = time.perf_counter()
+            malas = POR_CARRERA[regla['tipo']][2](regla, agregado)
+            carreras = agregado[malas.values][[c for c in agregado.columns if c.startswith(f"_{regla['nombre']}_")]]
+            carreras.columns = [c[len(regla['nombre']) + 2:] for c in carreras.columns]
+            filas = df[claves.isin(carreras.index)]
+            tiempos[regla['nombre']] += time.perf_counter() - t_regla
+            resultados[regla['nombre']] = _resultado(regla, tiempos[regla['nombre']], filas=filas,
+                                                     carreras=carreras.reset_index())
+
+    return {
+        'ok': _ok(resultados),
+        'filas': len(df),
+        'segundos': time.perf_counter() - inicio,
+        'segundos_groupby': segundos_groupby,
+        'reglas': {regla['nombre']: resultados[regla['nombre']] for regla in reglas},
+    }
+
+def _combinar(informes, reglas):
+    """Un informe a partir de los de cada trozo."""
+    resultados = {}
+    for regla in reglas:
+        partes = [informe['reglas'][regla['nombre']] for informe in informes]
+        filas = [p['filas'] for p in partes if p['filas'] is not None]
+        carreras = [p['carreras'] for p in partes if p['carreras'] is not None]
+        omitida = next((p['omitida'] for p in partes if p['omitida']), None)
+        resultados[regla['nombre']] = _resultado(
+            regla, sum(p['segundos'] for p in partes),
+            filas=pd.concat(filas) if filas else None,
+            carreras=pd.concat(carreras, ignore_index=True) if carreras else None, omitida=omitida)
+    return {
+        'ok': _ok(resultados),
+        'filas': sum(informe['filas'] for informe in informes),
+        'segundos': sum(informe['segundos'] for informe in informes),
+        'segundos_groupby': sum(informe['segundos_groupby'] for informe in informes),
+        'reglas': resultados,
+    }
+
+def validar_csv(path, reglas=REGLAS, chunksize=50_000):
+    """
+    Valida un CSV de merged_data por trozos de chunksize filas, leyendo solo
+    las columnas de las reglas (o sus alias). Las filas de la última carrera de cada trozo
+    pasan al siguiente, así que ninguna carrera se valida partida. Si una
+    carrera vuelve a aparecer tras otras (CSV no agrupado por carrera) se
+    marca en la regla 'carreras_agrupadas'.
+    """
+    inicio = time.perf_counter()
+    cabecera = pd.read_csv(path, nrows=0).columns
+    columnas = [c for cols in _alias(cabecera, columnas_necesarias(reglas)).values() for c in cols]
+    tipos = {c: t for c, t in ESQUEMA_DATASET.items() if c in columnas}
+    agrupadas = {'nombre': 'carreras_agrupadas', 'severidad': 'error',
+                 'descripcion': "Las filas de cada carrera son contiguas en el CSV"}
+
+    informes, vistas, repetidas = [], set(), []
+    resto = None
+    for trozo in pd.read_csv(path, usecols=columnas, dtype=tipos, chunksize=chunksize):
+        if resto is not None:
+            trozo = pd.concat([resto, trozo])
+        ultima = tuple(trozo[CLAVE_CARRERA].iloc[-1])
+        en_ultima = (trozo['Season'] == ultima[0]) & (trozo['RaceNumber'] == ultima[1])
+        # Si todo el trozo es una misma carrera se sigue acumulando
+        if en_ultima.all():
+            resto = trozo
+            continue
+        completas, resto = trozo[~en_ultima], trozo[en_ultima]
+        repetidas.append(_marcar_repetidas(completas, vistas))
+        informes.append(validar(completas, reglas))
+    if resto is not None and len(resto):
+        repetidas.append(_marcar_repetidas(resto, vistas))
+        informes.append(validar(resto, reglas))
+
+    informe = _combinar(informes, reglas) if informes else validar(pd.DataFrame(columns=columnas), reglas)
+    filas_repetidas = pd.concat(repetidas) if repetidas else None
+    informe['reglas'][agrupadas['nombre']] = _resultado(agrupadas, 0.0, filas=filas_repetidas)
+    informe['ok'] = informe['ok'] and not len(filas_repetidas if filas_repetidas is not None else [])
+    informe['segundos'] = time.perf_counter() - inicio
+    return informe
+
+def _marcar_repetidas(df, vistas):
+    """Filas de carreras ya vistas en trozos anteriores; añade las de df a vistas."""
+    claves = pd.MultiIndex.from_frame(df[CLAVE_CARRERA])
+    repetidas = df[claves.isin(list(vistas))] if vistas else df.iloc[:0]
+    vistas.update(claves.unique())
+    return repetidas
+
+def imprimir_informe(informe, max_filas=5):
+    """Resumen por regla con el tiempo y algunas filas que la incumplen."""
+    print(f"\n📏 REGLAS ({informe['filas']:,} filas en {informe['segundos']*1000:.1f} ms, "
+          f"groupby compartido {informe['segundos_groupby']*1000:.1f} ms)")
+    for nombre, r in informe['reglas'].items():
+        if r['omitida']:
+            icono = "❌" if r['severidad'] == 'error' else "⏭️ "
+            print(f"  {icono} {nombre}: omitida ({r['omitida']})")
+            continue
+        icono = "✅" if r['violaciones'] == 0 else ("❌" if r['severidad'] == 'error' else "⚠️ ")
+        carreras = f", {len(r['carreras'])} carreras" if r['carreras'] is not None and r['violaciones'] else ""
+        print(f"  {icono} {r['descripcion']}: {r['violaciones']} filas{carreras} ({r['segundos']*1000:.1f} ms)")
+        if r['violaciones'] and max_filas:
+            columnas = list(dict.fromkeys(c for c in CLAVE_CARRERA + ['Driver'] + r['columnas'] if c in r['filas'].columns))
+            print('      ' + r['filas'][columnas].head(max_filas).to_string().replace('\n', '\n      '))
+
+if __name__ == "__main__":
+    # Uso: python validacion.py [csv] [chunksize]  -> en memoria y por trozos, mismo resultado
+    from esquema import leer_dataset
+    path = sys.argv[1] if len(sys.argv) > 1 else "merged_data/f1_clean_dataset.csv"
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+
+    inicio = time.perf_counter()
+    informe = validar(leer_dataset(path))
+    segundos = time.perf_counter() - inicio
+    imprimir_informe(informe)
+
+    inicio = time.perf_counter()
+    por_trozos = validar_csv(path, chunksize=chunksize)
+    segundos_trozos = time.perf_counter() - inicio
+
+    iguales = all(sorted(informe['reglas'][n]['filas'].index) == sorted(por_trozos['reglas'][n]['filas'].index)
+                  for n, r in informe['reglas'].items() if r['filas'] is not None)
+    print(f"\n⏱️  En memoria (lectura incluida) {segundos*1000:.1f} ms | por trozos de {chunksize:,} "
+          f"{segundos_trozos*1000:.1f} ms | {'✅ mismas violaciones' if iguales else '❌ violaciones distintas'}")
+    sys.exit(0 if informe['ok'] else 1)
@@ -0,0 +1,211 @@
+"""
+Versiones del dataset fusionado y diferencias fila a fila
+=========================================================
+Cada build de merge_all_data recibe un número de versión y un manifiesto
+en merged_data/versions/{dataset}.vNNNN.json con la huella de cada
+partición (Season, RaceNumber): suma de las huellas de sus filas
+(pd.util.hash_pandas_object, vectorizado), que no depende del orden.
+Comparando los manifiestos se sabe qué carreras han cambiado sin leer
+ninguna fila. Para esas carreras se calculan las diferencias fila a fila
+con el build anterior (join por clave Season, RaceNumber, Driver) y se
+guardan en {dataset}.vNNNN.changes.csv con la columna Change:
+- added: fila nueva; removed: fila que ya no está (valores anteriores);
+- changed: fila con algún valor distinto (valores nuevos).
+Las filas anteriores se leen del CSV previo solo en las temporadas
+afectadas (particiones.leer_filtrado). Los consumidores pueden recargar
+solo las carreras de carreras_cambiadas_desde(version) o aplicar
+cambios_desde(version), y los agregados se invalidan por carrera.
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import pandas as pd
+
+from dataset_arrow import cargar_dataframe, ultima_version
+from particiones import leer_filtrado
+
+VERSIONES_DIR = "merged_data/versions"
+
+CLAVE_CARRERA = ['Season', 'RaceNumber']
+CLAVE_FILA = ['Season', 'RaceNumber', 'Driver']
+
+def _nombre(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+def ruta_manifiesto(csv_path, version):
+    return os.path.join(VERSIONES_DIR, f"{_nombre(csv_path)}.v{version:04d}.json")
+
+def ruta_cambios(csv_path, version):
+    return os.path.join(VERSIONES_DIR, f"{_nombre(csv_path)}.v{version:04d}.changes.csv")
+
+def versiones(csv_path="merged_data/f1_clean_dataset.csv"):
+    """Números de versión con manifiesto, de la más antigua a la más reciente."""
+    patron = re.compile(re.escape(_nombre(csv_path)) + r"\.v(\d+)\.json$")
+    return sorted(int(m.group(1)) for path in glob.glob(os.path.join(VERSIONES_DIR, "*.json"))
+                  if (m := patron.search(os.path.basename(path))))
+
+def cargar_manifiesto(csv_path="merged_data/f1_clean_dataset.csv", version=None):
+    """Manifiesto de una versión (por defecto, la última); None si no hay."""
+    if version is None:
+        disponibles = versiones(csv_path)
+        if not disponibles:
+            return None
+        version = disponibles[-1]
+    with open(ruta_manifiesto(csv_path, version)) as f:
+        return json.load(f)
+
+def _clave_carrera(df):
+    """'2024-05' por fila."""
+    return df['Season'].astype(int).astype(str).str.cat(df['RaceNumber'].astype(int).astype(str).str.zfill(2), sep='-')
+
+def huellas_particiones(df):
+    """Huella y filas de cada carrera: {'2024-05': {'hash': '...', 'rows': 20}}."""
+    filas = pd.Series(pd.util.hash_pandas_object(df, index=False).values, index=_clave_carrera(df).values)
+    por_carrera = filas.groupby(level=0).agg(['sum', 'size'])
+    return {clave: {'hash': str(h), 'rows': int(n)} for clave, (h, n) in por_carrera.iterrows()}
+
+def _claves_filas(df):
+    """Clave de fila (Season, RaceNumber, Driver y nº de aparición) con tipos simples, más la huella."""
+    claves = pd.DataFrame({'Season': df['Season'].astype(int).values,
+                           'RaceNumber': df['RaceNumber'].astype(int).values,
+                           'Driver': df['Driver'].astype(str).values})
+    claves['_n'] = claves.groupby(CLAVE_FILA).cumcount()
+    claves['_h'] = pd.util.hash_pandas_object(df, index=False).values
+    claves['_i'] = range(len(df))
+    return claves
+
+def diferencias(antes, despues):
+    """
+    Filas añadidas, eliminadas y modificadas entre dos versiones (DataFrames
+    con las mismas columnas). Devuelve un DataFrame con la columna Change delante.
+    """
+    unidas = _claves_filas(antes).merge(_claves_filas(despues), on=CLAVE_FILA + ['_n'],
+                                        how='outer', suffixes=('_antes', '_despues'), indicator=True)
+    anadidas = unidas.loc[unidas['_merge'] == 'right_only', '_i_despues'].astype(int)
+    eliminadas = unidas.loc[unidas['_merge'] == 'left_only', '_i_antes'].astype(int)
+    ambas = unidas[unidas['_merge'] == 'both']
+    cambiadas = ambas.loc[ambas['_h_antes'] != ambas['_h_despues'], '_i_despues'].astype(int)
+
+    partes = [despues.iloc[anadidas].assign(Change='added'),
+              antes.iloc[eliminadas].assign(Change='removed'),
+              despues.iloc[cambiadas].assign(Change='changed')]
+    cambios = pd.concat([p.astype(object) for p in partes], ignore_index=True)
+    cambios = cambios[['Change'] + [c for c in cambios.columns if c != 'Change']]
+    return cambios.sort_values(CLAVE_CARRERA, kind='stable', ignore_index=True)
+
+def carreras_afectadas(cambios):
+    """Conjunto de (season, race_number) con alguna fila en las diferencias."""
+    return set(map(tuple, cambios[CLAVE_CARRERA].astype(int).drop_duplicates().values))
+
+def _afectadas(previas, actuales):
+    """Claves de carrera cuya huella difiere (o que solo están en una de las dos versiones)."""
+    return sorted(clave for clave in set(previas) | set(actuales)
+                  if previas.get(clave, {}).get('hash') != actuales.get(clave, {}).get('hash'))
+
+def registrar_version(df, csv_path):
+    """
+    Registra df como nueva versión del dataset de csv_path. Se llama antes de
+    sobrescribir el CSV: las filas anteriores de las carreras cambiadas se
+    leen de él. Devuelve (versión, diferencias con la anterior o None si es la primera).
+    Si ninguna carrera ha cambiado no se crea versión: se devuelve la actual
+    con las diferencias vacías.
+    """
+    previo = cargar_manifiesto(csv_path)
+    # La numeración continúa la de las versiones Arrow ya publicadas antes de registrar manifiestos
+    version = (previo['version'] if previo else ultima_version(csv_path)) + 1
+    particiones = huellas_particiones(df)
+
+    cambios, afectadas = None, None
+    if previo is not None and os.path.exists(csv_path):
+        afectadas = _afectadas(previo['partitions'], particiones)
+        antes = despues = df.iloc[:0]
+        if afectadas:
+            antes = leer_filtrado(csv_path, seasons=sorted({int(clave[:4]) for clave in afectadas}))
+            antes = antes[_clave_carrera(antes).isin(afectadas)].reset_index(drop=True)
+            despues = df[_clave_carrera(df).isin(afectadas)].reset_index(drop=True)
+        cambios = diferencias(antes, despues)
+
+        # Sin carreras cambiadas (ni columnas): se mantiene la versión anterior
+        if not afectadas and previo['columns'] == list(df.columns):
+            print(f"  🏷️  Versión {previo['version']}: sin cambios, no se registra una nueva")
+            return previo['version'], cambios
+
+    os.makedirs(VERSIONES_DIR, exist_ok=True)
+    resumen = None
+    if cambios is not None:
+        resumen = {'races': afectadas, **cambios['Change'].value_counts().reindex(
+            ['added', 'removed', 'changed'], fill_value=0).astype(int).to_dict()}
+        if len(cambios):
+            cambios.to_csv(ruta_cambios(csv_path, version) + ".tmp", index=False)
+            os.replace(ruta_cambios(csv_path, version) + ".tmp", ruta_cambios(csv_path, version))
+
+    manifiesto = {
+        "version": version,
+        "previous": previo['version'] if previo else None,
+        "generated_date": pd.Timestamp.now().isoformat(),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "changes": resumen,
+        "partitions": particiones,
+    }
+    path = ruta_manifiesto(csv_path, version)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifiesto, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+    if resumen is None:
+        print(f"  🏷️  Versión {version}: primera versión registrada ({len(particiones)} carreras)")
+    else:
+        print(f"  🏷️  Versión {version}: {len(afectadas)} carreras cambiadas | +{resumen['added']} "
+              f"-{resumen['removed']} ~{resumen['changed']} filas")
+    return version, cambios
+
+def carreras_cambiadas_desde(version, csv_path="merged_data/f1_clean_dataset.csv", hasta=None):
+    """(season, race_number) que difieren entre una versión y la última (o 'hasta'), solo con los manifiestos."""
+    previas = cargar_manifiesto(csv_path, version)['partitions']
+    actuales = cargar_manifiesto(csv_path, hasta)['partitions']
+    return {(int(clave[:4]), int(clave[5:])) for clave in _afectadas(previas, actuales)}
+
+def cambios_desde(version, csv_path="merged_data/f1_clean_dataset.csv"):
+    """
+    Diferencias de cada build posterior a 'version', en orden, con la columna
+    Version. Aplicadas una tras otra llevan de esa versión a la última.
+    """
+    partes = []
+    for v in versiones(csv_path):
+        if v > version and os.path.exists(ruta_cambios(csv_path, v)):
+            partes.append(pd.read_csv(ruta_cambios(csv_path, v), dtype=str).assign(Version=v))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=['Change', 'Version'])
+
+def diff_versiones(desde, hasta=None, csv_path="merged_data/f1_clean_dataset.csv"):
+    """
+    Diferencias fila a fila entre dos builds cualesquiera que aún conserven
+    su fichero Arrow (dataset_arrow), solo en las carreras cuya huella difiere.
+    """
+    hasta = hasta or versiones(csv_path)[-1]
+    afectadas = [f"{s}-{r:02d}" for s, r in sorted(carreras_cambiadas_desde(desde, csv_path, hasta))]
+    antes = cargar_dataframe(csv_path, copia=True, version=desde)
+    despues = cargar_dataframe(csv_path, copia=True, version=hasta)
+    return diferencias(antes[_clave_carrera(antes).isin(afectadas)].reset_index(drop=True),
+                       despues[_clave_carrera(despues).isin(afectadas)].reset_index(drop=True))
+
+if __name__ == "__main__":
+    # Uso: python versiones.py            -> lista de versiones
+    #      python versiones.py 3 [5]      -> diferencias entre la versión 3 y la 5 (o la última)
+    if len(sys.argv) > 1:
+        cambios = diff_versiones(int(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        if len(cambios):
+            print(cambios['Change'].value_counts().to_string())
+            print(cambios.head(20).to_string())
+        else:
+            print("Sin diferencias")
+    else:
+        for v in versiones():
+            m = cargar_manifiesto(version=v)
+            cambios = m['changes'] or {}
+            print(f"v{v:04d} {m['generated_date'][:19]} {m['rows']:>7,} filas | "
+                  f"{len(cambios.get('races', m['partitions'])):>4} carreras cambiadas | "
+                  f"+{cambios.get('added', m['rows'])} -{cambios.get('removed', 0)} ~{cambios.get('changed', 0)}")
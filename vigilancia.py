@@ -0,0 +1,187 @@
+"""
+Modo vigilancia: nueva ronda al dataset tras cada Gran Premio
+==============================================================
+Proceso de larga duración que, cada INTERVALO segundos, consulta:
+- Jolpica /current/last/results.json: última ronda con resultados;
+- la página de Wikipedia de la temporada actual: enlaces Report de cada ronda.
+Cuando aparece una ronda nueva se descarga solo lo de esa ronda (tabla de
+resultados del Report, pitstops y entradas del índice de pilotos de la
+temporada) y se relanza merge_all_data(), que saca de la caché de etapas
+todas las demás carreras: la ronda se añade al dataset, a los metadatos, a
+los agregados y a las características en minutos.
+Mientras una ronda esté a medias (Wikipedia sin tabla de resultados o
+Jolpica sin pitstops todavía) se vuelve a consultar cada
+INTERVALO_PENDIENTE segundos (como mucho MAX_INTENTOS veces). El progreso
+queda en data/vigilancia/estado.json.
+JOLPICA_URL y WIKIPEDIA_URL permiten apuntarlo al servidor stub:
+    python servidor_stub.py servir --limite 0 &
+    JOLPICA_URL=http://127.0.0.1:8000/ergast/f1 WIKIPEDIA_URL=http://127.0.0.1:8000 python vigilancia.py --una-vez
+"""
+
+import os
+import json
+import time
+import argparse
+from urllib.parse import urljoin
+
+import requests
+
+from archivo_html import archivar
+from calendarios import calendario_temporada, carreras_temporada
+from f1spiders import extraer_carreras, extraer_tablas, guardar_tablas
+from funciones_api import get_all_drivers, get_last_race, pitstops_path, save_pitstops_for_race
+from indice_pilotos import entradas_temporada, guardar_entradas
+from merge_limpio import find_race_number, merge_all_data
+
+WIKIPEDIA_URL = os.environ.get("WIKIPEDIA_URL", "https://en.wikipedia.org")
+VIGILANCIA_DIR = "data/vigilancia"
+ESTADO_PATH = os.path.join(VIGILANCIA_DIR, "estado.json")
+
+INTERVALO = 15 * 60           # sin rondas pendientes
+INTERVALO_PENDIENTE = 2 * 60  # con una ronda a medias
+MAX_INTENTOS = 30             # consultas a una ronda ya disputada antes de darla por cerrada
+
+def cargar_estado():
+    """Estado: {'season': temporada, 'rondas': {ronda: {'resultados': fecha, 'pitstops': fecha}}}."""
+    if not os.path.exists(ESTADO_PATH):
+        return {'season': None, 'rondas': {}}
+    with open(ESTADO_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_estado(estado):
+    os.makedirs(VIGILANCIA_DIR, exist_ok=True)
+    with open(ESTADO_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, sort_keys=True)
+    os.replace(ESTADO_PATH + ".tmp", ESTADO_PATH)
+
+def descargar_pagina(url, tipo, year, race=""):
+    """Descarga una página de Wikipedia, la guarda en el archivo HTML y devuelve su texto."""
+    resp = requests.get(url, headers={"User-Agent": "f1-dataset-vigilancia"}, timeout=30)
+    resp.raise_for_status()
+    archivar(url, resp.content, tipo, year, race, resp.headers.get("Date", ""))
+    return resp.text
+
+def reports_temporada(season):
+    """{ronda: (url del Report, nombre de la carrera)} según la página de la temporada."""
+    url = f"{WIKIPEDIA_URL}/wiki/{season}_Formula_One_World_Championship"
+    calendar = calendario_temporada(season)
+    reports = {}
+    for href, race in extraer_carreras(descargar_pagina(url, 'season', season)):
+        rnd = find_race_number(season, f"{race}.csv", calendar)
+        if rnd is not None:
+            reports[rnd] = (urljoin(url, href), race)
+    return reports
+
+def completa(ronda):
+    return 'resultados' in ronda and 'pitstops' in ronda
+
+def _rondas_previas(season, ultima_ronda):
+    """Rondas que ya estaban en disco (backfill u orquestador) al empezar a vigilar una temporada."""
+    calendar = calendario_temporada(season)
+    con_resultados = {find_race_number(season, f, calendar) for f in os.listdir(f"data/{season}")} \
+        if os.path.isdir(f"data/{season}") else set()
+    return {str(rnd): {'resultados': 'previo', 'pitstops': 'previo'}
+            for rnd in range(1, ultima_ronda + 1)
+            if rnd in con_resultados and os.path.exists(pitstops_path(season, rnd))}
+
+def comprobar(estado, driver_number_map):
+    """
+    Una consulta: procesa las rondas nuevas o a medias. Devuelve
+    (hay_cambios, hay_pendientes).
+    """
+    ultima = get_last_race()
+    if ultima is None:
+        return False, False
+    season, ultima_ronda = ultima['season'], ultima['round']
+
+    if estado['season'] != season:
+        carreras_temporada(season, actualizar=True)
+        estado.update(season=season, rondas=_rondas_previas(season, ultima_ronda))
+
+    # Rondas por revisar: las que Jolpica ya tiene y la siguiente (Wikipedia suele adelantarse)
+    rondas = estado['rondas']
+    siguiente = max([ultima_ronda] + [int(r) for r, ronda in rondas.items() if completa(ronda)]) + 1
+    calendario = {race['round'] for race in carreras_temporada(season)}
+    candidatas = [r for r in range(1, siguiente + 1) if r in calendario and not completa(rondas.get(str(r), {}))]
+    if not candidatas:
+        return False, False
+
+    cambios = False
+    ahora = time.strftime("%Y-%m-%dT%H:%M:%S")
+    reports = reports_temporada(season)
+
+    for rnd in candidatas:
+        ronda = rondas.setdefault(str(rnd), {})
+
+        if 'resultados' not in ronda and rnd in reports:
+            url, race = reports[rnd]
+            tablas = extraer_tablas(descargar_pagina(url, 'race', season, race))
+            if 'race' in tablas:  # antes de la carrera el Report existe pero sin tabla de resultados
+                for path in guardar_tablas(tablas, season, race):
+                    print(f"  📝 {path}")
+                ronda['resultados'] = ahora
+                cambios = True
+
+        if 'pitstops' not in ronda and rnd <= ultima_ronda:
+            path, filas = save_pitstops_for_race(season, rnd, driver_number_map)
+            if filas:
+                ronda['pitstops'] = ahora
+                cambios = True
+            else:
+                os.remove(path)  # aún sin pitstops: se vuelve a pedir en la siguiente consulta
+
+        # Una ronda ya disputada que sigue a medias tras MAX_INTENTOS consultas se da por cerrada
+        if rnd <= ultima_ronda and not completa(ronda):
+            ronda['intentos'] = ronda.get('intentos', 0) + 1
+            if ronda['intentos'] >= MAX_INTENTOS:
+                for parte in ('resultados', 'pitstops'):
+                    ronda.setdefault(parte, 'sin datos')
+                print(f"  ⚠️  Ronda {rnd}: sin {', '.join(p for p in ('resultados', 'pitstops') if ronda[p] == 'sin datos')}")
+
+        if not ronda:
+            del rondas[str(rnd)]
+
+    if cambios:
+        # Índice de pilotos de la temporada (números de la ronda nueva)
+        guardar_entradas([entradas_temporada(season)], [season])
+
+    guardar_estado(estado)
+    pendientes = [r for r, ronda in rondas.items() if int(r) <= ultima_ronda and not completa(ronda)]
+    return cambios, bool(pendientes)
+
+def vigilar(intervalo=INTERVALO, intervalo_pendiente=INTERVALO_PENDIENTE, una_vez=False):
+    """Bucle de vigilancia (una_vez=True: una sola consulta, para cron o pruebas)."""
+    estado = cargar_estado()
+    driver_number_map = get_all_drivers()
+    print(f"👀 Vigilando Jolpica ({os.environ.get('JOLPICA_URL', 'api.jolpi.ca')}) y {WIKIPEDIA_URL}")
+
+    while True:
+        inicio = time.perf_counter()
+        try:
+            cambios, pendientes = comprobar(estado, driver_number_map)
+        except Exception as error:  # red caída, 5xx...: se reintenta en la siguiente consulta
+            print(f"❌ {time.strftime('%H:%M:%S')} Consulta fallida: {error}")
+            cambios, pendientes = False, True
+
+        if cambios:
+            merge_all_data()
+            print(f"✅ {time.strftime('%H:%M:%S')} Dataset actualizado en {time.perf_counter() - inicio:.1f} s")
+        else:
+            print(f"💤 {time.strftime('%H:%M:%S')} Sin rondas nuevas")
+
+        if una_vez:
+            return cambios
+        time.sleep(intervalo_pendiente if pendientes else intervalo)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Añade cada ronda nueva al dataset en cuanto se publica")
+    parser.add_argument("--intervalo", type=int, default=INTERVALO, help="segundos entre consultas")
+    parser.add_argument("--intervalo-pendiente", type=int, default=INTERVALO_PENDIENTE,
+                        help="segundos entre consultas con una ronda a medias")
+    parser.add_argument("--una-vez", action="store_true", help="una sola consulta y salir")
+    args = parser.parse_args()
+
+    try:
+        vigilar(args.intervalo, args.intervalo_pendiente, args.una_vez)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia detenida")